@@ -9,15 +9,39 @@ app.config_from_object('django.conf:settings', namespace='CELERY')
 app.autodiscover_tasks()
 
 # Configure periodic tasks
-app.conf.beat_schedule = {
-    'check-all-workers-every-minute': {
-        'task': 'workers.tasks.check_all_workers_status',
-        'schedule': 60.0,  # Every 60 seconds
-    },
-    'check-all-servers-every-5-minutes': {
-        'task': 'workers.tasks.check_all_servers_status',
-        'schedule': 300.0,  # Every 5 minutes
-    },
+# Read from the environment: Django settings are not loaded yet when this module is imported
+if os.environ.get('WORKER_POLL_MODE', 'adaptive') == 'fixed':
+    app.conf.beat_schedule = {
+        'check-all-workers-every-minute': {
+            'task': 'workers.tasks.check_all_workers_status',
+            'schedule': 60.0,  # Every 60 seconds
+        },
+        'check-all-servers-every-5-minutes': {
+            'task': 'workers.tasks.check_all_servers_status',
+            'schedule': 300.0,  # Every 5 minutes
+        },
+    }
+else:
+    # Each tick polls only the hosts that are due, spreading SSH load evenly
+    poll_tick = float(os.environ.get('POLL_TICK_INTERVAL', 10))
+    app.conf.beat_schedule = {
+        'poll-due-hosts': {
+            'task': 'workers.tasks.poll_due_hosts',
+            'schedule': poll_tick,
+            'options': {'expires': poll_tick},
+        },
+    }
+
+# Compact the status log once a night, whichever polling mode is used
+app.conf.beat_schedule['compact-status-logs-nightly'] = {
+    'task': 'workers.tasks.compact_status_logs',
+    'schedule': crontab(hour=3, minute=0),
+}
+
+app.conf.beat_schedule['rollup-worker-metrics'] = {
+    'task': 'workers.tasks.rollup_worker_metrics',
+    'schedule': 60.0,
+    'options': {'expires': 60.0},
 }
 
 
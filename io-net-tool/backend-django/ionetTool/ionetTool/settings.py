@@ -29,6 +29,11 @@ else:
 # Encryption key for sensitive data (SSH passwords, etc.)
 # Generate with: from cryptography.fernet import Fernet; Fernet.generate_key()
 ENCRYPTION_KEY = os.environ.get('ENCRYPTION_KEY', None)
+# Previous keys, comma separated, still accepted for decryption during rotation
+ENCRYPTION_KEY_FALLBACKS = [k for k in os.environ.get('ENCRYPTION_KEY_FALLBACKS', '').split(',') if k]
+# Decrypted credentials are cached in memory, keyed by ciphertext
+ENCRYPTION_CACHE_SIZE = int(os.environ.get('ENCRYPTION_CACHE_SIZE', 1024))
+ENCRYPTION_CACHE_TTL = float(os.environ.get('ENCRYPTION_CACHE_TTL', 300))
 
 # Security settings
 SECURE_SSL_REDIRECT = not DEBUG
@@ -144,6 +149,32 @@ else:
     }
 
 
+# Cache (dashboard stats and other shared, short-lived state)
+# LocMem is per process, so production should share Redis between web and Celery
+if DEBUG and not os.environ.get('USE_REDIS_CACHE'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        },
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get('REDIS_CACHE_URL', REDIS_URL),
+            'KEY_PREFIX': 'ionet',
+        },
+    }
+
+DASHBOARD_STATS_CACHE_TTL = int(os.environ.get('DASHBOARD_STATS_CACHE_TTL', 30))
+
+# WebSocket status deltas: how far back a reconnecting client can resume
+STATUS_DELTA_LOG_SIZE = int(os.environ.get('STATUS_DELTA_LOG_SIZE', 5000))
+STATUS_DELTA_LOG_TTL = int(os.environ.get('STATUS_DELTA_LOG_TTL', 3600))
+# Sweep updates are coalesced and flushed to WebSocket groups on this tick (seconds)
+STATUS_BROADCAST_INTERVAL = float(os.environ.get('STATUS_BROADCAST_INTERVAL', 0.25))
+
+
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
@@ -162,6 +193,76 @@ CELERY_ACCEPT_CONTENT = ['json']
 CELERY_TASK_SERIALIZER = 'json'
 CELERY_RESULT_SERIALIZER = 'json'
 CELERY_TIMEZONE = 'UTC'
+# Per-host checks run on their own queue so SSH probes never wait behind
+# other tasks; run a worker with `-Q celery,host_checks`
+WORKER_HOST_QUEUE = os.environ.get('WORKER_HOST_QUEUE', 'host_checks')
+CELERY_TASK_ROUTES = {
+    'workers.tasks.check_host_workers': {'queue': WORKER_HOST_QUEUE},
+    'workers.tasks.check_host_server': {'queue': WORKER_HOST_QUEUE},
+}
+
+# Fleet sweep tuning
+# Hosts are checked concurrently; slow hosts are abandoned after the per-host
+# timeout and the sweep returns partial results at the global deadline.
+WORKER_SWEEP_CONCURRENCY = int(os.environ.get('WORKER_SWEEP_CONCURRENCY', 16))
+WORKER_SWEEP_HOST_TIMEOUT = float(os.environ.get('WORKER_SWEEP_HOST_TIMEOUT', 45))
+WORKER_SWEEP_DEADLINE = float(os.environ.get('WORKER_SWEEP_DEADLINE', 55))
+# 'threads' runs blocking paramiko checks in a pool; 'asyncio' drives the
+# whole fleet from one event loop over asyncssh
+WORKER_SWEEP_BACKEND = os.environ.get('WORKER_SWEEP_BACKEND', 'threads')
+WORKER_SWEEP_ASYNC_CONCURRENCY = int(os.environ.get('WORKER_SWEEP_ASYNC_CONCURRENCY', 256))
+# Bulk worker actions: servers handled at once, and seconds one server's
+# batches (all of its rolling chunks included) may take
+WORKER_BULK_CONCURRENCY = int(os.environ.get('WORKER_BULK_CONCURRENCY', 16))
+WORKER_BULK_HOST_TIMEOUT = float(os.environ.get('WORKER_BULK_HOST_TIMEOUT', 300))
+
+# Seconds a followed HTTP log stream (?stream=1&follow=1) stays open; the
+# WebSocket log route follows until the client disconnects
+LOG_STREAM_HTTP_TIMEOUT = float(os.environ.get('LOG_STREAM_HTTP_TIMEOUT', 300))
+
+# A host is probed by one task at a time; the lock outlives a hung check
+HOST_LOCK_TIMEOUT = float(os.environ.get('HOST_LOCK_TIMEOUT', WORKER_SWEEP_HOST_TIMEOUT + 15))
+
+# Polling schedule
+# 'adaptive' polls each host when it is due (changed hosts often, stable ones
+# less, offline ones with exponential backoff); 'fixed' runs the full-fleet
+# sweeps every 60s (workers) and 300s (servers)
+WORKER_POLL_MODE = os.environ.get('WORKER_POLL_MODE', 'adaptive')
+POLL_TICK_INTERVAL = float(os.environ.get('POLL_TICK_INTERVAL', 10))
+POLL_MIN_INTERVAL = float(os.environ.get('POLL_MIN_INTERVAL', 30))
+POLL_BASE_INTERVAL = float(os.environ.get('POLL_BASE_INTERVAL', 60))
+POLL_MAX_INTERVAL = float(os.environ.get('POLL_MAX_INTERVAL', 600))
+POLL_OFFLINE_MAX_INTERVAL = float(os.environ.get('POLL_OFFLINE_MAX_INTERVAL', 1800))
+POLL_JITTER = float(os.environ.get('POLL_JITTER', 0.1))
+POLL_MAX_HOSTS_PER_TICK = int(os.environ.get('POLL_MAX_HOSTS_PER_TICK', 64))
+
+# Status log retention
+# Raw transitions are kept this many days, then compacted into one row per
+# entity per day by the nightly compact_status_logs task
+STATUS_LOG_RETENTION_DAYS = int(os.environ.get('STATUS_LOG_RETENTION_DAYS', 30))
+STATUS_LOG_ROLLUP_RETENTION_DAYS = int(os.environ.get('STATUS_LOG_ROLLUP_RETENTION_DAYS', 730))
+
+# Worker metrics
+# Raw samples are rolled up every minute into 1m, 1h and 1d series; each
+# resolution is kept this long (daily points are kept forever)
+METRICS_RAW_RETENTION_HOURS = int(os.environ.get('METRICS_RAW_RETENTION_HOURS', 48))
+METRICS_MINUTE_RETENTION_DAYS = int(os.environ.get('METRICS_MINUTE_RETENTION_DAYS', 7))
+METRICS_HOUR_RETENTION_DAYS = int(os.environ.get('METRICS_HOUR_RETENTION_DAYS', 90))
+
+# SSH connection pool
+# Connections are shared per (host, port, username) and reused across checks.
+SSH_POOL_MAX_PER_HOST = int(os.environ.get('SSH_POOL_MAX_PER_HOST', 4))
+SSH_POOL_IDLE_TIMEOUT = float(os.environ.get('SSH_POOL_IDLE_TIMEOUT', 300))
+SSH_POOL_KEEPALIVE = int(os.environ.get('SSH_POOL_KEEPALIVE', 30))
+SSH_POOL_REAP_INTERVAL = float(os.environ.get('SSH_POOL_REAP_INTERVAL', 60))
+
+# VM probing (guests are reached through the hypervisor's SSH transport)
+VM_PROBE_CONCURRENCY = int(os.environ.get('VM_PROBE_CONCURRENCY', 16))
+
+# Batch VM provisioning: disks and seeds built at once on the host, and
+# seconds between consecutive virt-install launches
+VM_PROVISION_CONCURRENCY = int(os.environ.get('VM_PROVISION_CONCURRENCY', 8))
+VM_INSTALL_STAGGER = float(os.environ.get('VM_INSTALL_STAGGER', 2))
 
 
 # REST Framework
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Server, VirtualMachine, Worker, StatusLog
+from .models import Server, VirtualMachine, Worker, StatusLog, StatusLogDaily, Job, WorkerMetrics
 
 
 @admin.register(Server)
@@ -32,3 +32,24 @@ class StatusLogAdmin(admin.ModelAdmin):
     list_filter = ['entity_type', 'new_status']
     readonly_fields = ['id', 'created_at']
 
+
+
+@admin.register(StatusLogDaily)
+class StatusLogDailyAdmin(admin.ModelAdmin):
+    list_display = ['entity_type', 'entity_id', 'day', 'transitions', 'last_status']
+    list_filter = ['entity_type', 'last_status']
+    search_fields = ['entity_id']
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'target_type', 'target_id', 'status', 'progress', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status']
+    readonly_fields = ['id', 'created_at', 'started_at', 'finished_at']
+
+
+@admin.register(WorkerMetrics)
+class WorkerMetricsAdmin(admin.ModelAdmin):
+    list_display = ['worker', 'resolution', 'bucket_start', 'count', 'rolled_up']
+    list_filter = ['resolution']
+    readonly_fields = ['id', 'samples']
@@ -1,7 +1,13 @@
+import asyncio
 import json
+from collections import deque
+from urllib.parse import parse_qs
 from channels.generic.websocket import AsyncWebsocketConsumer
 from channels.db import database_sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
 import logging
+from .services.subscriptions import StatusSubscriptions
+from .utils.validation import parse_uuid
 
 logger = logging.getLogger(__name__)
 
@@ -9,20 +15,39 @@ logger = logging.getLogger(__name__)
 class StatusConsumer(AsyncWebsocketConsumer):
     """WebSocket consumer for real-time status updates"""
     
+    # How many recent sequence numbers to remember for de-duplication
+    SEEN_SEQS = 1024
+    
     async def connect(self):
-        self.room_group_name = 'status_updates'
+        # Fleet-wide worker updates until the client subscribes to something narrower
+        self.room_group_name = StatusSubscriptions.ALL_GROUP
+        self.subscriptions = set()
+        self.receives_all = True
+        # Overlapping subscriptions (a worker and its server) deliver the same delta twice
+        self._seen_order = deque()
+        self._seen = set()
         
         # Join room group
         await self.channel_layer.group_add(
             self.room_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_add(
+            StatusSubscriptions.FLEET_GROUP,
+            self.channel_name
+        )
         
         await self.accept()
         logger.info(f"WebSocket connected: {self.channel_name}")
         
-        # Send initial data
-        await self.send_initial_data()
+        # Clients reconnecting with ?since=<seq>&epoch=<epoch> only get what they missed
+        query = parse_qs(self.scope.get('query_string', b'').decode())
+        since = query.get('since', [None])[0]
+        epoch = query.get('epoch', [None])[0]
+        if since is not None and since.isdigit():
+            await self.resume(int(since), epoch)
+        else:
+            await self.send_initial_data()
     
     async def disconnect(self, close_code):
         # Leave room group
@@ -30,6 +55,12 @@ class StatusConsumer(AsyncWebsocketConsumer):
             self.room_group_name,
             self.channel_name
         )
+        await self.channel_layer.group_discard(
+            StatusSubscriptions.FLEET_GROUP,
+            self.channel_name
+        )
+        for group in list(getattr(self, 'subscriptions', ())):
+            await self.leave_group(group)
         logger.info(f"WebSocket disconnected: {self.channel_name}")
     
     async def receive(self, text_data):
@@ -38,71 +69,183 @@ class StatusConsumer(AsyncWebsocketConsumer):
             data = json.loads(text_data)
             action = data.get('action')
             
-            if action == 'subscribe':
-                # Client subscribing to specific entities
-                entity_type = data.get('entity_type')
-                entity_id = data.get('entity_id')
-                logger.info(f"Client subscribed to {entity_type} {entity_id}")
-                
+            if action in ('subscribe', 'unsubscribe'):
+                # Client narrowing (or widening) which entities it hears about
+                await self.update_subscription(
+                    action, data.get('entity_type'), data.get('entity_id')
+                )
+            
             elif action == 'refresh':
                 # Client requesting data refresh
                 await self.send_initial_data()
-                
+            
+            elif action == 'resume':
+                # Client asking for the deltas it missed
+                seq = data.get('seq')
+                if isinstance(seq, int):
+                    await self.resume(seq, data.get('epoch'))
+                else:
+                    await self.send_initial_data()
+            
             elif action == 'check_status':
                 # Client requesting immediate status check
                 server_id = data.get('server_id')
-                if server_id:
+                if server_id and parse_uuid(server_id) is None:
+                    await self.send_json({
+                        'type': 'error',
+                        'data': {'error': f"Invalid server id: {server_id}"},
+                    })
+                elif server_id:
                     result = await self.check_server_status(server_id)
-                    await self.send(text_data=json.dumps({
+                    await self.send_json({
                         'type': 'status_check_result',
                         'data': result,
-                    }))
-                    
+                    })
+        
         except json.JSONDecodeError:
             logger.error(f"Invalid JSON received: {text_data}")
     
     async def status_update(self, event):
         """Handle status update broadcast"""
-        await self.send(text_data=json.dumps({
+        await self.send_json({
             'type': 'status_update',
             'data': event['data'],
-        }))
+        })
+    
+    async def status_delta(self, event):
+        """Forward published deltas this socket has not already been sent"""
+        deltas = [d for d in event['data']['deltas'] if self.mark_seen(d['seq'])]
+        if not deltas:
+            return
+        await self.send_json({
+            'type': 'delta',
+            'data': {**event['data'], 'deltas': deltas},
+        })
+    
+    def mark_seen(self, seq) -> bool:
+        if seq in self._seen:
+            return False
+        self._seen.add(seq)
+        self._seen_order.append(seq)
+        if len(self._seen_order) > self.SEEN_SEQS:
+            self._seen.discard(self._seen_order.popleft())
+        return True
+    
+    async def update_subscription(self, action, entity_type, entity_id):
+        """Join or leave the group for one entity ('all' toggles the fleet-wide stream)"""
+        if entity_type == 'all':
+            await self.set_receives_all(action == 'subscribe')
+        else:
+            group = StatusSubscriptions.group_name(entity_type, entity_id)
+            if group is None:
+                await self.send_json({
+                    'type': 'error',
+                    'data': {'error': f"Cannot {action} to {entity_type} {entity_id}"},
+                })
+                return
+            
+            if action == 'subscribe' and group not in self.subscriptions:
+                await self.channel_layer.group_add(group, self.channel_name)
+                await database_sync_to_async(StatusSubscriptions.register)(group)
+                self.subscriptions.add(group)
+                # A narrow subscription replaces the fleet-wide worker stream
+                await self.set_receives_all(False)
+            elif action == 'unsubscribe' and group in self.subscriptions:
+                await self.leave_group(group)
+                if not self.subscriptions:
+                    await self.set_receives_all(True)
+        
+        logger.info(f"Client {action}d {entity_type} {entity_id}")
+        await self.send_json({
+            'type': f'{action}d',
+            'data': {
+                'entity_type': entity_type,
+                'entity_id': entity_id,
+                'subscriptions': sorted(self.subscriptions),
+                'all': self.receives_all,
+            },
+        })
+    
+    async def set_receives_all(self, enabled: bool):
+        if enabled == self.receives_all:
+            return
+        if enabled:
+            await self.channel_layer.group_add(self.room_group_name, self.channel_name)
+        else:
+            await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+        self.receives_all = enabled
+    
+    async def leave_group(self, group):
+        await self.channel_layer.group_discard(group, self.channel_name)
+        await database_sync_to_async(StatusSubscriptions.unregister)(group)
+        self.subscriptions.discard(group)
+    
+    async def send_json(self, message):
+        await self.send(text_data=json.dumps(message, cls=DjangoJSONEncoder))
     
     async def send_initial_data(self):
         """Send initial dashboard data to client"""
+        # Read the position first: deltas published while the snapshot is
+        # built are re-sent, and applying them twice is harmless
+        seq, epoch = await self.get_state_position()
         stats = await self.get_dashboard_stats()
         servers = await self.get_all_servers()
         workers = await self.get_all_workers()
         
-        await self.send(text_data=json.dumps({
+        await self.send_json({
             'type': 'initial_data',
             'data': {
+                'seq': seq,
+                'epoch': epoch,
                 'stats': stats,
                 'servers': servers,
                 'workers': workers,
             }
-        }))
+        })
+    
+    async def resume(self, since: int, epoch=None):
+        """Replay deltas after `since`, falling back to a snapshot when the log no longer covers it"""
+        deltas = await self.get_deltas_since(since, epoch)
+        if deltas is None:
+            await self.send_initial_data()
+            return
+        
+        seq, epoch = await self.get_state_position()
+        for delta in deltas:
+            self.mark_seen(delta['seq'])
+        await self.send_json({
+            'type': 'delta',
+            'data': {
+                'seq': max([seq] + [d['seq'] for d in deltas]),
+                'epoch': epoch,
+                'deltas': deltas,
+            }
+        })
+    
+    @database_sync_to_async
+    def get_state_position(self):
+        from .services import StatusStateStore
+        
+        return StatusStateStore.current_seq(), StatusStateStore.epoch()
+    
+    @database_sync_to_async
+    def get_deltas_since(self, since, epoch):
+        from .services import StatusStateStore
+        
+        return StatusStateStore.deltas_since(since, epoch)
     
     @database_sync_to_async
     def get_dashboard_stats(self):
-        from .models import Server, VirtualMachine, Worker
+        from .services import DashboardStatsService
         
-        return {
-            'total_servers': Server.objects.count(),
-            'online_servers': Server.objects.filter(status='online').count(),
-            'total_vms': VirtualMachine.objects.count(),
-            'running_vms': VirtualMachine.objects.filter(status='running').count(),
-            'total_workers': Worker.objects.count(),
-            'running_workers': Worker.objects.filter(status='running').count(),
-            'failed_workers': Worker.objects.filter(status='failed').count(),
-        }
+        return DashboardStatsService.get_stats()
     
     @database_sync_to_async
     def get_all_servers(self):
         from .models import Server
         from .serializers import ServerSerializer
         
-        servers = Server.objects.all()
+        servers = Server.objects.with_counts()
         return ServerSerializer(servers, many=True).data
     
     @database_sync_to_async
@@ -110,23 +253,137 @@ class StatusConsumer(AsyncWebsocketConsumer):
         from .models import Worker
         from .serializers import WorkerSerializer
         
-        workers = Worker.objects.all()[:50]  # Limit to 50 most recent
+        workers = Worker.objects.with_hosts()[:50]  # Limit to 50 most recent
         return WorkerSerializer(workers, many=True).data
     
+    async def check_server_status(self, server_id):
+        from .services import WorkerStatusService
+        
+        server = await self.get_server(server_id)
+        if server is None:
+            return {'error': 'Server not found'}
+        
+        # Probe over asyncio SSH so no thread-pool slot is held during the session
+        result = await WorkerStatusService(server).check_server_status_async()
+        server_data = await self.serialize_server(server)
+        
+        # Everyone else watching sees the change as a delta
+        delta = await self.publish_server(server_data)
+        if delta:
+            await self.channel_layer.group_send(StatusSubscriptions.FLEET_GROUP, {
+                'type': 'status_delta',
+                'data': {'seq': delta['seq'], 'deltas': [delta]},
+            })
+        
+        return {
+            'server': server_data,
+            'status_check': result,
+        }
+    
     @database_sync_to_async
-    def check_server_status(self, server_id):
+    def get_server(self, server_id):
         from .models import Server
-        from .services import WorkerStatusService
+        
+        server_uuid = parse_uuid(server_id)
+        if server_uuid is None:
+            return None
+        return Server.objects.with_counts().filter(id=server_uuid).first()
+    
+    @database_sync_to_async
+    def serialize_server(self, server):
         from .serializers import ServerSerializer
         
-        try:
-            server = Server.objects.get(id=server_id)
-            service = WorkerStatusService(server)
-            result = service.check_server_status()
-            return {
-                'server': ServerSerializer(server).data,
-                'status_check': result,
-            }
-        except Server.DoesNotExist:
-            return {'error': 'Server not found'}
+        return ServerSerializer(server).data
+    
+    @database_sync_to_async
+    def publish_server(self, server_data):
+        from .services import StatusStateStore
+        
+        return StatusStateStore.publish('server', server_data['id'], server_data)
+
 
+class WorkerLogsConsumer(AsyncWebsocketConsumer):
+    """Streams one worker container's logs, optionally following new output.
+    
+    Query parameters are `tail`, `follow`, `since` and `grep`. Each `logs`
+    message carries the lines from one read. {"action": "pause"} stops
+    reading from the host, so the SSH window fills and the remote
+    `docker logs` blocks, until {"action": "resume"}.
+    """
+    
+    async def connect(self):
+        self.stream_task = None
+        self.flowing = asyncio.Event()
+        self.flowing.set()
+        await self.accept()
+        
+        worker = await self.get_worker(self.scope['url_route']['kwargs']['worker_id'])
+        if worker is None:
+            await self.fail('Worker not found', 4404)
+            return
+        server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
+        if not server:
+            await self.fail('No server found', 4400)
+            return
+        
+        from .services import WorkerStatusService
+        
+        query = {key: values[-1] for key, values in parse_qs(self.scope.get('query_string', b'').decode()).items()}
+        try:
+            options = WorkerStatusService.parse_log_options(query)
+            stream = WorkerStatusService(server).stream_worker_logs_async(worker, **options)
+        except ValueError as e:
+            await self.fail(str(e), 4400)
+            return
+        
+        self.stream_task = asyncio.ensure_future(self.pump(stream))
+    
+    async def disconnect(self, close_code):
+        if self.stream_task:
+            self.stream_task.cancel()
+    
+    async def receive(self, text_data):
+        try:
+            action = json.loads(text_data).get('action')
+        except (json.JSONDecodeError, AttributeError):
+            logger.error(f"Invalid JSON received: {text_data}")
+            return
+        
+        if action == 'pause':
+            self.flowing.clear()
+        elif action == 'resume':
+            self.flowing.set()
+    
+    async def pump(self, stream):
+        """Forward log lines to the client, reading no further while it is paused"""
+        try:
+            async for lines in stream:
+                await self.flowing.wait()
+                if lines:
+                    await self.send_json({'type': 'logs', 'lines': lines})
+            await self.send_json({'type': 'end'})
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Log stream failed: {e}")
+            await self.send_json({'type': 'error', 'error': str(e)})
+        finally:
+            await stream.aclose()
+        await self.close()
+    
+    async def fail(self, error: str, code: int):
+        await self.send_json({'type': 'error', 'error': error})
+        await self.close(code=code)
+    
+    async def send_json(self, message):
+        await self.send(text_data=json.dumps(message, cls=DjangoJSONEncoder))
+    
+    @database_sync_to_async
+    def get_worker(self, worker_id):
+        from django.core.exceptions import ValidationError
+        from .models import Worker
+        
+        try:
+            return Worker.objects.select_related('server', 'virtual_machine__server').filter(id=worker_id).first()
+        except ValidationError:
+            return None
@@ -1,4 +1,7 @@
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 import uuid
 import logging
@@ -6,6 +9,41 @@ import logging
 logger = logging.getLogger(__name__)
 
 
+def _count_subquery(model, field: str):
+    """Correlated COUNT of `model` rows pointing at the outer row through `field`"""
+    counts = (
+        model.objects.filter(**{field: OuterRef('pk')})
+        .order_by()
+        .values(field)
+        .annotate(count=Count('pk'))
+        .values('count')
+    )
+    return Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+
+
+class ServerQuerySet(models.QuerySet):
+    def with_counts(self):
+        """Annotate workers_count and vms_count so listings don't count per row"""
+        return self.annotate(
+            workers_count=_count_subquery(Worker, 'server'),
+            vms_count=_count_subquery(VirtualMachine, 'server'),
+        )
+
+
+class VirtualMachineQuerySet(models.QuerySet):
+    def with_counts(self):
+        """Load the server and annotate workers_count in the same query"""
+        return self.select_related('server').annotate(
+            workers_count=_count_subquery(Worker, 'virtual_machine'),
+        )
+
+
+class WorkerQuerySet(models.QuerySet):
+    def with_hosts(self):
+        """Load the server and VM each worker runs on in the same query"""
+        return self.select_related('server', 'virtual_machine')
+
+
 class Server(models.Model):
     """Remote server that hosts VMs and workers"""
     
@@ -35,6 +73,8 @@ class Server(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ServerQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
     
@@ -97,6 +137,8 @@ class VirtualMachine(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = VirtualMachineQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
     
@@ -187,6 +229,8 @@ class Worker(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = WorkerQuerySet.as_manager()
+    
     class Meta:
         ordering = ['-created_at']
     
@@ -195,6 +239,49 @@ class Worker(models.Model):
         return f"{self.name} on {host}"
 
 
+class WorkerMetrics(models.Model):
+    """CPU and memory samples for one worker over one time bucket, packed into a single row.
+    
+    Raw rows hold every sample taken during one hour; rollup rows hold
+    per-slot min/max/sum for a longer span (see WorkerMetricsStore).
+    """
+    
+    RESOLUTIONS = [
+        ('raw', 'Raw'),
+        ('1m', '1 minute'),
+        ('1h', '1 hour'),
+        ('1d', '1 day'),
+    ]
+    
+    worker = models.ForeignKey(Worker, on_delete=models.CASCADE, related_name='metrics')
+    # Host the worker ran on, so VM and server series need no join
+    server = models.ForeignKey(Server, on_delete=models.CASCADE, related_name='+', null=True, blank=True)
+    virtual_machine = models.ForeignKey(
+        VirtualMachine, on_delete=models.CASCADE, related_name='+', null=True, blank=True
+    )
+    
+    resolution = models.CharField(max_length=4, choices=RESOLUTIONS)
+    bucket_start = models.DateTimeField()
+    samples = models.BinaryField(default=bytes)
+    count = models.IntegerField(default=0)  # records in samples
+    rolled_up = models.IntegerField(default=0)  # raw records already folded into rollups
+    
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['worker', 'resolution', 'bucket_start'], name='workermetrics_worker_bucket_uniq'
+            ),
+        ]
+        indexes = [
+            models.Index(fields=['server', 'resolution', 'bucket_start'], name='workermetrics_server_idx'),
+            models.Index(fields=['virtual_machine', 'resolution', 'bucket_start'], name='workermetrics_vm_idx'),
+            models.Index(fields=['resolution', 'bucket_start'], name='workermetrics_bucket_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.worker_id} {self.resolution} @ {self.bucket_start}"
+
+
 class StatusLog(models.Model):
     """Log of status changes for audit trail"""
     
@@ -216,7 +303,84 @@ class StatusLog(models.Model):
     
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            # Activity feed filtered by type, and one entity's history, newest first
+            models.Index(fields=['entity_type', '-created_at'], name='statuslog_type_created_idx'),
+            models.Index(fields=['entity_id', '-created_at'], name='statuslog_entity_created_idx'),
+            # Retention scans by age alone
+            models.Index(fields=['created_at'], name='statuslog_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.entity_type} {self.entity_id}: {self.old_status} -> {self.new_status}"
 
+
+class StatusLogDaily(models.Model):
+    """One entity's status transitions for one day, compacted from expired StatusLog rows"""
+    
+    entity_type = models.CharField(max_length=20, choices=StatusLog.ENTITY_TYPES)
+    entity_id = models.UUIDField()
+    day = models.DateField()
+    
+    transitions = models.IntegerField(default=0)
+    status_counts = models.JSONField(default=dict, blank=True)  # new_status -> transitions into it
+    last_status = models.CharField(max_length=20)
+    first_at = models.DateTimeField()
+    last_at = models.DateTimeField()
+    
+    class Meta:
+        ordering = ['-day']
+        constraints = [
+            models.UniqueConstraint(fields=['entity_id', 'day'], name='statuslogdaily_entity_day_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['entity_type', '-day'], name='statuslogdaily_type_day_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.entity_type} {self.entity_id} on {self.day}: {self.transitions} transitions"
+
+
+
+class Job(models.Model):
+    """Long-running operation requested through the API and run by Celery"""
+    
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('running', 'Running'),
+        ('succeeded', 'Succeeded'),
+        ('failed', 'Failed'),
+    ]
+    
+    TARGET_TYPES = [
+        ('server', 'Server'),
+        ('vm', 'Virtual Machine'),
+        ('worker', 'Worker'),
+    ]
+    
+    # Also used as the Celery task ID
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    kind = models.CharField(max_length=64)
+    
+    target_type = models.CharField(max_length=20, choices=TARGET_TYPES, blank=True)
+    target_id = models.UUIDField(null=True, blank=True)
+    
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    progress = models.IntegerField(default=0)  # percentage
+    message = models.CharField(max_length=255, blank=True)
+    result = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+    error = models.TextField(blank=True, null=True)
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        ordering = ['-created_at']
+    
+    def __str__(self):
+        return f"{self.kind} ({self.status})"
+    
+    @property
+    def finished(self) -> bool:
+        return self.status in ('succeeded', 'failed')
@@ -0,0 +1,22 @@
+from rest_framework.pagination import CursorPagination
+
+
+class StatusLogCursorPagination(CursorPagination):
+    """Keyset pagination over the status log, newest first.
+    
+    Each page seeks from the last row's created_at through the
+    (entity_type, created_at) / (entity_id, created_at) indexes, so deep
+    pages cost the same as the first one.
+    """
+    ordering = ('-created_at', '-id')
+    page_size = 50
+    page_size_query_param = 'limit'
+    max_page_size = 500
+
+
+class StatusLogDailyCursorPagination(CursorPagination):
+    """Keyset pagination over one entity's daily rollups, newest day first"""
+    ordering = ('-day',)
+    page_size = 90
+    page_size_query_param = 'limit'
+    max_page_size = 730
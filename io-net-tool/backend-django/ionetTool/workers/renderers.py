@@ -0,0 +1,33 @@
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+
+class NDJSONRenderer(BaseRenderer):
+    """One JSON document per line, so clients can handle records as they arrive"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+    
+    @staticmethod
+    def encode(item) -> str:
+        return json.dumps(item, cls=DjangoJSONEncoder) + '\n'
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        return ''.join(self.encode(item) for item in items).encode(self.charset)
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Server-sent events, one `data:` message per record"""
+    media_type = 'text/event-stream'
+    format = 'sse'
+    charset = 'utf-8'
+    
+    @staticmethod
+    def encode(item, event: str = 'message') -> str:
+        return f"event: {event}\ndata: {json.dumps(item, cls=DjangoJSONEncoder)}\n\n"
+    
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        items = data if isinstance(data, list) else [data]
+        return ''.join(self.encode(item) for item in items).encode(self.charset)
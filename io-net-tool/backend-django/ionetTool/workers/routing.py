@@ -3,5 +3,6 @@ from . import consumers
 
 websocket_urlpatterns = [
     re_path(r'ws/status/$', consumers.StatusConsumer.as_asgi()),
+    re_path(r'ws/workers/(?P<worker_id>[0-9a-f-]+)/logs/$', consumers.WorkerLogsConsumer.as_asgi()),
 ]
 
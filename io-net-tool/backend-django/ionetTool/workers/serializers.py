@@ -1,5 +1,5 @@
 from rest_framework import serializers
-from .models import Server, VirtualMachine, Worker, StatusLog
+from .models import Server, VirtualMachine, Worker, StatusLog, StatusLogDaily, Job
 
 
 class ServerSerializer(serializers.ModelSerializer):
@@ -20,10 +20,13 @@ class ServerSerializer(serializers.ModelSerializer):
         }
     
     def get_workers_count(self, obj):
-        return obj.workers.count()
+        # Annotated by Server.objects.with_counts(); count per row otherwise
+        count = getattr(obj, 'workers_count', None)
+        return count if count is not None else obj.workers.count()
     
     def get_vms_count(self, obj):
-        return obj.virtual_machines.count()
+        count = getattr(obj, 'vms_count', None)
+        return count if count is not None else obj.virtual_machines.count()
 
 
 class ServerCreateSerializer(serializers.ModelSerializer):
@@ -59,7 +62,9 @@ class VirtualMachineSerializer(serializers.ModelSerializer):
         }
     
     def get_workers_count(self, obj):
-        return obj.workers.count()
+        # Annotated by VirtualMachine.objects.with_counts(); count per row otherwise
+        count = getattr(obj, 'workers_count', None)
+        return count if count is not None else obj.workers.count()
 
 
 class VMCreateSerializer(serializers.Serializer):
@@ -73,6 +78,27 @@ class VMCreateSerializer(serializers.Serializer):
     ip_address = serializers.IPAddressField(required=False, allow_null=True)
 
 
+class VMSpecSerializer(serializers.Serializer):
+    name = serializers.RegexField(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$', max_length=64)
+    vcpus = serializers.IntegerField(default=2, min_value=1, max_value=32)
+    ram_mb = serializers.IntegerField(default=2048, min_value=512, max_value=65536)
+    disk_gb = serializers.IntegerField(default=10, min_value=5, max_value=500)
+    vm_username = serializers.CharField(default='vmadm', max_length=128)
+    vm_password = serializers.CharField(required=False, max_length=256)
+    ip_address = serializers.IPAddressField(required=False, allow_null=True)
+
+
+class VMBatchCreateSerializer(serializers.Serializer):
+    server_id = serializers.UUIDField()
+    vms = VMSpecSerializer(many=True, allow_empty=False, max_length=100)
+    
+    def validate_vms(self, vms):
+        names = [vm['name'] for vm in vms]
+        if len(names) != len(set(names)):
+            raise serializers.ValidationError("VM names must be unique")
+        return vms
+
+
 class WorkerSerializer(serializers.ModelSerializer):
     host_name = serializers.SerializerMethodField()
     host_type = serializers.SerializerMethodField()
@@ -118,12 +144,49 @@ class WorkerInstallSerializer(serializers.Serializer):
         return data
 
 
+class WorkerBulkActionSerializer(serializers.Serializer):
+    action = serializers.ChoiceField(choices=['start', 'stop', 'restart'])
+    ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    status = serializers.CharField(required=False)
+    server_id = serializers.UUIDField(required=False)
+    vm_id = serializers.UUIDField(required=False)
+    image = serializers.CharField(required=False)
+    mode = serializers.ChoiceField(choices=['batch', 'rolling'], default='batch')
+    max_unavailable = serializers.IntegerField(min_value=1, default=1)
+    
+    def validate(self, data):
+        if not any(data.get(key) for key in ('ids', 'status', 'server_id', 'vm_id', 'image')):
+            raise serializers.ValidationError(
+                "Either ids or at least one filter (status, server_id, vm_id, image) must be provided"
+            )
+        return data
+
+
 class StatusLogSerializer(serializers.ModelSerializer):
     class Meta:
         model = StatusLog
         fields = ['id', 'entity_type', 'entity_id', 'old_status', 'new_status', 'message', 'created_at']
 
 
+class StatusLogDailySerializer(serializers.ModelSerializer):
+    class Meta:
+        model = StatusLogDaily
+        fields = [
+            'entity_type', 'entity_id', 'day',
+            'transitions', 'status_counts', 'last_status', 'first_at', 'last_at',
+        ]
+
+
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = [
+            'id', 'kind', 'target_type', 'target_id',
+            'status', 'progress', 'message', 'result', 'error',
+            'created_at', 'started_at', 'finished_at',
+        ]
+
+
 class DashboardStatsSerializer(serializers.Serializer):
     total_servers = serializers.IntegerField()
     online_servers = serializers.IntegerField()
@@ -1,6 +1,24 @@
 from .ssh_service import SSHService
+from .async_ssh_service import AsyncSSHService
 from .worker_service import WorkerStatusService
 from .vm_service import VMService
+from .sweep_service import FleetSweepService, AsyncFleetSweepService, SweepResult
+from .dashboard_service import DashboardStatsService
+from .state_store import StatusStateStore
+from .subscriptions import StatusSubscriptions
+from .broadcast_service import BroadcastAggregator, DeltaBuffer
+from .scheduler_service import AdaptivePollScheduler, HostSchedule
+from .host_lock import HostLock, HostCheckTokens
+from .job_service import JobService
+from .status_log_service import StatusLogRetention
+from .metrics_service import WorkerMetricsStore
+from .bulk_action_service import BulkWorkerActionService
 
-__all__ = ['SSHService', 'WorkerStatusService', 'VMService']
-
+__all__ = [
+    'SSHService', 'AsyncSSHService', 'WorkerStatusService', 'VMService',
+    'FleetSweepService', 'AsyncFleetSweepService', 'SweepResult',
+    'DashboardStatsService', 'StatusStateStore', 'StatusSubscriptions',
+    'BroadcastAggregator', 'DeltaBuffer', 'AdaptivePollScheduler', 'HostSchedule',
+    'HostLock', 'HostCheckTokens', 'JobService', 'StatusLogRetention',
+    'WorkerMetricsStore', 'BulkWorkerActionService',
+]
@@ -0,0 +1,198 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Dict, List, Optional
+import asyncssh
+from .ssh_service import CommandResult, SSHOutputParser, VirshSnapshot
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncSSHService(SSHOutputParser):
+    """Asyncio counterpart of SSHService.
+    
+    Exposes the same probe surface as SSHService, but every call is a
+    coroutine, so thousands of host probes can share one event loop instead
+    of each holding a thread for the whole SSH session.
+    """
+    
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        port: int = 22,
+        connect_timeout: int = 30,
+        via: Optional['AsyncSSHService'] = None,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        self.connect_timeout = connect_timeout
+        self.via = via
+        self._conn: Optional[asyncssh.SSHClientConnection] = None
+    
+    async def connect(self) -> bool:
+        """Establish SSH connection"""
+        if self._conn:
+            return True
+        
+        try:
+            tunnel = None
+            if self.via is not None:
+                # Reach the host through the jump host's open connection
+                if not await self.via.connect():
+                    raise asyncssh.ChannelOpenError(
+                        asyncssh.OPEN_CONNECT_FAILED, f"Jump host {self.via.host} unavailable"
+                    )
+                tunnel = self.via._conn
+            
+            self._conn = await asyncssh.connect(
+                self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                known_hosts=None,
+                connect_timeout=self.connect_timeout,
+                tunnel=tunnel,
+            )
+            logger.info(f"Connected to {self.host}")
+            return True
+        except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+            logger.error(f"Failed to connect to {self.host}: {e}")
+            return False
+    
+    async def disconnect(self):
+        """Close SSH connection"""
+        if self._conn:
+            self._conn.close()
+            await self._conn.wait_closed()
+            self._conn = None
+            logger.info(f"Disconnected from {self.host}")
+    
+    async def execute(self, command: str, timeout: int = 60) -> CommandResult:
+        """Execute a command on the remote server"""
+        if not self._conn:
+            if not await self.connect():
+                return CommandResult(
+                    success=False,
+                    stdout="",
+                    stderr="Failed to connect",
+                    exit_code=-1
+                )
+        
+        try:
+            result = await asyncio.wait_for(
+                self._conn.run(command, check=False, errors='replace'),
+                timeout,
+            )
+            exit_code = result.exit_status if result.exit_status is not None else -1
+            
+            return CommandResult(
+                success=exit_code == 0,
+                stdout=result.stdout or "",
+                stderr=result.stderr or "",
+                exit_code=exit_code
+            )
+        except (OSError, asyncssh.Error, asyncio.TimeoutError) as e:
+            logger.error(f"Command execution failed on {self.host}: {e}")
+            return CommandResult(
+                success=False,
+                stdout="",
+                stderr=str(e) or e.__class__.__name__,
+                exit_code=-1
+            )
+    
+    async def execute_sudo(self, command: str, timeout: int = 60) -> CommandResult:
+        """Execute a command with sudo"""
+        sudo_command = f"echo '{self.password}' | sudo -S {command}"
+        return await self.execute(sudo_command, timeout)
+    
+    async def stream_lines(self, command: str, chunk_size: int = 32768) -> AsyncIterator[List[str]]:
+        """Run a command and yield its output lines (stderr merged in) as they arrive.
+        
+        Nothing is read ahead of the consumer, so asyncssh's flow control
+        pauses the remote command while the caller is busy.
+        """
+        if not self._conn and not await self.connect():
+            raise ConnectionError(f"Failed to connect to {self.host}")
+        
+        process = await self._conn.create_process(command, stderr=asyncssh.STDOUT, encoding=None)
+        try:
+            pending = b''
+            while True:
+                data = await process.stdout.read(chunk_size)
+                if not data:
+                    break
+                lines, pending = self._split_lines(pending, data)
+                if lines:
+                    yield lines
+            
+            if pending:
+                yield [pending.decode('utf-8', errors='replace')]
+        finally:
+            process.close()
+    
+    async def run_probes(self, probes: Dict[str, str], timeout: int = 60) -> Dict[str, CommandResult]:
+        """Run several commands in one round trip, returning a result per probe"""
+        marker, script = self._build_probe_script(probes)
+        result = await self.execute(script, timeout)
+        return self._split_probe_output(marker, probes, result)
+    
+    async def get_system_info(self) -> Dict:
+        """Get system information from the server"""
+        return self._parse_system_info(await self.run_probes(self.SYSTEM_PROBES))
+    
+    async def get_docker_containers(self, strict: bool = False) -> List[Dict]:
+        """Get list of Docker containers with their status (see SSHService.get_docker_containers)"""
+        result = await self.execute(self.DOCKER_PS_COMMAND)
+        
+        if not result.success:
+            logger.error(f"Failed to get containers: {result.stderr}")
+            if strict:
+                raise RuntimeError(f"docker ps failed: {result.stderr.strip() or f'exit code {result.exit_code}'}")
+            return []
+        
+        return self._parse_docker_ps(result.stdout)
+    
+    async def get_containers_stats(self, container_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Get stats for many containers with a single `docker stats` call"""
+        if container_ids is None:
+            container_ids = [
+                c['id'] for c in await self.get_ionet_workers() if c['state'] == 'running'
+            ]
+        if not container_ids:
+            return {}
+        
+        result = await self.execute(f"{self.DOCKER_STATS_COMMAND} {' '.join(container_ids)}")
+        
+        if not result.stdout:
+            logger.error(f"Failed to get container stats: {result.stderr}")
+            return {}
+        
+        return self._parse_docker_stats(result.stdout, container_ids)
+    
+    async def get_ionet_workers(self, strict: bool = False) -> List[Dict]:
+        """Get io.net worker containers specifically"""
+        return self._filter_ionet(await self.get_docker_containers(strict))
+    
+    async def check_virsh_vms(self) -> List[Dict]:
+        """Get list of KVM/QEMU VMs via virsh"""
+        result = await self.execute(self.VIRSH_LIST_COMMAND)
+        
+        if not result.success:
+            logger.error(f"Failed to get VMs: {result.stderr}")
+            return []
+        
+        return self._parse_virsh_list(result.stdout)
+    
+    async def get_virsh_snapshot(self) -> VirshSnapshot:
+        """Get every VM's state and IP address in a single round trip"""
+        return self._parse_virsh_snapshot(await self.run_probes(self.VIRSH_SNAPSHOT_PROBES))
+    
+    async def __aenter__(self):
+        await self.connect()
+        return self
+    
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.disconnect()
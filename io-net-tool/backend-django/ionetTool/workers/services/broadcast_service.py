@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+EntityKey = Tuple[str, str]
+
+
+class BroadcastAggregator:
+    """Buffers state deltas during a sweep and sends them in coalesced batches.
+    
+    Deltas are queued per group from any thread. Every ``interval`` seconds a
+    single background event loop sends one ``status_delta`` message per group
+    that has pending updates. Several deltas for the same entity within a
+    tick collapse into one that carries the newest sequence number.
+    Use it as a context manager so the last batch is flushed on exit.
+    """
+    
+    def __init__(self, channel_layer, interval: Optional[float] = None):
+        self.channel_layer = channel_layer
+        self.interval = interval if interval is not None else getattr(settings, 'STATUS_BROADCAST_INTERVAL', 0.25)
+        
+        self._lock = threading.Lock()
+        self._pending: Dict[str, "OrderedDict[EntityKey, Dict]"] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stop: Optional[asyncio.Event] = None
+        self._thread: Optional[threading.Thread] = None
+        self._ready = threading.Event()
+        self.sent = 0
+    
+    def start(self) -> 'BroadcastAggregator':
+        """Start the flushing loop in a background thread"""
+        if self._thread is None and self.channel_layer is not None:
+            self._thread = threading.Thread(target=self._run, name='status-broadcast', daemon=True)
+            self._thread.start()
+            self._ready.wait()
+        return self
+    
+    def add(self, group: str, deltas: List[Dict]):
+        """Queue deltas for a group; superseded updates to the same entity are merged"""
+        if self.channel_layer is None or not deltas:
+            return
+        with self._lock:
+            pending = self._pending.setdefault(group, OrderedDict())
+            for delta in deltas:
+                key = (delta['entity'], delta['id'])
+                previous = pending.pop(key, None)
+                pending[key] = self._merge(previous, delta) if previous else delta
+    
+    def close(self):
+        """Flush whatever is still queued and stop the loop"""
+        if self._thread is None:
+            return
+        self._loop.call_soon_threadsafe(self._stop.set)
+        self._thread.join()
+        self._thread = None
+    
+    def __enter__(self):
+        return self.start()
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+    
+    def _run(self):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._loop.run_until_complete(self._flush_forever())
+        finally:
+            self._loop.close()
+    
+    async def _flush_forever(self):
+        self._stop = asyncio.Event()
+        self._ready.set()
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            await self._flush()
+        # Anything queued between the last tick and close()
+        await self._flush()
+    
+    async def _flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        
+        for group, entries in pending.items():
+            deltas = sorted(entries.values(), key=lambda d: d['seq'])
+            try:
+                await self.channel_layer.group_send(group, {
+                    'type': 'status_delta',
+                    'data': {
+                        'seq': deltas[-1]['seq'],
+                        'deltas': deltas,
+                    }
+                })
+                self.sent += 1
+            except Exception as e:
+                logger.error(f"Error broadcasting {len(deltas)} updates to {group}: {e}")
+    
+    @staticmethod
+    def _merge(previous: Dict, delta: Dict) -> Dict:
+        if delta['op'] == 'remove' or previous['op'] == 'remove':
+            return delta
+        return {**delta, 'changes': {**previous['changes'], **delta['changes']}}
+
+
+class DeltaBuffer:
+    """Collects deltas per group without sending them, for a caller to hand on.
+    
+    Per-host check subtasks fill one and return its ``groups`` with their
+    result, so the sweep's chord callback sends the whole sweep through a
+    single BroadcastAggregator.
+    """
+    
+    def __init__(self):
+        self.groups: Dict[str, List[Dict]] = {}
+    
+    def add(self, group: str, deltas: List[Dict]):
+        if deltas:
+            self.groups.setdefault(group, []).extend(deltas)
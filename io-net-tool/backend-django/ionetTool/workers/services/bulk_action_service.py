@@ -0,0 +1,269 @@
+import logging
+import math
+import shlex
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from ..models import Worker, StatusLog
+from .dashboard_service import DashboardStatsService
+from .ssh_service import SSHService
+from .sweep_service import FleetSweepService
+from .worker_service import WorkerStatusService
+
+logger = logging.getLogger(__name__)
+
+
+class BulkWorkerActionService:
+    """Starts, stops or restarts many worker containers with one SSH session per server.
+    
+    Workers are grouped by the host their container runs on: the server
+    itself, or a VM reached through a tunnel over the server's connection.
+    Each host gets one ``docker <action> id1 id2 ...`` in batch mode, or
+    chunks of ``max_unavailable`` containers in rolling mode, where a chunk
+    must come back running before the next one is touched. Servers are
+    handled in parallel, up to WORKER_BULK_CONCURRENCY at a time.
+    """
+    
+    ACTIONS = {
+        'start': 'running',
+        'stop': 'inactive',
+        'restart': 'running',
+    }
+    MODES = ('batch', 'rolling')
+    
+    # docker handles the containers of one command one after another, each
+    # stop waiting up to its 10s grace period
+    SECONDS_PER_CONTAINER = 15
+    # Kept back from WORKER_BULK_HOST_TIMEOUT so a server's commands end before the sweep gives up on it
+    HOST_MARGIN = 5
+    
+    def __init__(
+        self,
+        action: str,
+        mode: str = 'batch',
+        max_unavailable: int = 1,
+        progress: Optional[Callable] = None,
+    ):
+        if action not in self.ACTIONS:
+            raise ValueError(f"Unknown action: {action}")
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown mode: {mode}")
+        self.action = action
+        self.mode = mode
+        self.max_unavailable = max(1, max_unavailable)
+        self.progress = progress or (lambda progress, message='': None)
+        self.host_timeout = getattr(settings, 'WORKER_BULK_HOST_TIMEOUT', 300)
+    
+    def run(self, worker_ids: List[str]) -> Dict:
+        """Apply the action to every worker and report an outcome per worker"""
+        workers = list(
+            Worker.objects.filter(id__in=worker_ids)
+            .select_related('server', 'virtual_machine__server')
+        )
+        outcomes: Dict[str, Dict] = {}
+        by_server: Dict = {}
+        groups: Dict = defaultdict(lambda: defaultdict(list))
+        
+        for worker in workers:
+            server = worker.virtual_machine.server if worker.virtual_machine else worker.server
+            if not server:
+                outcomes[str(worker.id)] = self._outcome(worker, False, 'No server found')
+            elif not worker.container_id:
+                outcomes[str(worker.id)] = self._outcome(worker, False, 'No container ID')
+            else:
+                by_server[str(server.id)] = server
+                groups[str(server.id)][worker.virtual_machine].append(worker)
+        
+        concurrency = getattr(settings, 'WORKER_BULK_CONCURRENCY', 16)
+        sweep = FleetSweepService(
+            max_workers=concurrency,
+            host_timeout=self.host_timeout,
+            # Every server gets its full timeout even when it has to wait for a slot
+            deadline=self.host_timeout * math.ceil(len(by_server) / concurrency) + 5,
+        )
+        
+        def run_server(server):
+            return self._run_server(server, groups[str(server.id)])
+        
+        done = 0
+        for host in sweep.iter_sweep(by_server.values(), run_server):
+            done += 1
+            if host.ok:
+                outcomes.update(host.result)
+            else:
+                for host_workers in groups[host.server_id].values():
+                    for worker in host_workers:
+                        outcomes[str(worker.id)] = self._outcome(worker, False, host.error or host.status)
+            self.progress(int(done * 100 / len(by_server)), f"{done}/{len(by_server)} servers done")
+        
+        self._save(workers, outcomes)
+        
+        results = [outcomes[str(worker.id)] for worker in workers if str(worker.id) in outcomes]
+        failed = sum(1 for r in results if not r['success'])
+        missing = [worker_id for worker_id in map(str, worker_ids) if worker_id not in outcomes]
+        return {
+            'success': failed == 0 and not missing,
+            'action': self.action,
+            'mode': self.mode,
+            'total': len(results),
+            'succeeded': len(results) - failed,
+            'failed': failed,
+            'servers': len(by_server),
+            'missing': missing,
+            'results': results,
+        }
+    
+    def _run_server(self, server, groups: Dict) -> Dict[str, Dict]:
+        """Run every host's batches on one server over a single pooled connection"""
+        outcomes: Dict[str, Dict] = {}
+        deadline = time.monotonic() + self.host_timeout - self.HOST_MARGIN
+        service = WorkerStatusService(server)
+        try:
+            if not service.connect():
+                for host_workers in groups.values():
+                    outcomes.update(self._fail_all(host_workers, 'Connection failed'))
+                return outcomes
+            
+            for vm, host_workers in groups.items():
+                if vm is None:
+                    outcomes.update(self._run_host(service.ssh, host_workers, deadline))
+                else:
+                    outcomes.update(self._run_vm(service.ssh, vm, host_workers, deadline))
+            return outcomes
+        finally:
+            service.disconnect()
+    
+    def _run_vm(self, via: SSHService, vm, host_workers: List[Worker], deadline: float) -> Dict[str, Dict]:
+        if not vm.ip_address:
+            return self._fail_all(host_workers, 'VM has no IP address')
+        
+        try:
+            vm_ssh = SSHService(
+                host=vm.ip_address,
+                username=vm.vm_username,
+                password=vm.get_vm_password(),
+                port=22,
+                via=via,
+            )
+            if not vm_ssh.connect():
+                return self._fail_all(host_workers, f'Connection to VM {vm.name} failed')
+        except Exception as e:
+            logger.error(f"Error connecting to VM {vm.name}: {e}")
+            return self._fail_all(host_workers, str(e))
+        
+        try:
+            return self._run_host(vm_ssh, host_workers, deadline)
+        finally:
+            vm_ssh.disconnect()
+    
+    def _run_host(self, ssh: SSHService, host_workers: List[Worker], deadline: float) -> Dict[str, Dict]:
+        """Apply the action to one host's containers, all at once or chunk by chunk"""
+        size = self.max_unavailable if self.mode == 'rolling' else len(host_workers)
+        chunks = [host_workers[i:i + size] for i in range(0, len(host_workers), size)]
+        
+        outcomes: Dict[str, Dict] = {}
+        for index, chunk in enumerate(chunks):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                for rest in chunks[index:]:
+                    outcomes.update(self._fail_all(rest, 'Skipped: the time allowed for this server ran out'))
+                break
+            chunk_outcomes = self._run_chunk(ssh, chunk, remaining)
+            outcomes.update(chunk_outcomes)
+            
+            if self.mode == 'rolling' and not all(o['success'] for o in chunk_outcomes.values()):
+                # Going on would leave more than max_unavailable containers down
+                for rest in chunks[index + 1:]:
+                    outcomes.update(self._fail_all(rest, 'Skipped: an earlier batch on this host failed'))
+                break
+        return outcomes
+    
+    def _run_chunk(self, ssh: SSHService, chunk: List[Worker], remaining: float) -> Dict[str, Dict]:
+        ids = ' '.join(shlex.quote(worker.container_id) for worker in chunk)
+        timeout = round(min(remaining, 60 + self.SECONDS_PER_CONTAINER * len(chunk)), 1)
+        # A chunk that times out is reported failed, so stop it carrying on behind our back
+        result = ssh.execute(f"docker {self.action} {ids}", timeout=timeout, kill_on_timeout=True)
+        
+        # docker echoes each container it handled and reports the others on
+        # stderr. After a timeout the containers echoed so far still count as
+        # done; the rest report the timeout.
+        handled = set(result.stdout.split())
+        errors = result.stderr.splitlines()
+        
+        running = None
+        if self.mode == 'rolling' and self.ACTIONS[self.action] == 'running' and handled:
+            running = self._running_containers(ssh, chunk)
+        
+        outcomes = {}
+        for worker in chunk:
+            if worker.container_id not in handled:
+                error = next((line for line in errors if worker.container_id in line), None)
+                outcomes[str(worker.id)] = self._outcome(worker, False, error or result.stderr.strip() or 'Command failed')
+            elif running is not None and worker.container_id not in running:
+                outcomes[str(worker.id)] = self._outcome(worker, False, 'Container is not running after the action')
+            else:
+                outcomes[str(worker.id)] = self._outcome(worker, True)
+        return outcomes
+    
+    def _running_containers(self, ssh: SSHService, chunk: List[Worker]) -> set:
+        """Container IDs from the chunk that docker reports as running"""
+        ids = ' '.join(shlex.quote(worker.container_id) for worker in chunk)
+        result = ssh.execute(
+            f"docker inspect -f '{{{{.Id}}}} {{{{.State.Running}}}}' {ids}", timeout=60, kill_on_timeout=True,
+        )
+        
+        running = set()
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if len(parts) == 2 and parts[1] == 'true':
+                running.update(w.container_id for w in chunk if parts[0].startswith(w.container_id))
+        return running
+    
+    def _save(self, workers: List[Worker], outcomes: Dict[str, Dict]):
+        """Write the new status of every worker the action succeeded on"""
+        now = timezone.now()
+        new_status = self.ACTIONS[self.action]
+        to_update, logs = [], []
+        
+        for worker in workers:
+            outcome = outcomes.get(str(worker.id))
+            if not outcome or not outcome['success']:
+                continue
+            if worker.status != new_status:
+                logs.append(StatusLog(
+                    entity_type='worker',
+                    entity_id=worker.id,
+                    old_status=worker.status,
+                    new_status=new_status,
+                    message=f'Bulk {self.action}',
+                ))
+            worker.status = new_status
+            worker.updated_at = now
+            if new_status == 'running':
+                worker.last_seen = now
+            to_update.append(worker)
+        
+        with transaction.atomic():
+            if to_update:
+                Worker.objects.bulk_update(to_update, ['status', 'last_seen', 'updated_at'], batch_size=500)
+            if logs:
+                StatusLog.objects.bulk_create(logs, batch_size=500)
+                DashboardStatsService.invalidate()
+    
+    def _fail_all(self, host_workers: List[Worker], error: str) -> Dict[str, Dict]:
+        return {str(worker.id): self._outcome(worker, False, error) for worker in host_workers}
+    
+    def _outcome(self, worker: Worker, success: bool, error: Optional[str] = None) -> Dict:
+        server_id = worker.virtual_machine.server_id if worker.virtual_machine else worker.server_id
+        return {
+            'worker_id': str(worker.id),
+            'name': worker.name,
+            'container_id': worker.container_id,
+            'server_id': str(server_id) if server_id else None,
+            'vm_id': str(worker.virtual_machine_id) if worker.virtual_machine_id else None,
+            'success': success,
+            'error': error,
+        }
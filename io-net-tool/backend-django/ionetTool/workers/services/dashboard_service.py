@@ -0,0 +1,60 @@
+import logging
+from typing import Dict
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, Q
+from ..models import Server, VirtualMachine, Worker
+
+logger = logging.getLogger(__name__)
+
+
+class DashboardStatsService:
+    """Fleet-wide dashboard counters, computed with one aggregate per model and cached.
+    
+    The cached value is dropped whenever a server, VM or worker is created,
+    deleted or changes status (see workers.signals and WorkerReconciler), so
+    dashboards and WebSocket clients read from the cache between changes.
+    """
+    
+    CACHE_KEY = 'workers:dashboard_stats'
+    
+    @classmethod
+    def get_stats(cls) -> Dict[str, int]:
+        """Dashboard stats, from the cache when fresh"""
+        stats = cache.get(cls.CACHE_KEY)
+        if stats is None:
+            stats = cls.compute()
+            cache.set(cls.CACHE_KEY, stats, getattr(settings, 'DASHBOARD_STATS_CACHE_TTL', 30))
+        return stats
+    
+    @classmethod
+    def compute(cls) -> Dict[str, int]:
+        """Count everything the dashboard shows, one query per model"""
+        servers = Server.objects.aggregate(
+            total_servers=Count('id'),
+            online_servers=Count('id', filter=Q(status='online')),
+        )
+        vms = VirtualMachine.objects.aggregate(
+            total_vms=Count('id'),
+            running_vms=Count('id', filter=Q(status='running')),
+        )
+        workers = Worker.objects.aggregate(
+            total_workers=Count('id'),
+            running_workers=Count('id', filter=Q(status='running')),
+            failed_workers=Count('id', filter=Q(status='failed')),
+        )
+        return {**servers, **vms, **workers}
+    
+    @classmethod
+    def invalidate(cls):
+        """Drop the cached stats once the current transaction commits"""
+        # Deleting before commit would let a concurrent reader re-cache the old counts
+        transaction.on_commit(cls._delete)
+    
+    @classmethod
+    def _delete(cls):
+        try:
+            cache.delete(cls.CACHE_KEY)
+        except Exception as e:
+            logger.warning(f"Failed to invalidate dashboard stats: {e}")
@@ -0,0 +1,95 @@
+import uuid
+from typing import Optional
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+# Delete KEYS[1] only while it still holds ARGV[1], in one round trip
+_DELETE_IF_EQUAL = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+def delete_if_equal(key: str, value) -> bool:
+    """Delete a cache key only if it still holds ``value``.
+    
+    On Redis the check and the delete run as one script, so a lock that
+    expired and was taken by someone else is never deleted. Other backends
+    have no compare-and-delete; there the window between get and delete
+    remains and the other holder's lock TTL covers it.
+    """
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if isinstance(backend, RedisCache):
+        full_key = backend.make_and_validate_key(key)
+        client = backend._cache.get_client(full_key, write=True)
+        return bool(client.eval(_DELETE_IF_EQUAL, 1, full_key, backend._cache._serializer.dumps(value)))
+    
+    if cache.get(key) != value:
+        return False
+    cache.delete(key)
+    return True
+
+
+class HostLock:
+    """Cache-backed lock so a server is probed by only one task at a time.
+    
+    The lock expires on its own after ``timeout`` seconds, so a worker that
+    dies mid-check cannot block the host forever. Only the holder's token
+    releases it.
+    """
+    
+    PREFIX = 'workers:host_lock'
+    
+    def __init__(self, server_id, timeout: Optional[float] = None):
+        self.server_id = str(server_id)
+        self.key = f'{self.PREFIX}:{server_id}'
+        self.timeout = timeout or getattr(settings, 'HOST_LOCK_TIMEOUT', 60)
+        self.token = uuid.uuid4().hex
+        self.held = False
+    
+    def acquire(self) -> bool:
+        self.held = cache.add(self.key, self.token, self.timeout)
+        return self.held
+    
+    def release(self):
+        if self.held:
+            delete_if_equal(self.key, self.token)
+        self.held = False
+    
+    def __enter__(self) -> 'HostLock':
+        self.acquire()
+        return self
+    
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
+
+
+class HostCheckTokens:
+    """Latest dispatch token per (check, server).
+    
+    Each sweep issues a new token for every host it queues; a subtask that
+    starts after a newer sweep queued the same host is superseded and
+    returns without connecting.
+    """
+    
+    PREFIX = 'workers:host_check'
+    TTL = 3600
+    
+    @classmethod
+    def issue(cls, check: str, server_id) -> str:
+        token = uuid.uuid4().hex
+        cache.set(cls._key(check, server_id), token, cls.TTL)
+        return token
+    
+    @classmethod
+    def is_current(cls, check: str, server_id, token: str) -> bool:
+        current = cache.get(cls._key(check, server_id))
+        # A missing token (expired or cache reset) never blocks a check
+        return current is None or current == token
+    
+    @classmethod
+    def _key(cls, check: str, server_id) -> str:
+        return f'{cls.PREFIX}:{check}:{server_id}'
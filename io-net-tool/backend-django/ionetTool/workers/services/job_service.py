@@ -0,0 +1,103 @@
+import logging
+from typing import Any
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+from ..models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class JobService:
+    """Creates jobs for Celery tasks and records their progress.
+    
+    A job shares its ID with the Celery task that runs it. Every change is
+    published as a 'job' delta on the fleet WebSocket group, so clients see
+    progress without polling; GET /api/jobs/<id>/ serves the same record.
+    """
+    
+    @classmethod
+    def enqueue(cls, task, kind: str, target=None, **kwargs) -> Job:
+        """Create a job and queue `task` for it once the transaction commits"""
+        job = Job.objects.create(
+            kind=kind,
+            target_type=cls._target_type(target),
+            target_id=target.pk if target is not None else None,
+        )
+        transaction.on_commit(lambda: task.apply_async(kwargs=kwargs, task_id=str(job.id)))
+        cls.publish(job)
+        return job
+    
+    @classmethod
+    def start(cls, job_id):
+        cls._update(job_id, status='running', started_at=timezone.now(), message='Started')
+    
+    @classmethod
+    def progress(cls, job_id, progress: int, message: str = ''):
+        cls._update(job_id, progress=max(0, min(100, int(progress))), message=message[:255])
+    
+    @classmethod
+    def finish(cls, job_id, result: Any):
+        # Services report most failures as {'success': False, 'error': ...}
+        error = result.get('error') if isinstance(result, dict) else None
+        failed = error or (isinstance(result, dict) and result.get('success') is False)
+        cls._update(
+            job_id,
+            status='failed' if failed else 'succeeded',
+            progress=100,
+            message='Failed' if failed else 'Done',
+            result=result,
+            error=str(error) if error else None,
+            finished_at=timezone.now(),
+        )
+    
+    @classmethod
+    def fail(cls, job_id, error: str):
+        cls._update(
+            job_id,
+            status='failed',
+            message='Failed',
+            error=error,
+            finished_at=timezone.now(),
+        )
+    
+    @classmethod
+    def progress_callback(cls, job_id):
+        """Callable for services to report (percent, message) on a job"""
+        return lambda progress, message='': cls.progress(job_id, progress, message)
+    
+    @classmethod
+    def publish(cls, job: Job):
+        """Send the job's changed fields to WebSocket clients"""
+        from ..serializers import JobSerializer
+        from .state_store import StatusStateStore
+        from .subscriptions import StatusSubscriptions
+        
+        channel_layer = get_channel_layer()
+        try:
+            delta = StatusStateStore.publish('job', job.id, JobSerializer(job).data)
+            if delta and channel_layer is not None:
+                async_to_sync(channel_layer.group_send)(StatusSubscriptions.FLEET_GROUP, {
+                    'type': 'status_delta',
+                    'data': {'seq': delta['seq'], 'deltas': [delta]},
+                })
+        except Exception as e:
+            logger.error(f"Error publishing job {job.id}: {e}")
+    
+    @classmethod
+    def _update(cls, job_id, **fields):
+        # Tasks queued without a job (beat, chords) have no row to update
+        if not Job.objects.filter(id=job_id).update(**fields):
+            return
+        cls.publish(Job.objects.get(id=job_id))
+    
+    @staticmethod
+    def _target_type(target) -> str:
+        if target is None:
+            return ''
+        return {
+            'Server': 'server',
+            'VirtualMachine': 'vm',
+            'Worker': 'worker',
+        }.get(type(target).__name__, '')
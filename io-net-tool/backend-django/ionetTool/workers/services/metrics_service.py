@@ -0,0 +1,299 @@
+import logging
+import struct
+from datetime import datetime, timedelta, timezone as dt_timezone
+from typing import Dict, List, Optional, Tuple
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+from ..models import WorkerMetrics
+
+logger = logging.getLogger(__name__)
+
+# (worker_id, server_id, vm_id, cpu_percent, memory_bytes)
+Sample = Tuple
+
+
+class WorkerMetricsStore:
+    """Packed time series of worker CPU and memory usage.
+    
+    Every sweep appends one raw record (seconds into the hour, CPU %, memory
+    bytes) to the worker's row for the current hour. rollup() folds records
+    not rolled up yet into 1m, 1h and 1d rows, whose records hold
+    (slot offset, count, CPU min/max/sum, memory min/max/sum) for each slot.
+    Rows are read with values_list and decoded with struct.iter_unpack,
+    never as model instances.
+    """
+    
+    RAW = struct.Struct('<Ifd')
+    ROLLUP = struct.Struct('<IIffdddd')
+    
+    # Seconds covered by one row of each resolution, and by one slot in it
+    SPANS = {'raw': 3600, '1m': 86400, '1h': 7 * 86400, '1d': 364 * 86400}
+    STEPS = {'raw': None, '1m': 60, '1h': 3600, '1d': 86400}
+    ROLLUPS = ('1m', '1h', '1d')
+    
+    LOCK_KEY = 'workers:metrics_rollup:lock'
+    BATCH_SIZE = 500
+    
+    @classmethod
+    def record(cls, samples: List[Sample], at: Optional[datetime] = None) -> int:
+        """Append one sample per worker to its raw row for the current hour"""
+        if not samples:
+            return 0
+        
+        ts = (at or timezone.now()).timestamp()
+        bucket = cls._bucket(ts, 'raw')
+        bucket_start = cls._to_datetime(bucket)
+        offset = int(ts - bucket)
+        by_worker = {str(sample[0]): sample for sample in samples}
+        
+        with transaction.atomic():
+            existing = {
+                str(worker_id): (pk, bytes(packed), count)
+                for pk, worker_id, packed, count in WorkerMetrics.objects.select_for_update().filter(
+                    resolution='raw', bucket_start=bucket_start, worker_id__in=list(by_worker),
+                ).values_list('id', 'worker_id', 'samples', 'count')
+            }
+            
+            to_create, to_update = [], []
+            for worker_id, (_, server_id, vm_id, cpu, memory) in by_worker.items():
+                record = cls.RAW.pack(offset, cpu, memory)
+                if worker_id in existing:
+                    pk, packed, count = existing[worker_id]
+                    to_update.append(WorkerMetrics(id=pk, samples=packed + record, count=count + 1))
+                else:
+                    to_create.append(WorkerMetrics(
+                        worker_id=worker_id,
+                        server_id=server_id,
+                        virtual_machine_id=vm_id,
+                        resolution='raw',
+                        bucket_start=bucket_start,
+                        samples=record,
+                        count=1,
+                    ))
+            
+            WorkerMetrics.objects.bulk_create(to_create, batch_size=cls.BATCH_SIZE)
+            WorkerMetrics.objects.bulk_update(to_update, ['samples', 'count'], batch_size=cls.BATCH_SIZE)
+        
+        return len(by_worker)
+    
+    @classmethod
+    def rollup(cls) -> Dict:
+        """Fold raw records that have not been rolled up yet into the 1m, 1h and 1d rows"""
+        if not cache.add(cls.LOCK_KEY, True, 300):
+            return {'rolled_up': 0, 'skipped': 'busy'}
+        
+        try:
+            pending = WorkerMetrics.objects.filter(
+                resolution='raw', rolled_up__lt=F('count'),
+            ).order_by('bucket_start').values_list(
+                'id', 'worker_id', 'server_id', 'virtual_machine_id',
+                'bucket_start', 'samples', 'count', 'rolled_up',
+            )
+            
+            rolled_up = 0
+            while True:
+                rows = list(pending[:cls.BATCH_SIZE])
+                if not rows:
+                    break
+                rolled_up += cls._fold(rows)
+            return {'rolled_up': rolled_up}
+        finally:
+            cache.delete(cls.LOCK_KEY)
+    
+    @classmethod
+    def prune(cls, now: Optional[datetime] = None) -> int:
+        """Delete rows that have aged out of their resolution's retention"""
+        now = now or timezone.now()
+        retention = {
+            'raw': timedelta(hours=getattr(settings, 'METRICS_RAW_RETENTION_HOURS', 48)),
+            '1m': timedelta(days=getattr(settings, 'METRICS_MINUTE_RETENTION_DAYS', 7)),
+            '1h': timedelta(days=getattr(settings, 'METRICS_HOUR_RETENTION_DAYS', 90)),
+        }
+        
+        deleted = 0
+        for resolution, keep in retention.items():
+            # A row expires once the newest sample it can hold is past retention
+            expired = WorkerMetrics.objects.filter(
+                resolution=resolution,
+                bucket_start__lt=now - keep - timedelta(seconds=cls.SPANS[resolution]),
+            )
+            if resolution == 'raw':
+                expired = expired.filter(rolled_up=F('count'))
+            count, _ = expired.delete()
+            deleted += count
+        return deleted
+    
+    @classmethod
+    def pick_resolution(cls, start: datetime, end: datetime) -> str:
+        """Coarsest resolution that still gives a useful number of points for the range"""
+        seconds = (end - start).total_seconds()
+        if seconds <= 3 * 3600:
+            return 'raw'
+        if seconds <= 2 * 86400:
+            return '1m'
+        if seconds <= 60 * 86400:
+            return '1h'
+        return '1d'
+    
+    @classmethod
+    def series(
+        cls,
+        start: datetime,
+        end: datetime,
+        resolution: str = 'auto',
+        worker_id=None,
+        vm_id=None,
+        server_id=None,
+    ) -> Dict:
+        """Column arrays for one worker, or totals over a VM's or server's workers"""
+        if resolution == 'auto':
+            resolution = cls.pick_resolution(start, end)
+        
+        rows = WorkerMetrics.objects.filter(
+            resolution=resolution,
+            bucket_start__gte=cls._to_datetime(cls._bucket(start.timestamp(), resolution)),
+            bucket_start__lte=end,
+        )
+        if worker_id:
+            rows = rows.filter(worker_id=worker_id)
+        if vm_id:
+            rows = rows.filter(virtual_machine_id=vm_id)
+        if server_id:
+            rows = rows.filter(server_id=server_id)
+        
+        lo, hi = start.timestamp(), end.timestamp()
+        # t -> [samples, cpu_min, cpu_max, cpu_avg, memory_min, memory_max, memory_avg]
+        points: Dict[int, List[float]] = {}
+        for bucket_start, packed in rows.values_list('bucket_start', 'samples').iterator():
+            base = int(bucket_start.timestamp())
+            if resolution == 'raw':
+                records = ((offset, 1, cpu, cpu, cpu, mem, mem, mem)
+                           for offset, cpu, mem in cls.RAW.iter_unpack(bytes(packed)))
+            else:
+                records = cls.ROLLUP.iter_unpack(bytes(packed))
+            
+            for offset, count, cpu_min, cpu_max, cpu_sum, mem_min, mem_max, mem_sum in records:
+                t = base + offset
+                if not lo <= t <= hi:
+                    continue
+                # Several workers in one slot add up to the host's total
+                point = points.setdefault(t, [0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0])
+                point[0] += count
+                point[1] += cpu_min
+                point[2] += cpu_max
+                point[3] += cpu_sum / count
+                point[4] += mem_min
+                point[5] += mem_max
+                point[6] += mem_sum / count
+        
+        times = sorted(points)
+        columns = list(zip(*(points[t] for t in times))) or [()] * 7
+        return {
+            'resolution': resolution,
+            'step': cls.STEPS[resolution],
+            'start': start,
+            'end': end,
+            't': times,
+            'samples': list(columns[0]),
+            'cpu_min': [round(v, 2) for v in columns[1]],
+            'cpu_max': [round(v, 2) for v in columns[2]],
+            'cpu_avg': [round(v, 2) for v in columns[3]],
+            'memory_min': [int(v) for v in columns[4]],
+            'memory_max': [int(v) for v in columns[5]],
+            'memory_avg': [int(v) for v in columns[6]],
+        }
+    
+    @classmethod
+    def _fold(cls, rows) -> int:
+        """Merge a batch of raw rows' new records into their rollup rows"""
+        partials: Dict[Tuple, Dict[int, List]] = {}
+        hosts = {}
+        marks = []
+        folded = 0
+        
+        for pk, worker_id, server_id, vm_id, bucket_start, packed, count, rolled_up in rows:
+            worker_id = str(worker_id)
+            hosts[worker_id] = (server_id, vm_id)
+            marks.append(WorkerMetrics(id=pk, rolled_up=count))
+            
+            base = bucket_start.timestamp()
+            new = bytes(packed)[rolled_up * cls.RAW.size:count * cls.RAW.size]
+            for offset, cpu, memory in cls.RAW.iter_unpack(new):
+                ts = base + offset
+                for resolution in cls.ROLLUPS:
+                    bucket = cls._bucket(ts, resolution)
+                    step = cls.STEPS[resolution]
+                    slot = int(ts - bucket) // step * step
+                    slots = partials.setdefault((worker_id, resolution, bucket), {})
+                    cls._merge_slot(slots, slot, [1, cpu, cpu, cpu, memory, memory, memory])
+                folded += 1
+        
+        with transaction.atomic():
+            existing = {}
+            for pk, worker_id, resolution, bucket_start, packed in WorkerMetrics.objects.select_for_update().filter(
+                worker_id__in=list(hosts),
+                resolution__in=cls.ROLLUPS,
+                bucket_start__in={cls._to_datetime(bucket) for _, _, bucket in partials},
+            ).values_list('id', 'worker_id', 'resolution', 'bucket_start', 'samples'):
+                existing[(str(worker_id), resolution, int(bucket_start.timestamp()))] = (pk, bytes(packed))
+            
+            to_create, to_update = [], []
+            for key, slots in partials.items():
+                worker_id, resolution, bucket = key
+                if key in existing:
+                    pk, packed = existing[key]
+                    merged = cls._decode_rollup(packed)
+                    for slot, aggregate in slots.items():
+                        cls._merge_slot(merged, slot, aggregate)
+                    to_update.append(WorkerMetrics(id=pk, samples=cls._encode_rollup(merged), count=len(merged)))
+                else:
+                    server_id, vm_id = hosts[worker_id]
+                    to_create.append(WorkerMetrics(
+                        worker_id=worker_id,
+                        server_id=server_id,
+                        virtual_machine_id=vm_id,
+                        resolution=resolution,
+                        bucket_start=cls._to_datetime(bucket),
+                        samples=cls._encode_rollup(slots),
+                        count=len(slots),
+                    ))
+            
+            WorkerMetrics.objects.bulk_create(to_create, batch_size=cls.BATCH_SIZE)
+            WorkerMetrics.objects.bulk_update(to_update, ['samples', 'count'], batch_size=cls.BATCH_SIZE)
+            WorkerMetrics.objects.bulk_update(marks, ['rolled_up'], batch_size=cls.BATCH_SIZE)
+        
+        return folded
+    
+    @staticmethod
+    def _merge_slot(slots: Dict[int, List], slot: int, aggregate: List):
+        current = slots.get(slot)
+        if current is None:
+            slots[slot] = list(aggregate)
+            return
+        current[0] += aggregate[0]
+        current[1] = min(current[1], aggregate[1])
+        current[2] = max(current[2], aggregate[2])
+        current[3] += aggregate[3]
+        current[4] = min(current[4], aggregate[4])
+        current[5] = max(current[5], aggregate[5])
+        current[6] += aggregate[6]
+    
+    @classmethod
+    def _encode_rollup(cls, slots: Dict[int, List]) -> bytes:
+        return b''.join(cls.ROLLUP.pack(slot, *slots[slot]) for slot in sorted(slots))
+    
+    @classmethod
+    def _decode_rollup(cls, packed: bytes) -> Dict[int, List]:
+        return {record[0]: list(record[1:]) for record in cls.ROLLUP.iter_unpack(packed)}
+    
+    @classmethod
+    def _bucket(cls, ts: float, resolution: str) -> int:
+        span = cls.SPANS[resolution]
+        return int(ts) // span * span
+    
+    @staticmethod
+    def _to_datetime(ts: int) -> datetime:
+        return datetime.fromtimestamp(ts, tz=dt_timezone.utc)
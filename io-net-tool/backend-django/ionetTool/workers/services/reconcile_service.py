@@ -0,0 +1,182 @@
+import logging
+from typing import Dict, List, Optional
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from ..models import Server, VirtualMachine, Worker, StatusLog
+from .dashboard_service import DashboardStatsService
+from .metrics_service import WorkerMetricsStore
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerReconciler:
+    """Applies a scraped container list to the Worker table for one host.
+    
+    Known workers are loaded once into an in-memory index, diffed against the
+    containers, and written back with bulk_create/bulk_update plus a single
+    batched StatusLog insert inside one transaction.
+    """
+    
+    STATUS_MAP = {
+        'running': 'running',
+        'up': 'running',
+        'exited': 'inactive',
+        'paused': 'paused',
+        'dead': 'failed',
+        'created': 'inactive',
+        'restarting': 'restart_required',
+    }
+    
+    UPDATE_FIELDS = [
+        'status', 'container_id', 'container_name', 'image_name',
+        'last_seen', 'cpu_usage', 'memory_usage', 'updated_at',
+    ]
+    
+    BATCH_SIZE = 500
+    
+    def __init__(self, server: Optional[Server] = None, vm: Optional[VirtualMachine] = None):
+        self.server = server if not vm else None
+        self.vm = vm
+        self._host_workers: Dict = {}
+    
+    def reconcile(self, containers: List[Dict], stats: Optional[Dict[str, Dict]] = None) -> List[Dict]:
+        """Sync workers with the containers found on the host"""
+        stats = stats or {}
+        now = timezone.now()
+        
+        by_id, by_name = self._load_index(containers)
+        
+        to_create: List[Worker] = []
+        to_update: List[Worker] = []
+        logs: List[StatusLog] = []
+        seen = set()
+        results = []
+        samples = []
+        
+        for container in containers:
+            worker = by_id.get(container['id']) or by_name.get(container['name'])
+            is_new = worker is None
+            if is_new:
+                worker = Worker(
+                    name=container['name'],
+                    server=self.server,
+                    virtual_machine=self.vm,
+                    status='unknown',
+                )
+            
+            old_status = worker.status
+            new_status = self.STATUS_MAP.get(container['state'], 'unknown')
+            worker_stats = stats.get(container['id'], {}) if new_status == 'running' else {}
+            
+            worker.status = new_status
+            worker.container_id = container['id']
+            worker.container_name = container['name']
+            worker.image_name = container['image']
+            worker.last_seen = now
+            worker.updated_at = now
+            if worker_stats.get('cpu_percent') is not None:
+                worker.cpu_usage = worker_stats['cpu_percent']
+            if worker_stats.get('memory_usage') is not None:
+                worker.memory_usage = worker_stats['memory_usage']
+            if worker_stats.get('cpu_percent') is not None and worker_stats.get('memory_usage') is not None:
+                samples.append(worker)
+            
+            if is_new:
+                to_create.append(worker)
+                logger.info(f"Created new worker: {worker.name}")
+            elif worker.pk not in seen:
+                to_update.append(worker)
+            seen.add(worker.pk)
+            
+            if old_status != new_status:
+                logs.append(self._status_log(worker, old_status, new_status))
+            
+            results.append({
+                'worker_id': str(worker.id),
+                'name': worker.name,
+                'status': new_status,
+                'container_id': container['id'],
+                'stats': worker_stats,
+            })
+        
+        # Known workers whose container disappeared from the host
+        for worker in self._host_workers.values():
+            if worker.pk in seen or not worker.container_id or worker.status in ('terminated', 'installing'):
+                continue
+            logs.append(self._status_log(worker, worker.status, 'terminated', 'Container no longer present'))
+            worker.status = 'terminated'
+            worker.updated_at = now
+            to_update.append(worker)
+        
+        with transaction.atomic():
+            if to_create:
+                Worker.objects.bulk_create(to_create, batch_size=self.BATCH_SIZE)
+            if to_update:
+                Worker.objects.bulk_update(to_update, self.UPDATE_FIELDS, batch_size=self.BATCH_SIZE)
+            if logs:
+                StatusLog.objects.bulk_create(logs, batch_size=self.BATCH_SIZE)
+            # Bulk writes skip model signals; only new workers or status
+            # changes move the dashboard counters
+            if to_create or logs:
+                DashboardStatsService.invalidate()
+        
+        self._record_metrics(samples, now)
+        return results
+    
+    def _record_metrics(self, workers: List[Worker], now):
+        """Append this sweep's usage to the metrics time series"""
+        if not workers:
+            return
+        server_id = self.vm.server_id if self.vm else self.server.id
+        vm_id = self.vm.id if self.vm else None
+        try:
+            WorkerMetricsStore.record(
+                [(w.id, server_id, vm_id, w.cpu_usage, w.memory_usage) for w in workers], now
+            )
+        except Exception as e:
+            # Metrics are best effort and never fail a sweep
+            logger.warning(f"Failed to record worker metrics: {e}")
+    
+    def _load_index(self, containers: List[Dict]):
+        """Index this host's workers, plus any matching unplaced ones, by ID and name"""
+        ids = [c['id'] for c in containers]
+        names = [c['name'] for c in containers]
+        
+        host_filter = Q(virtual_machine=self.vm) if self.vm else Q(server=self.server, virtual_machine__isnull=True)
+        # Workers may have been recorded before the host was known; match them
+        # by container too, as the per-container lookups used to
+        match_filter = Q(container_id__in=ids) | Q(container_name__in=names)
+        
+        by_id: Dict[str, Worker] = {}
+        by_name: Dict[str, Worker] = {}
+        self._host_workers = {}
+        for worker in Worker.objects.filter(host_filter | match_filter).order_by('created_at'):
+            if self._is_on_host(worker):
+                self._host_workers[worker.pk] = worker
+            if worker.container_id:
+                self._index(by_id, worker.container_id, worker)
+            if worker.container_name:
+                self._index(by_name, worker.container_name, worker)
+        
+        return by_id, by_name
+    
+    def _index(self, index: Dict[str, Worker], key: str, worker: Worker):
+        # Host-scoped workers win over matches from elsewhere
+        existing = index.get(key)
+        if existing is None or (worker.pk in self._host_workers and existing.pk not in self._host_workers):
+            index[key] = worker
+    
+    def _is_on_host(self, worker: Worker) -> bool:
+        if self.vm:
+            return worker.virtual_machine_id == self.vm.id
+        return worker.server_id == self.server.id and worker.virtual_machine_id is None
+    
+    def _status_log(self, worker: Worker, old_status: str, new_status: str, message: str = "") -> StatusLog:
+        return StatusLog(
+            entity_type='worker',
+            entity_id=worker.id,
+            old_status=old_status,
+            new_status=new_status,
+            message=message,
+        )
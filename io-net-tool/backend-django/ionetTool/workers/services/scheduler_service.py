@@ -0,0 +1,148 @@
+import heapq
+import logging
+import random
+import time
+import uuid
+from dataclasses import asdict, dataclass
+from typing import Dict, Iterable, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from .host_lock import delete_if_equal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class HostSchedule:
+    """When a host is next due for a poll, and why"""
+    server_id: str
+    server_name: str
+    next_due: float
+    interval: float
+    failures: int = 0
+    stable_polls: int = 0
+    last_outcome: Optional[str] = None
+    last_polled: Optional[float] = None
+    
+    def __lt__(self, other: 'HostSchedule') -> bool:
+        return self.next_due < other.next_due
+
+
+class AdaptivePollScheduler:
+    """Per-host poll schedule kept in the Django cache.
+    
+    Hosts whose state just changed are polled at the minimum interval;
+    each stable poll stretches the interval toward the ceiling; offline or
+    failing hosts back off exponentially. Every interval is jittered, and
+    new hosts start at a random offset, so polls spread across the period
+    instead of arriving together on each tick.
+    """
+    
+    CACHE_KEY = 'workers:poll_schedule'
+    LOCK_KEY = 'workers:poll_schedule:lock'
+    
+    CHANGED = 'changed'
+    STABLE = 'stable'
+    FAILED = 'failed'
+    
+    STABLE_GROWTH = 1.5
+    
+    def __init__(self):
+        self.min_interval = getattr(settings, 'POLL_MIN_INTERVAL', 30)
+        self.base_interval = getattr(settings, 'POLL_BASE_INTERVAL', 60)
+        self.max_interval = getattr(settings, 'POLL_MAX_INTERVAL', 600)
+        self.offline_max_interval = getattr(settings, 'POLL_OFFLINE_MAX_INTERVAL', 1800)
+        self.jitter = getattr(settings, 'POLL_JITTER', 0.1)
+        self._hosts: Dict[str, HostSchedule] = {}
+        self._lock_token: Optional[str] = None
+    
+    def load(self) -> 'AdaptivePollScheduler':
+        """Read the persisted schedule"""
+        state = cache.get(self.CACHE_KEY) or {}
+        self._hosts = {server_id: HostSchedule(**entry) for server_id, entry in state.items()}
+        return self
+    
+    def save(self):
+        """Persist the schedule"""
+        cache.set(self.CACHE_KEY, {k: asdict(v) for k, v in self._hosts.items()}, None)
+    
+    def lock(self, timeout: float) -> bool:
+        """Claim the schedule so only one tick polls at a time"""
+        token = uuid.uuid4().hex
+        if not cache.add(self.LOCK_KEY, token, timeout):
+            return False
+        self._lock_token = token
+        return True
+    
+    def unlock(self):
+        """Release the schedule, unless our claim expired and a later tick holds it"""
+        if self._lock_token is not None:
+            delete_if_equal(self.LOCK_KEY, self._lock_token)
+        self._lock_token = None
+    
+    def sync(self, servers: Iterable, now: Optional[float] = None):
+        """Add newly registered servers and drop deleted ones"""
+        now = now if now is not None else time.time()
+        current = {}
+        for server in servers:
+            server_id = str(server.id)
+            host = self._hosts.get(server_id)
+            if host is None:
+                # Spread new hosts over one base interval instead of polling them all now
+                host = HostSchedule(
+                    server_id=server_id,
+                    server_name=server.name,
+                    next_due=now + random.uniform(0, self.base_interval),
+                    interval=self.base_interval,
+                )
+            host.server_name = server.name
+            current[server_id] = host
+        self._hosts = current
+    
+    def due(self, now: Optional[float] = None, limit: Optional[int] = None) -> List[HostSchedule]:
+        """Hosts whose next poll is due, most overdue first"""
+        now = now if now is not None else time.time()
+        heap = list(self._hosts.values())
+        heapq.heapify(heap)
+        
+        due = []
+        while heap and heap[0].next_due <= now and (limit is None or len(due) < limit):
+            due.append(heapq.heappop(heap))
+        return due
+    
+    def record(self, server_id: str, outcome: str, now: Optional[float] = None) -> Optional[HostSchedule]:
+        """Reschedule a host based on what its latest poll found"""
+        host = self._hosts.get(str(server_id))
+        if host is None:
+            return None
+        now = now if now is not None else time.time()
+        
+        if outcome == self.FAILED:
+            host.failures += 1
+            host.stable_polls = 0
+            interval = min(self.offline_max_interval, self.base_interval * 2 ** min(host.failures, 16))
+        elif outcome == self.CHANGED:
+            host.failures = 0
+            host.stable_polls = 0
+            interval = self.min_interval
+        else:
+            host.failures = 0
+            host.stable_polls += 1
+            interval = min(self.max_interval, max(host.interval, self.min_interval) * self.STABLE_GROWTH)
+        
+        host.interval = interval
+        host.next_due = now + interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+        host.last_outcome = outcome
+        host.last_polled = now
+        return host
+    
+    def entries(self, now: Optional[float] = None) -> List[Dict]:
+        """The schedule ordered by next due time, for inspection"""
+        now = now if now is not None else time.time()
+        return [
+            {
+                **asdict(host),
+                'due_in': round(host.next_due - now, 1),
+            }
+            for host in sorted(self._hosts.values())
+        ]
@@ -0,0 +1,287 @@
+import atexit
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+import paramiko
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+PoolKey = Tuple[str, int, str]
+
+
+class SSHPoolTimeout(Exception):
+    """Raised when no pooled connection became available in time"""
+
+
+@dataclass
+class _PooledConnection:
+    client: paramiko.SSHClient
+    key: PoolKey
+    credential_digest: str
+    created_at: float = field(default_factory=time.monotonic)
+    last_used: float = field(default_factory=time.monotonic)
+    in_use: bool = True
+
+
+class SSHConnectionPool:
+    """Process-wide pool of authenticated SSH connections.
+    
+    Connections are keyed by (host, port, username) and leased to one caller
+    at a time, so at most ``max_per_host`` sessions are ever open against a
+    host. Idle connections are kept alive with transport keepalives, checked
+    for health before reuse and closed once they have been idle for longer
+    than ``idle_timeout``. A background reaper closes idle connections every
+    ``reap_interval`` seconds, so hosts that are no longer checked don't keep
+    sessions open until the next ``acquire``.
+    """
+    
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        idle_timeout: float = 300.0,
+        keepalive: int = 30,
+        connect_timeout: float = 30.0,
+        acquire_timeout: float = 60.0,
+        reap_interval: float = 60.0,
+    ):
+        self.max_per_host = max_per_host
+        self.idle_timeout = idle_timeout
+        self.keepalive = keepalive
+        self.connect_timeout = connect_timeout
+        self.acquire_timeout = acquire_timeout
+        self.reap_interval = reap_interval
+        
+        self._cond = threading.Condition()
+        self._connections: Dict[PoolKey, List[_PooledConnection]] = {}
+        self._dialing: Dict[PoolKey, int] = {}
+        self._leases: Dict[int, _PooledConnection] = {}
+        self._reaper: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+    
+    def acquire(
+        self,
+        host: str,
+        port: int,
+        username: str,
+        password: str,
+        timeout: Optional[float] = None,
+    ) -> paramiko.SSHClient:
+        """Borrow a connected client, dialing a new one only when needed"""
+        key = (host, port, username)
+        digest = self._digest(password)
+        wait_until = time.monotonic() + (timeout or self.acquire_timeout)
+        
+        while True:
+            conn = self._lease_idle(key, digest, wait_until)
+            if conn is None:
+                # A dial slot was reserved for us
+                break
+            # The lease is ours, so the network round trip happens without the pool lock
+            if self._is_healthy(conn):
+                conn.last_used = time.monotonic()
+                return conn.client
+            with self._cond:
+                # Transport died while idle
+                self._close_locked(conn)
+                self._cond.notify_all()
+        
+        try:
+            client = self._dial(host, port, username, password)
+        except Exception:
+            with self._cond:
+                self._dialing[key] -= 1
+                self._cond.notify_all()
+            raise
+        
+        with self._cond:
+            self._dialing[key] -= 1
+            conn = _PooledConnection(client=client, key=key, credential_digest=digest)
+            self._connections.setdefault(key, []).append(conn)
+            self._leases[id(client)] = conn
+            return client
+    
+    def release(self, client: paramiko.SSHClient, discard: bool = False):
+        """Return a borrowed client to the pool"""
+        with self._cond:
+            conn = self._leases.get(id(client))
+        if conn is None:
+            # Not ours (or already closed by close_all); just drop it
+            client.close()
+            return
+        
+        # Still leased to the caller, so check it before taking the pool lock
+        healthy = not discard and self._is_healthy(conn)
+        with self._cond:
+            if self._leases.pop(id(client), None) is None:
+                # close_all ran in the meantime and already closed it
+                return
+            conn.in_use = False
+            conn.last_used = time.monotonic()
+            if not healthy:
+                self._close_locked(conn)
+            self._cond.notify_all()
+    
+    def evict_idle(self):
+        """Close connections that have been idle for longer than idle_timeout"""
+        with self._cond:
+            self._evict_idle_locked()
+    
+    def start_reaper(self):
+        """Start the background thread that closes idle connections"""
+        if self._reaper is not None or not self.reap_interval:
+            return
+        self._reaper = threading.Thread(target=self._reap, name='ssh-pool-reaper', daemon=True)
+        self._reaper.start()
+    
+    def close_all(self):
+        """Close every pooled connection, including leased ones"""
+        self._stopped.set()
+        with self._cond:
+            for conns in list(self._connections.values()):
+                for conn in list(conns):
+                    self._close_locked(conn)
+            self._leases.clear()
+            self._cond.notify_all()
+    
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Open and leased connection counts per host"""
+        with self._cond:
+            return {
+                f"{username}@{host}:{port}": {
+                    'open': len(conns),
+                    'in_use': sum(1 for c in conns if c.in_use),
+                }
+                for (host, port, username), conns in self._connections.items()
+                if conns
+            }
+    
+    def _lease_idle(self, key: PoolKey, digest: str, wait_until: float) -> Optional[_PooledConnection]:
+        """Lease an idle connection, or reserve a dial slot and return None"""
+        with self._cond:
+            while True:
+                self._evict_idle_locked()
+                conns = self._connections.setdefault(key, [])
+                
+                for conn in list(conns):
+                    if conn.in_use:
+                        continue
+                    if conn.credential_digest != digest:
+                        # Credentials changed since this connection was opened
+                        self._close_locked(conn)
+                        continue
+                    conn.in_use = True
+                    self._leases[id(conn.client)] = conn
+                    return conn
+                
+                if len(conns) + self._dialing.get(key, 0) < self.max_per_host:
+                    self._dialing[key] = self._dialing.get(key, 0) + 1
+                    return None
+                
+                remaining = wait_until - time.monotonic()
+                if remaining <= 0:
+                    host, port, username = key
+                    raise SSHPoolTimeout(
+                        f"No SSH session available for {username}@{host}:{port} "
+                        f"(limit {self.max_per_host})"
+                    )
+                self._cond.wait(remaining)
+    
+    def _reap(self):
+        while not self._stopped.wait(self.reap_interval):
+            try:
+                self.evict_idle()
+            except Exception as e:
+                logger.error(f"Error evicting idle SSH connections: {e}")
+    
+    def _dial(self, host: str, port: int, username: str, password: str) -> paramiko.SSHClient:
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            host,
+            port=port,
+            username=username,
+            password=password,
+            timeout=self.connect_timeout,
+        )
+        transport = client.get_transport()
+        if transport and self.keepalive:
+            transport.set_keepalive(self.keepalive)
+        logger.info(f"Opened pooled SSH connection to {host}")
+        return client
+    
+    def _is_healthy(self, conn: _PooledConnection) -> bool:
+        transport = conn.client.get_transport()
+        if transport is None or not transport.is_active():
+            return False
+        if time.monotonic() - conn.last_used > self.keepalive:
+            # Idle long enough that the peer may have dropped us silently
+            try:
+                transport.send_ignore()
+            except Exception:
+                return False
+        return True
+    
+    def _evict_idle_locked(self):
+        now = time.monotonic()
+        for conns in list(self._connections.values()):
+            for conn in list(conns):
+                if not conn.in_use and now - conn.last_used > self.idle_timeout:
+                    self._close_locked(conn)
+    
+    def _close_locked(self, conn: _PooledConnection):
+        conns = self._connections.get(conn.key, [])
+        if conn in conns:
+            conns.remove(conn)
+        self._leases.pop(id(conn.client), None)
+        try:
+            conn.client.close()
+        except Exception as e:
+            logger.debug(f"Error closing pooled connection to {conn.key[0]}: {e}")
+        logger.info(f"Closed pooled SSH connection to {conn.key[0]}")
+    
+    @staticmethod
+    def _digest(password: str) -> str:
+        return hashlib.sha256((password or '').encode()).hexdigest()
+
+
+_pool: Optional[SSHConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_ssh_pool() -> SSHConnectionPool:
+    """Get the process-wide SSH connection pool"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = SSHConnectionPool(
+                    max_per_host=getattr(settings, 'SSH_POOL_MAX_PER_HOST', 4),
+                    idle_timeout=getattr(settings, 'SSH_POOL_IDLE_TIMEOUT', 300.0),
+                    keepalive=getattr(settings, 'SSH_POOL_KEEPALIVE', 30),
+                    reap_interval=getattr(settings, 'SSH_POOL_REAP_INTERVAL', 60.0),
+                )
+                _pool.start_reaper()
+    return _pool
+
+
+def _close_pool():
+    if _pool is not None:
+        _pool.close_all()
+
+
+def _reset_pool_after_fork():
+    # Transports belong to the parent (their reader threads don't survive a
+    # fork), so a forked child such as a Celery prefork worker starts empty.
+    global _pool, _pool_lock
+    _pool = None
+    _pool_lock = threading.Lock()
+
+
+atexit.register(_close_pool)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_pool_after_fork)
@@ -1,9 +1,18 @@
 import paramiko
+import codecs
+import itertools
 import json
+import posixpath
 import re
-from typing import Dict, List, Optional, Tuple
-from dataclasses import dataclass
+import select
+import shlex
+import socket
+import time
+import uuid
+from typing import Callable, Dict, Generator, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass, field
 import logging
+from .ssh_pool import get_ssh_pool
 
 logger = logging.getLogger(__name__)
 
@@ -15,116 +24,254 @@ class CommandResult:
     stdout: str
     stderr: str
     exit_code: int
+    truncated: bool = False
 
 
-class SSHService:
-    """Service for executing commands on remote servers via SSH"""
+# Command output as one string, or as lines arriving from a LineStream
+Output = Union[str, Iterable[str]]
+
+
+class OutputBuffer:
+    """Collects one stream's output up to ``limit`` bytes, dropping the rest"""
     
-    def __init__(self, host: str, username: str, password: str, port: int = 22):
-        self.host = host
-        self.username = username
-        self.password = password
-        self.port = port
-        self._client: Optional[paramiko.SSHClient] = None
+    def __init__(self, limit: Optional[int] = None):
+        self.limit = limit
+        self.chunks: List[bytes] = []
+        self.size = 0
+        self.dropped = 0
     
-    def connect(self) -> bool:
-        """Establish SSH connection"""
+    def write(self, data: bytes):
+        if self.limit is not None and self.size + len(data) > self.limit:
+            room = max(self.limit - self.size, 0)
+            self.dropped += len(data) - room
+            data = data[:room]
+        if data:
+            self.chunks.append(data)
+            self.size += len(data)
+    
+    @property
+    def truncated(self) -> bool:
+        return self.dropped > 0
+    
+    def getvalue(self) -> str:
+        return b''.join(self.chunks).decode('utf-8', errors='replace')
+
+
+class LineStream:
+    """A command's stdout lines, yielded as they arrive.
+    
+    stderr is kept (up to ``max_stderr`` bytes) alongside; ``exit_code``,
+    ``stderr`` and ``success`` are set once the lines are exhausted.
+    """
+    
+    def __init__(self, events: Generator, max_stderr: int = 65536):
+        self._events = events
+        self._stderr = OutputBuffer(max_stderr)
+        self.exit_code: Optional[int] = None
+    
+    @property
+    def stderr(self) -> str:
+        return self._stderr.getvalue()
+    
+    @property
+    def success(self) -> bool:
+        return self.exit_code == 0
+    
+    def __iter__(self) -> Iterator[str]:
+        pending = b''
         try:
-            self._client = paramiko.SSHClient()
-            self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-            self._client.connect(
-                self.host,
-                port=self.port,
-                username=self.username,
-                password=self.password,
-                timeout=30
-            )
-            logger.info(f"Connected to {self.host}")
-            return True
-        except Exception as e:
-            logger.error(f"Failed to connect to {self.host}: {e}")
-            return False
+            while True:
+                try:
+                    name, data = next(self._events)
+                except StopIteration as stop:
+                    self.exit_code = stop.value
+                    break
+                if name == 'stderr':
+                    self._stderr.write(data)
+                    continue
+                *lines, pending = (pending + data).split(b'\n')
+                for line in lines:
+                    yield line.decode('utf-8', errors='replace').rstrip('\r')
+        except (paramiko.SSHException, OSError) as e:
+            # Timeouts, dropped connections and channels that failed to open
+            # all end the stream as a failed command, as execute() does
+            self._stderr.write(str(e).encode())
+            self.exit_code = -1
+        finally:
+            self._events.close()
+        
+        if pending:
+            yield pending.decode('utf-8', errors='replace').rstrip('\r')
+
+
+@dataclass
+class VirshSnapshot:
+    """Point-in-time view of every libvirt domain on a host, indexed by name"""
+    domains: Dict[str, Dict] = field(default_factory=dict)
     
-    def disconnect(self):
-        """Close SSH connection"""
-        if self._client:
-            self._client.close()
-            self._client = None
-            logger.info(f"Disconnected from {self.host}")
+    def get(self, name: str) -> Optional[Dict]:
+        return self.domains.get(name)
     
-    def execute(self, command: str, timeout: int = 60) -> CommandResult:
-        """Execute a command on the remote server"""
-        if not self._client:
-            if not self.connect():
-                return CommandResult(
-                    success=False,
-                    stdout="",
-                    stderr="Failed to connect",
-                    exit_code=-1
-                )
+    def __len__(self):
+        return len(self.domains)
+
+
+class SSHOutputParser:
+    """Commands and output parsers shared by the sync and async SSH services"""
+    
+    DOCKER_PS_COMMAND = 'docker ps -a --format "{{.ID}}|{{.Names}}|{{.Image}}|{{.Status}}|{{.State}}"'
+    DOCKER_STATS_COMMAND = (
+        'docker stats --no-stream --format '
+        '"{{.ID}}|{{.CPUPerc}}|{{.MemUsage}}|{{.MemPerc}}|{{.NetIO}}|{{.BlockIO}}"'
+    )
+    VIRSH_LIST_COMMAND = 'virsh list --all'
+    
+    # Domain list plus addresses of every running domain, gathered in one round trip
+    VIRSH_SNAPSHOT_PROBES = {
+        'list': VIRSH_LIST_COMMAND,
+        'addresses': 'for d in $(virsh list --name); do echo "domain $d"; virsh domifaddr "$d"; done',
+    }
+    
+    # System probes gathered by get_system_info, keyed by the info field they fill.
+    # Adding a probe here costs no extra round trip when running batched.
+    SYSTEM_PROBES = {
+        'cpu': 'lscpu',
+        'memory': 'free -b',
+        'disk': 'df -B1 /',
+        'uptime_since': 'uptime -s',
+        'load': 'cat /proc/loadavg',
+        'kernel': 'uname -r',
+        'gpu': 'nvidia-smi --query-gpu=name,memory.total,utilization.gpu --format=csv,noheader,nounits',
+    }
+    
+    PROBE_PARSERS = {
+        'cpu': '_parse_lscpu',
+        'memory': '_parse_free',
+        'disk': '_parse_df',
+        'uptime_since': '_parse_text',
+        'load': '_parse_loadavg',
+        'kernel': '_parse_text',
+        'gpu': '_parse_nvidia_smi',
+    }
+    
+    # `docker logs --since` takes RFC 3339 timestamps, Unix times or durations like 10m
+    LOG_SINCE_PATTERN = re.compile(r'^[0-9A-Za-z:.+-]+$')
+    # A line longer than this is passed on in pieces rather than buffered whole
+    MAX_LINE_BYTES = 65536
+    
+    @classmethod
+    def docker_logs_command(
+        cls,
+        container_id: str,
+        tail: int = 100,
+        follow: bool = False,
+        since: Optional[str] = None,
+        grep: Optional[str] = None,
+    ) -> str:
+        """Build a `docker logs` command with stderr merged in and an optional remote filter"""
+        if tail < 0:
+            raise ValueError("tail must not be negative")
+        if since and not cls.LOG_SINCE_PATTERN.match(since):
+            raise ValueError(f"Invalid since value: {since}")
         
-        try:
-            stdin, stdout, stderr = self._client.exec_command(command, timeout=timeout)
-            exit_code = stdout.channel.recv_exit_status()
-            
-            return CommandResult(
-                success=exit_code == 0,
-                stdout=stdout.read().decode('utf-8', errors='replace'),
-                stderr=stderr.read().decode('utf-8', errors='replace'),
-                exit_code=exit_code
-            )
-        except Exception as e:
-            logger.error(f"Command execution failed on {self.host}: {e}")
-            return CommandResult(
-                success=False,
-                stdout="",
-                stderr=str(e),
-                exit_code=-1
-            )
+        args = ['docker', 'logs', '--tail', str(tail)]
+        if follow:
+            args.append('--follow')
+        if since:
+            args += ['--since', since]
+        args.append(container_id)
+        
+        command = ' '.join(shlex.quote(arg) for arg in args) + ' 2>&1'
+        if grep:
+            # Filter on the remote host so unmatched lines never cross the wire
+            command += f' | grep --line-buffered -F -e {shlex.quote(grep)}'
+        return command
     
-    def execute_sudo(self, command: str, timeout: int = 60) -> CommandResult:
-        """Execute a command with sudo"""
-        sudo_command = f"echo '{self.password}' | sudo -S {command}"
-        return self.execute(sudo_command, timeout)
+    def _lines(self, output: Output) -> Iterator[str]:
+        """Lines of command output given as a string or as an iterable of lines"""
+        if isinstance(output, str):
+            return iter(output.strip().split('\n'))
+        return iter(output)
     
-    def get_system_info(self) -> Dict:
-        """Get system information from the server"""
-        info = {}
+    def _split_lines(self, pending: bytes, data: bytes) -> Tuple[List[str], bytes]:
+        """Complete lines in ``pending + data``, and the unterminated rest"""
+        *lines, pending = (pending + data).split(b'\n')
+        if len(pending) >= self.MAX_LINE_BYTES:
+            lines.append(pending)
+            pending = b''
+        return [line.decode('utf-8', errors='replace') for line in lines], pending
+    
+    def _build_probe_script(self, probes: Dict[str, str]) -> Tuple[str, str]:
+        """Build one composite command with marker lines around each probe"""
+        marker = f"__ionet_probe_{uuid.uuid4().hex[:12]}__"
+        script = '; '.join(
+            f"echo '{marker} begin {name}'; ( {command} ) 2>/dev/null; "
+            f"echo \"{marker} end {name} $?\""
+            for name, command in probes.items()
+        )
+        return marker, script
+    
+    def _split_probe_output(
+        self, marker: str, probes: Dict[str, str], result: 'CommandResult'
+    ) -> Dict[str, 'CommandResult']:
+        """Split composite probe output back into a result per probe"""
+        if not result.stdout:
+            return {
+                name: CommandResult(success=False, stdout="", stderr=result.stderr, exit_code=result.exit_code)
+                for name in probes
+            }
         
-        # CPU info
-        cpu_result = self.execute("lscpu")
-        if cpu_result.success:
-            info['cpu'] = self._parse_lscpu(cpu_result.stdout)
+        sections: Dict[str, CommandResult] = {}
+        current: Optional[str] = None
+        lines: List[str] = []
         
-        # Memory info
-        mem_result = self.execute("free -b")
-        if mem_result.success:
-            info['memory'] = self._parse_free(mem_result.stdout)
+        for line in result.stdout.split('\n'):
+            if not line.startswith(marker):
+                if current is not None:
+                    lines.append(line)
+                continue
+            
+            parts = line[len(marker):].split()
+            if len(parts) >= 2 and parts[0] == 'begin':
+                current, lines = parts[1], []
+            elif len(parts) >= 3 and parts[0] == 'end' and parts[1] == current:
+                try:
+                    exit_code = int(parts[2])
+                except ValueError:
+                    exit_code = -1
+                sections[current] = CommandResult(
+                    success=exit_code == 0,
+                    stdout='\n'.join(lines),
+                    stderr="",
+                    exit_code=exit_code,
+                )
+                current = None
         
-        # Disk info
-        disk_result = self.execute("df -B1 /")
-        if disk_result.success:
-            info['disk'] = self._parse_df(disk_result.stdout)
+        for name in probes:
+            # Sections cut off by a timeout or dropped connection
+            sections.setdefault(name, CommandResult(
+                success=False, stdout="", stderr=result.stderr or "Probe output missing", exit_code=-1
+            ))
         
-        # Uptime
-        uptime_result = self.execute("uptime -s")
-        if uptime_result.success:
-            info['uptime_since'] = uptime_result.stdout.strip()
+        return sections
+    
+    def _parse_system_info(self, results: Dict[str, 'CommandResult']) -> Dict:
+        """Parse probe results into the system info dict"""
+        info = {}
+        for name, result in results.items():
+            if not result.success:
+                continue
+            parser = getattr(self, self.PROBE_PARSERS[name])
+            value = parser(result.stdout)
+            if value:
+                info[name] = value
         
         return info
     
-    def get_docker_containers(self) -> List[Dict]:
-        """Get list of Docker containers with their status"""
-        result = self.execute(
-            'docker ps -a --format "{{.ID}}|{{.Names}}|{{.Image}}|{{.Status}}|{{.State}}"'
-        )
-        
-        if not result.success:
-            logger.error(f"Failed to get containers: {result.stderr}")
-            return []
-        
+    def _parse_docker_ps(self, output: Output) -> List[Dict]:
+        """Parse docker ps output"""
         containers = []
-        for line in result.stdout.strip().split('\n'):
+        for line in self._lines(output):
             if not line:
                 continue
             parts = line.split('|')
@@ -139,46 +286,52 @@ class SSHService:
         
         return containers
     
-    def get_container_stats(self, container_id: str) -> Dict:
-        """Get stats for a specific container"""
-        result = self.execute(
-            f'docker stats {container_id} --no-stream --format '
-            '"{{.CPUPerc}}|{{.MemUsage}}|{{.NetIO}}|{{.BlockIO}}"'
-        )
-        
-        if not result.success:
-            return {}
-        
-        parts = result.stdout.strip().split('|')
-        if len(parts) >= 4:
-            return {
-                'cpu_percent': self._parse_percentage(parts[0]),
-                'memory': parts[1],
-                'network_io': parts[2],
-                'block_io': parts[3],
+    def _parse_docker_stats(self, output: Output, container_ids: List[str]) -> Dict[str, Dict]:
+        """Parse docker stats output, keyed by the requested container IDs"""
+        stats = {}
+        for line in self._lines(output):
+            parts = line.split('|')
+            if len(parts) < 6:
+                continue
+            
+            stats_id = parts[0].strip()
+            container_id = next(
+                (cid for cid in container_ids if cid.startswith(stats_id) or stats_id.startswith(cid)),
+                stats_id,
+            )
+            memory_used, memory_limit = self._parse_io_pair(parts[2])
+            net_rx, net_tx = self._parse_io_pair(parts[4])
+            block_read, block_write = self._parse_io_pair(parts[5])
+            
+            stats[container_id] = {
+                'cpu_percent': self._parse_percentage(parts[1]),
+                'memory': parts[2],
+                'network_io': parts[4],
+                'block_io': parts[5],
+                'memory_usage': memory_used,
+                'memory_limit': memory_limit,
+                'memory_percent': self._parse_percentage(parts[3]),
+                'network_rx': net_rx,
+                'network_tx': net_tx,
+                'block_read': block_read,
+                'block_write': block_write,
             }
-        return {}
+        
+        return stats
     
-    def get_ionet_workers(self) -> List[Dict]:
-        """Get io.net worker containers specifically"""
-        containers = self.get_docker_containers()
+    def _filter_ionet(self, containers: List[Dict]) -> List[Dict]:
+        """Keep only io.net worker containers"""
         return [
             c for c in containers 
             if 'ionet' in c['image'].lower() or 'io-launch' in c['image'].lower()
         ]
     
-    def check_virsh_vms(self) -> List[Dict]:
-        """Get list of KVM/QEMU VMs via virsh"""
-        result = self.execute("virsh list --all")
-        
-        if not result.success:
-            logger.error(f"Failed to get VMs: {result.stderr}")
-            return []
-        
+    def _parse_virsh_list(self, output: Output) -> List[Dict]:
+        """Parse virsh list --all output"""
         vms = []
-        lines = result.stdout.strip().split('\n')
+        lines = self._lines(output)
         # Skip header lines
-        for line in lines[2:]:
+        for line in itertools.islice(lines, 2, None):
             if not line.strip():
                 continue
             parts = line.split()
@@ -194,35 +347,42 @@ class SSHService:
         
         return vms
     
-    def get_vm_ip(self, vm_name: str) -> Optional[str]:
-        """Get IP address of a VM"""
-        result = self.execute(f"virsh domifaddr {vm_name}")
+    def _parse_virsh_snapshot(self, results: Dict[str, 'CommandResult']) -> VirshSnapshot:
+        """Parse VIRSH_SNAPSHOT_PROBES results into a snapshot indexed by name"""
+        snapshot = VirshSnapshot()
+        if not results['list'].success:
+            logger.error(f"Failed to get VMs: {results['list'].stderr}")
+            return snapshot
         
-        if not result.success:
-            return None
+        for vm in self._parse_virsh_list(results['list'].stdout):
+            vm['ip_address'] = None
+            snapshot.domains[vm['name']] = vm
         
-        # Parse output for IP
-        for line in result.stdout.split('\n'):
+        domain = None
+        for line in results['addresses'].stdout.split('\n'):
+            if line.startswith('domain '):
+                domain = snapshot.get(line[len('domain '):].strip())
+                continue
             match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
-            if match:
-                return match.group(1)
+            if match and domain is not None and not domain['ip_address']:
+                domain['ip_address'] = match.group(1)
         
-        return None
+        return snapshot
     
-    def _parse_lscpu(self, output: str) -> Dict:
+    def _parse_lscpu(self, output: Output) -> Dict:
         """Parse lscpu output"""
         info = {}
-        for line in output.split('\n'):
+        for line in self._lines(output):
             if ':' in line:
                 key, value = line.split(':', 1)
                 info[key.strip()] = value.strip()
         return info
     
-    def _parse_free(self, output: str) -> Dict:
+    def _parse_free(self, output: Output) -> Dict:
         """Parse free -b output"""
-        lines = output.strip().split('\n')
-        if len(lines) >= 2:
-            parts = lines[1].split()
+        line = next(itertools.islice(self._lines(output), 1, None), None)
+        if line is not None:
+            parts = line.split()
             if len(parts) >= 3:
                 return {
                     'total': int(parts[1]),
@@ -231,11 +391,11 @@ class SSHService:
                 }
         return {}
     
-    def _parse_df(self, output: str) -> Dict:
+    def _parse_df(self, output: Output) -> Dict:
         """Parse df output"""
-        lines = output.strip().split('\n')
-        if len(lines) >= 2:
-            parts = lines[1].split()
+        line = next(itertools.islice(self._lines(output), 1, None), None)
+        if line is not None:
+            parts = line.split()
             if len(parts) >= 4:
                 return {
                     'total': int(parts[1]),
@@ -244,12 +404,540 @@ class SSHService:
                 }
         return {}
     
+    def _parse_text(self, output: str) -> str:
+        """Parse single-value output such as `uptime -s`"""
+        return output.strip()
+    
+    def _parse_loadavg(self, output: str) -> Dict:
+        """Parse /proc/loadavg output"""
+        parts = output.split()
+        if len(parts) >= 3:
+            try:
+                return {
+                    '1m': float(parts[0]),
+                    '5m': float(parts[1]),
+                    '15m': float(parts[2]),
+                }
+            except ValueError:
+                pass
+        return {}
+    
+    def _parse_nvidia_smi(self, output: Output) -> List[Dict]:
+        """Parse nvidia-smi --query-gpu csv output (memory in MiB)"""
+        gpus = []
+        for line in self._lines(output):
+            parts = [p.strip() for p in line.split(',')]
+            if len(parts) >= 3:
+                try:
+                    gpus.append({
+                        'name': parts[0],
+                        'memory_total': int(float(parts[1]) * 1024 * 1024),
+                        'utilization': float(parts[2]),
+                    })
+                except ValueError:
+                    continue
+        return gpus
+    
+    SIZE_UNITS = {
+        'b': 1,
+        'kb': 1000, 'mb': 1000 ** 2, 'gb': 1000 ** 3, 'tb': 1000 ** 4,
+        'kib': 1024, 'mib': 1024 ** 2, 'gib': 1024 ** 3, 'tib': 1024 ** 4,
+    }
+    
+    def _parse_size(self, value: str) -> Optional[int]:
+        """Parse docker size strings like '1.5GiB' or '12.3kB' into bytes"""
+        match = re.match(r'^\s*([\d.]+)\s*([a-zA-Z]*)\s*$', value or '')
+        if not match:
+            return None
+        unit = self.SIZE_UNITS.get(match.group(2).lower() or 'b')
+        if unit is None:
+            return None
+        try:
+            return int(float(match.group(1)) * unit)
+        except ValueError:
+            return None
+    
+    def _parse_io_pair(self, value: str) -> Tuple[Optional[int], Optional[int]]:
+        """Parse docker 'used / limit' or 'in / out' pairs into bytes"""
+        parts = (value or '').split('/')
+        if len(parts) != 2:
+            return None, None
+        return self._parse_size(parts[0]), self._parse_size(parts[1])
+    
     def _parse_percentage(self, value: str) -> float:
         """Parse percentage string like '45.5%' """
         try:
             return float(value.rstrip('%'))
         except (ValueError, AttributeError):
             return 0.0
+
+
+class SSHService(SSHOutputParser):
+    """Service for executing commands on remote servers via SSH"""
+    
+    def __init__(
+        self,
+        host: str,
+        username: str,
+        password: str,
+        port: int = 22,
+        pooled: bool = True,
+        via: Optional['SSHService'] = None,
+    ):
+        self.host = host
+        self.username = username
+        self.password = password
+        self.port = port
+        # Tunneled connections live and die with the jump host's lease
+        self.pooled = pooled and via is None
+        self.via = via
+        self._client: Optional[paramiko.SSHClient] = None
+    
+    def connect(self) -> bool:
+        """Establish SSH connection (borrowed from the shared pool by default)"""
+        if self._client:
+            return True
+        
+        try:
+            if self.via is not None:
+                self._client = self._connect_via(self.via)
+            elif self.pooled:
+                self._client = get_ssh_pool().acquire(
+                    self.host, self.port, self.username, self.password
+                )
+            else:
+                self._client = paramiko.SSHClient()
+                self._client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+                self._client.connect(
+                    self.host,
+                    port=self.port,
+                    username=self.username,
+                    password=self.password,
+                    timeout=30
+                )
+            logger.info(f"Connected to {self.host}")
+            return True
+        except Exception as e:
+            self._client = None
+            logger.error(f"Failed to connect to {self.host}: {e}")
+            return False
+    
+    def _connect_via(self, jump: 'SSHService') -> paramiko.SSHClient:
+        """Dial this host through a direct-tcpip channel on the jump host's transport"""
+        if not jump.connect():
+            raise paramiko.SSHException(f"Jump host {jump.host} unavailable")
+        
+        channel = jump._client.get_transport().open_channel(
+            'direct-tcpip',
+            (self.host, self.port),
+            ('127.0.0.1', 0),
+            timeout=30,
+        )
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        try:
+            client.connect(
+                self.host,
+                port=self.port,
+                username=self.username,
+                password=self.password,
+                sock=channel,
+                timeout=30,
+            )
+        except Exception:
+            channel.close()
+            raise
+        return client
+    
+    def disconnect(self):
+        """Close SSH connection, or return it to the pool"""
+        if self._client:
+            if self.pooled:
+                get_ssh_pool().release(self._client)
+            else:
+                self._client.close()
+            self._client = None
+            logger.info(f"Disconnected from {self.host}")
+    
+    def abort(self):
+        """Cut the session from another thread, failing whatever is running on it.
+        
+        The connection stays leased until the owner calls ``disconnect``; the
+        pool then sees the dead transport and discards it.
+        """
+        client = self._client
+        transport = client.get_transport() if client else None
+        if transport is not None:
+            transport.close()
+            logger.warning(f"Aborted SSH session to {self.host}")
+    
+    def execute(self, command: str, timeout: int = 60, kill_on_timeout: bool = False) -> CommandResult:
+        """Execute a command on the remote server"""
+        return self.execute_stream(command, timeout=timeout, kill_on_timeout=kill_on_timeout)
+    
+    def execute_stream(
+        self,
+        command: str,
+        timeout: Optional[float] = 60,
+        max_output: Optional[int] = None,
+        on_output: Optional[Callable[[str, str], None]] = None,
+        kill_on_timeout: bool = False,
+    ) -> CommandResult:
+        """Execute a command, draining stdout and stderr together as they arrive.
+        
+        Each stream keeps at most ``max_output`` bytes (the rest is read and
+        dropped, and the result is marked truncated). ``on_output(stream,
+        text)`` is called with every chunk as it is read. After ``timeout``
+        seconds the command is given up on; with ``kill_on_timeout`` it is
+        also killed on the remote host. Only ask for that on read-only
+        commands: a package install cut off half way can leave dpkg locked.
+        """
+        buffers = {'stdout': OutputBuffer(max_output), 'stderr': OutputBuffer(max_output)}
+        decoders = {name: codecs.getincrementaldecoder('utf-8')(errors='replace') for name in buffers}
+        
+        exit_code, error = -1, None
+        events = self._drain(command, timeout, kill_on_timeout)
+        try:
+            while True:
+                try:
+                    name, data = next(events)
+                except StopIteration as stop:
+                    exit_code = stop.value
+                    break
+                buffers[name].write(data)
+                if on_output:
+                    on_output(name, decoders[name].decode(data))
+        except ConnectionError as e:
+            error = str(e)
+        except TimeoutError as e:
+            logger.warning(f"Command timed out on {self.host}: {e}")
+            error = str(e)
+        except Exception as e:
+            logger.error(f"Command execution failed on {self.host}: {e}")
+            error = str(e)
+        finally:
+            events.close()
+        
+        stderr = buffers['stderr'].getvalue()
+        if error:
+            stderr = f"{stderr}\n{error}" if stderr else error
+        return CommandResult(
+            success=error is None and exit_code == 0,
+            stdout=buffers['stdout'].getvalue(),
+            stderr=stderr,
+            exit_code=exit_code,
+            truncated=buffers['stdout'].truncated or buffers['stderr'].truncated,
+        )
+    
+    def iter_lines(
+        self,
+        command: str,
+        timeout: Optional[float] = 60,
+        max_stderr: int = 65536,
+        kill_on_timeout: bool = False,
+    ) -> LineStream:
+        """Execute a command and iterate over its stdout lines as they arrive"""
+        return LineStream(self._drain(command, timeout, kill_on_timeout), max_stderr=max_stderr)
+    
+    # First stdout line of a killable command, carrying the remote shell's PID
+    PID_MARKER = b'__ionet_pid__:'
+    CHUNK_SIZE = 32768
+    
+    def _drain(
+        self, command: str, timeout: Optional[float], kill_on_timeout: bool = False
+    ) -> Generator[Tuple[str, bytes], None, int]:
+        """Run a command, yielding ('stdout' | 'stderr', data) as either stream has output.
+        
+        Both streams are read as soon as they have data, so the remote side
+        never blocks on a full window. Returns the exit code. After
+        ``timeout`` seconds TimeoutError is raised, once the remote process
+        group has been killed if ``kill_on_timeout`` is set.
+        """
+        if not self._client and not self.connect():
+            raise ConnectionError("Failed to connect")
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        channel = self._client.get_transport().open_session()
+        try:
+            if kill_on_timeout:
+                # sshd runs each command in a new session, so the shell's PID is
+                # also the process group to kill if the command outlives its timeout
+                channel.exec_command(f"echo {self.PID_MARKER.decode()}$$; {command}")
+                pid, head = None, b''
+            else:
+                channel.exec_command(command)
+                pid, head = 0, b''
+            
+            while True:
+                idle = True
+                if channel.recv_ready():
+                    idle = False
+                    data = channel.recv(self.CHUNK_SIZE)
+                    if pid is None:
+                        head += data
+                        if b'\n' not in head and len(head) < 64:
+                            # Wait for the rest of the marker line
+                            data = b''
+                        else:
+                            line, _, rest = head.partition(b'\n')
+                            pid = self._parse_pid(line)
+                            # Without a marker the output is passed on untouched
+                            data = rest if pid else head
+                            head = b''
+                    if data:
+                        yield 'stdout', data
+                if channel.recv_stderr_ready():
+                    idle = False
+                    yield 'stderr', channel.recv_stderr(self.CHUNK_SIZE)
+                
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    if kill_on_timeout:
+                        self._kill_remote(pid)
+                    raise TimeoutError(f"Command timed out after {timeout}s")
+                
+                if idle:
+                    if channel.exit_status_ready() and not channel.recv_ready() and not channel.recv_stderr_ready():
+                        break
+                    if channel.eof_received:
+                        # Both streams are done; only the exit status is outstanding
+                        channel.status_event.wait(remaining)
+                    else:
+                        # The channel's fileno is signalled by stdout, stderr and close alike
+                        select.select([channel], [], [], remaining)
+            
+            if head:
+                yield 'stdout', head
+            return channel.recv_exit_status()
+        finally:
+            channel.close()
+    
+    def _parse_pid(self, line: bytes) -> int:
+        if line.startswith(self.PID_MARKER):
+            try:
+                return int(line[len(self.PID_MARKER):].strip())
+            except ValueError:
+                pass
+        return 0
+    
+    def _kill_remote(self, pid: Optional[int]):
+        """Terminate a timed-out command's process group, killing it if it lingers"""
+        if not pid:
+            return
+        script = (
+            f"kill -TERM -{pid} 2>/dev/null || exit 0; "
+            f"for i in 1 2 3 4 5 6 7 8 9 10; do kill -0 -{pid} 2>/dev/null || exit 0; sleep 0.2; done; "
+            f"kill -KILL -{pid} 2>/dev/null"
+        )
+        try:
+            _, stdout, _ = self._client.exec_command(script, timeout=10)
+            stdout.channel.recv_exit_status()
+        except Exception as e:
+            logger.warning(f"Failed to kill timed-out command on {self.host}: {e}")
+    
+    def execute_sudo(self, command: str, timeout: int = 60, kill_on_timeout: bool = False) -> CommandResult:
+        """Execute a command with sudo.
+        
+        A login user's kill may not reach the root processes, so
+        ``kill_on_timeout`` is best effort here.
+        """
+        return self.execute(self.sudo_command(command), timeout, kill_on_timeout)
+    
+    def sudo_command(self, command: str) -> str:
+        """Wrap a command so it runs through sudo with this login's password"""
+        return f"echo '{self.password}' | sudo -S {command}"
+    
+    def put_files(self, files: Dict[str, Union[str, bytes]], mode: int = 0o600) -> int:
+        """Write several files over one SFTP session, returning the bytes written.
+        
+        Each file is written to a temporary name next to it, given ``mode``
+        before any content goes in, and renamed over the target, so readers
+        never see a partial file. Relative paths are resolved against the
+        login directory. Parent directories must already exist.
+        """
+        if not self._client and not self.connect():
+            raise ConnectionError(f"Failed to connect to {self.host}")
+        
+        written = 0
+        sftp = self._client.open_sftp()
+        try:
+            for path, content in files.items():
+                data = content.encode('utf-8') if isinstance(content, str) else content
+                directory, name = posixpath.split(path)
+                temp = posixpath.join(directory, f".{name}.{uuid.uuid4().hex[:8]}.tmp")
+                try:
+                    with sftp.open(temp, 'wb') as remote:
+                        remote.chmod(mode)
+                        remote.set_pipelined(True)
+                        remote.write(data)
+                    self._sftp_replace(sftp, temp, path)
+                except Exception:
+                    try:
+                        sftp.remove(temp)
+                    except IOError:
+                        pass
+                    raise
+                written += len(data)
+        finally:
+            sftp.close()
+        return written
+    
+    def _sftp_replace(self, sftp: paramiko.SFTPClient, source: str, target: str):
+        """Rename over an existing file, falling back for servers without posix-rename"""
+        try:
+            sftp.posix_rename(source, target)
+        except IOError:
+            # Plain SFTP rename refuses to overwrite, so the target briefly disappears
+            try:
+                sftp.remove(target)
+            except IOError:
+                pass
+            sftp.rename(source, target)
+    
+    def stream_lines(
+        self, command: str, timeout: Optional[float] = None, chunk_size: int = 32768
+    ) -> Iterator[List[str]]:
+        """Run a command and yield its output lines (stderr merged in) as they arrive.
+        
+        Each item holds the complete lines from one read. Output is only read
+        as fast as the caller consumes it, so a slow consumer lets the SSH
+        window fill and the remote command blocks instead of memory growing
+        here. Stops after ``timeout`` seconds in total, if given.
+        """
+        if not self._client and not self.connect():
+            raise ConnectionError(f"Failed to connect to {self.host}")
+        
+        deadline = time.monotonic() + timeout if timeout else None
+        channel = self._client.get_transport().open_session()
+        try:
+            channel.set_combine_stderr(True)
+            channel.exec_command(command)
+            
+            pending = b''
+            while True:
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    channel.settimeout(remaining)
+                try:
+                    data = channel.recv(chunk_size)
+                except socket.timeout:
+                    break
+                if not data:
+                    break
+                lines, pending = self._split_lines(pending, data)
+                if lines:
+                    yield lines
+            
+            if pending:
+                yield [pending.decode('utf-8', errors='replace')]
+        finally:
+            channel.close()
+    
+    def run_probes(self, probes: Dict[str, str], timeout: int = 60) -> Dict[str, CommandResult]:
+        """Run several commands in one round trip, returning a result per probe.
+        
+        Each probe's output is wrapped in begin/end marker lines carrying its
+        exit code, so every section can be split back out of a single stdout.
+        """
+        marker, script = self._build_probe_script(probes)
+        result = self.execute(script, timeout, kill_on_timeout=True)
+        return self._split_probe_output(marker, probes, result)
+    
+    def get_system_info(self, batched: bool = True) -> Dict:
+        """Get system information from the server.
+        
+        By default every probe in SYSTEM_PROBES runs in a single round trip;
+        pass ``batched=False`` to run them one command at a time.
+        """
+        if batched:
+            results = self.run_probes(self.SYSTEM_PROBES)
+        else:
+            results = {
+                name: self.execute(command, kill_on_timeout=True)
+                for name, command in self.SYSTEM_PROBES.items()
+            }
+        
+        return self._parse_system_info(results)
+    
+    def get_docker_containers(self, strict: bool = False) -> List[Dict]:
+        """Get list of Docker containers with their status.
+        
+        A failed `docker ps` gives an empty list, or raises RuntimeError
+        with ``strict`` so callers can tell it apart from an empty host.
+        """
+        lines = self.iter_lines(self.DOCKER_PS_COMMAND, kill_on_timeout=True)
+        containers = self._parse_docker_ps(lines)
+        
+        if not lines.success:
+            logger.error(f"Failed to get containers: {lines.stderr}")
+            if strict:
+                raise RuntimeError(f"docker ps failed: {lines.stderr.strip() or f'exit code {lines.exit_code}'}")
+            return []
+        
+        return containers
+    
+    def get_container_stats(self, container_id: str) -> Dict:
+        """Get stats for a specific container"""
+        return self.get_containers_stats([container_id]).get(container_id, {})
+    
+    def get_containers_stats(self, container_ids: Optional[List[str]] = None) -> Dict[str, Dict]:
+        """Get stats for many containers with a single `docker stats` call.
+        
+        Defaults to every running io.net worker container on the host. The
+        result is keyed by the container IDs that were asked for.
+        """
+        if container_ids is None:
+            container_ids = [
+                c['id'] for c in self.get_ionet_workers() if c['state'] == 'running'
+            ]
+        if not container_ids:
+            return {}
+        
+        result = self.execute(f"{self.DOCKER_STATS_COMMAND} {' '.join(container_ids)}", kill_on_timeout=True)
+        
+        # docker stats exits non-zero if any container vanished, but still
+        # reports the rest, so parse whatever came back
+        if not result.stdout:
+            logger.error(f"Failed to get container stats: {result.stderr}")
+            return {}
+        
+        return self._parse_docker_stats(result.stdout, container_ids)
+    
+    def get_ionet_workers(self, strict: bool = False) -> List[Dict]:
+        """Get io.net worker containers specifically"""
+        return self._filter_ionet(self.get_docker_containers(strict))
+    
+    def check_virsh_vms(self) -> List[Dict]:
+        """Get list of KVM/QEMU VMs via virsh"""
+        lines = self.iter_lines(self.VIRSH_LIST_COMMAND, kill_on_timeout=True)
+        vms = self._parse_virsh_list(lines)
+        
+        if not lines.success:
+            logger.error(f"Failed to get VMs: {lines.stderr}")
+            return []
+        
+        return vms
+    
+    def get_virsh_snapshot(self) -> VirshSnapshot:
+        """Get every VM's state and IP address in a single round trip"""
+        return self._parse_virsh_snapshot(self.run_probes(self.VIRSH_SNAPSHOT_PROBES))
+    
+    def get_vm_ip(self, vm_name: str) -> Optional[str]:
+        """Get IP address of a VM"""
+        result = self.execute(f"virsh domifaddr {vm_name}", kill_on_timeout=True)
+        
+        if not result.success:
+            return None
+        
+        # Parse output for IP
+        for line in result.stdout.split('\n'):
+            match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
+            if match:
+                return match.group(1)
+        
+        return None
     
     def __enter__(self):
         self.connect()
@@ -0,0 +1,151 @@
+import json
+import logging
+import uuid
+from typing import Dict, List, Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class StatusStateStore:
+    """Versioned view of what WebSocket clients have been told, kept in the Django cache.
+    
+    Every published change to a server, worker or the dashboard stats gets
+    the next sequence number and is recorded as a field-level delta against
+    the last published version of that entity. Clients take one snapshot,
+    then apply deltas; after a reconnect they resume from their last
+    sequence as long as the delta log still covers it. The epoch changes
+    whenever the cache loses the sequence counter, so stale clients know to
+    take a fresh snapshot.
+    """
+    
+    PREFIX = 'workers:state'
+    
+    # Fields every sweep bumps. A change to only these is not published on
+    # its own; the new values ride along with the entity's next real change.
+    PASSIVE_FIELDS = frozenset({'last_seen', 'updated_at', 'cpu_usage', 'memory_usage', 'uptime_seconds'})
+    
+    @classmethod
+    def epoch(cls) -> str:
+        """Identifier of the current sequence; changes if the store is reset"""
+        key = f'{cls.PREFIX}:epoch'
+        epoch = cache.get(key)
+        if epoch is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            epoch = cache.get(key)
+        return epoch
+    
+    @classmethod
+    def current_seq(cls) -> int:
+        """Sequence number of the last published delta"""
+        cls.epoch()
+        return cache.get(f'{cls.PREFIX}:seq') or 0
+    
+    @classmethod
+    def publish(cls, entity: str, entity_id: str, data: Dict) -> Optional[Dict]:
+        """Record the latest state of an entity and return its delta, or None if unchanged"""
+        data = cls._normalize(data)
+        entity_key = cls._entity_key(entity, entity_id)
+        previous = cache.get(entity_key)
+        
+        if previous is None:
+            changes = data
+        else:
+            changes = {k: v for k, v in data.items() if previous.get(k, _MISSING) != v}
+            if changes.keys() <= cls.PASSIVE_FIELDS:
+                # Keep the old version so these changes are sent with the next real one
+                return None
+        
+        delta = {
+            'seq': cls._next_seq(),
+            'entity': entity,
+            'id': str(entity_id),
+            'op': 'upsert',
+            'changes': changes,
+        }
+        cache.set(entity_key, data, None)
+        cls._log(delta)
+        return delta
+    
+    @classmethod
+    def publish_many(cls, entity: str, items: List[Dict]) -> List[Dict]:
+        """Publish several entities of one kind, returning only the deltas that changed something"""
+        deltas = []
+        for data in items:
+            delta = cls.publish(entity, data['id'], data)
+            if delta:
+                deltas.append(delta)
+        return deltas
+    
+    @classmethod
+    def remove(cls, entity: str, entity_id: str) -> Dict:
+        """Record that an entity is gone"""
+        cache.delete(cls._entity_key(entity, entity_id))
+        delta = {
+            'seq': cls._next_seq(),
+            'entity': entity,
+            'id': str(entity_id),
+            'op': 'remove',
+            'changes': {},
+        }
+        cls._log(delta)
+        return delta
+    
+    @classmethod
+    def deltas_since(cls, seq: int, epoch: Optional[str] = None) -> Optional[List[Dict]]:
+        """Deltas after `seq`, or None when the client has to take a new snapshot"""
+        if epoch is not None and epoch != cls.epoch():
+            return None
+        
+        current = cls.current_seq()
+        if seq > current or current - seq > getattr(settings, 'STATUS_DELTA_LOG_SIZE', 5000):
+            return None
+        if seq == current:
+            return []
+        
+        keys = [cls._delta_key(n) for n in range(seq + 1, current + 1)]
+        found = cache.get_many(keys)
+        if len(found) != len(keys):
+            # Part of the log has expired
+            return None
+        return [found[key] for key in keys]
+    
+    @classmethod
+    def _next_seq(cls) -> int:
+        key = f'{cls.PREFIX}:seq'
+        cls.epoch()
+        cache.add(key, 0, None)
+        try:
+            return cache.incr(key)
+        except ValueError:
+            # Counter evicted between add and incr; start a new epoch
+            cache.delete(f'{cls.PREFIX}:epoch')
+            cls.epoch()
+            cache.add(key, 0, None)
+            return cache.incr(key)
+    
+    @classmethod
+    def _log(cls, delta: Dict):
+        cache.set(
+            cls._delta_key(delta['seq']),
+            delta,
+            getattr(settings, 'STATUS_DELTA_LOG_TTL', 3600),
+        )
+    
+    @classmethod
+    def _entity_key(cls, entity: str, entity_id) -> str:
+        return f'{cls.PREFIX}:entity:{entity}:{entity_id}'
+    
+    @classmethod
+    def _delta_key(cls, seq: int) -> str:
+        return f'{cls.PREFIX}:delta:{seq}'
+    
+    @staticmethod
+    def _normalize(data: Dict) -> Dict:
+        # Serializer output may hold UUIDs, Decimals or datetimes; compare and
+        # store exactly what clients receive
+        return json.loads(json.dumps(data, cls=DjangoJSONEncoder))
@@ -0,0 +1,116 @@
+import logging
+from datetime import datetime, time, timedelta
+from typing import Dict, Optional, Tuple
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Min
+from django.utils import timezone
+from ..models import StatusLog, StatusLogDaily
+
+logger = logging.getLogger(__name__)
+
+
+class StatusLogRetention:
+    """Retention policy for the status transition log.
+    
+    Raw StatusLog rows are kept for STATUS_LOG_RETENTION_DAYS. Older rows
+    are compacted, one day at a time, into one StatusLogDaily row per entity
+    per day (transition count, count per status, last status) and then
+    deleted. Daily rows are dropped after STATUS_LOG_ROLLUP_RETENTION_DAYS.
+    """
+    
+    def __init__(self, retention_days: Optional[int] = None, rollup_retention_days: Optional[int] = None):
+        self.retention_days = (
+            retention_days if retention_days is not None
+            else getattr(settings, 'STATUS_LOG_RETENTION_DAYS', 30)
+        )
+        self.rollup_retention_days = (
+            rollup_retention_days if rollup_retention_days is not None
+            else getattr(settings, 'STATUS_LOG_ROLLUP_RETENTION_DAYS', 730)
+        )
+    
+    def run(self, now: Optional[datetime] = None) -> Dict:
+        """Compact every whole day older than the retention window and prune old rollups"""
+        now = now or timezone.now()
+        # Only whole days are compacted, so a day is never split across raw and rollup rows
+        cutoff = self._start_of_day(now - timedelta(days=self.retention_days))
+        
+        days = 0
+        compacted = 0
+        for day in StatusLog.objects.filter(created_at__lt=cutoff).dates('created_at', 'day'):
+            compacted += self.compact_day(day)
+            days += 1
+        
+        pruned = 0
+        if self.rollup_retention_days:
+            oldest = timezone.localdate(now) - timedelta(days=self.rollup_retention_days)
+            pruned, _ = StatusLogDaily.objects.filter(day__lt=oldest).delete()
+        
+        if compacted or pruned:
+            logger.info(f"Compacted {compacted} status logs over {days} days, pruned {pruned} daily rollups")
+        return {'days': days, 'compacted': compacted, 'pruned_rollups': pruned}
+    
+    def compact_day(self, day) -> int:
+        """Fold one day's raw transitions into its daily rollups and delete them"""
+        start = self._start_of_day(day)
+        end = start + timedelta(days=1)
+        raw = StatusLog.objects.filter(created_at__gte=start, created_at__lt=end)
+        
+        groups = (
+            raw.order_by()
+            .values('entity_type', 'entity_id', 'new_status')
+            .annotate(count=Count('id'), first_at=Min('created_at'), last_at=Max('created_at'))
+        )
+        
+        rollups: Dict[Tuple, Dict] = {}
+        for group in groups:
+            key = (group['entity_type'], group['entity_id'])
+            rollup = rollups.setdefault(key, {
+                'transitions': 0,
+                'status_counts': {},
+                'first_at': group['first_at'],
+                'last_at': group['last_at'],
+                'last_status': group['new_status'],
+            })
+            rollup['transitions'] += group['count']
+            rollup['status_counts'][group['new_status']] = group['count']
+            rollup['first_at'] = min(rollup['first_at'], group['first_at'])
+            if group['last_at'] >= rollup['last_at']:
+                rollup['last_at'] = group['last_at']
+                rollup['last_status'] = group['new_status']
+        
+        with transaction.atomic():
+            existing = {
+                (r.entity_type, r.entity_id): r
+                for r in StatusLogDaily.objects.select_for_update().filter(
+                    day=day, entity_id__in=[entity_id for _, entity_id in rollups]
+                )
+            }
+            created, updated = [], []
+            for (entity_type, entity_id), data in rollups.items():
+                row = existing.get((entity_type, entity_id))
+                if row is None:
+                    created.append(StatusLogDaily(entity_type=entity_type, entity_id=entity_id, day=day, **data))
+                    continue
+                # Rows that arrived late for an already compacted day
+                row.transitions += data['transitions']
+                for status, count in data['status_counts'].items():
+                    row.status_counts[status] = row.status_counts.get(status, 0) + count
+                row.first_at = min(row.first_at, data['first_at'])
+                if data['last_at'] >= row.last_at:
+                    row.last_at = data['last_at']
+                    row.last_status = data['last_status']
+                updated.append(row)
+            
+            StatusLogDaily.objects.bulk_create(created, batch_size=500)
+            StatusLogDaily.objects.bulk_update(
+                updated, ['transitions', 'status_counts', 'first_at', 'last_at', 'last_status'], batch_size=500
+            )
+            deleted, _ = raw.delete()
+        
+        return deleted
+    
+    @staticmethod
+    def _start_of_day(value) -> datetime:
+        day = timezone.localdate(value) if isinstance(value, datetime) else value
+        return timezone.make_aware(datetime.combine(day, time.min), timezone.get_current_timezone())
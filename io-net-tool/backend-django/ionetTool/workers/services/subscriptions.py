@@ -0,0 +1,95 @@
+import uuid
+from typing import Dict, Iterable, List, Optional, Set
+from django.core.cache import cache
+
+
+class StatusSubscriptions:
+    """Channel-layer groups that WebSocket status updates are routed through.
+    
+    Every socket is in the fleet group, which carries the dashboard stats and
+    server deltas. Worker deltas go to the narrowest groups that want them:
+    the worker's own group, its VM's group and its server's group, plus the
+    fleet-wide ALL_GROUP that sockets sit in until they subscribe to
+    something narrower. Per-VM and per-worker groups are only sent to while
+    a socket is subscribed, as tracked by counters in the Django cache.
+    """
+    
+    ALL_GROUP = 'status_updates'
+    FLEET_GROUP = 'status.fleet'
+    ENTITY_TYPES = ('server', 'vm', 'worker')
+    
+    PREFIX = 'workers:subscriptions'
+    
+    @staticmethod
+    def group_name(entity_type: str, entity_id) -> Optional[str]:
+        """Group for one entity, or None if the type or ID is not valid"""
+        if entity_type not in StatusSubscriptions.ENTITY_TYPES:
+            return None
+        try:
+            entity_id = uuid.UUID(str(entity_id))
+        except (TypeError, ValueError):
+            return None
+        return f'status.{entity_type}.{entity_id}'
+    
+    @classmethod
+    def register(cls, group: str):
+        """Count a socket joining a narrow group"""
+        key = cls._key(group)
+        cache.add(key, 0, None)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    
+    @classmethod
+    def unregister(cls, group: str):
+        """Count a socket leaving a narrow group"""
+        key = cls._key(group)
+        try:
+            if cache.decr(key) <= 0:
+                cache.delete(key)
+        except ValueError:
+            pass
+    
+    @classmethod
+    def watched(cls, groups: Iterable[str]) -> Set[str]:
+        """Subset of groups that currently have at least one subscriber"""
+        groups = list(groups)
+        if not groups:
+            return set()
+        counts = cache.get_many([cls._key(g) for g in groups])
+        return {g for g in groups if counts.get(cls._key(g), 0) > 0}
+    
+    @classmethod
+    def route_worker_deltas(cls, server_id, workers: List[Dict], deltas: Dict[str, Dict]) -> Dict[str, List[Dict]]:
+        """Group worker deltas by destination group.
+        
+        `workers` is the serialized data of one server's workers and
+        `deltas` maps worker ID to the delta published for it.
+        """
+        routed: Dict[str, List[Dict]] = {}
+        candidates: Dict[str, List[Dict]] = {}
+        
+        for data in workers:
+            delta = deltas.get(str(data['id']))
+            if not delta:
+                continue
+            routed.setdefault(cls.ALL_GROUP, []).append(delta)
+            routed.setdefault(cls.group_name('server', server_id), []).append(delta)
+            
+            narrow = [cls.group_name('worker', data['id'])]
+            if data.get('virtual_machine'):
+                narrow.append(cls.group_name('vm', data['virtual_machine']))
+            for group in narrow:
+                if group:
+                    candidates.setdefault(group, []).append(delta)
+        
+        # One cache round trip decides which narrow groups anyone is watching
+        for group in cls.watched(candidates):
+            routed[group] = candidates[group]
+        
+        return routed
+    
+    @classmethod
+    def _key(cls, group: str) -> str:
+        return f'{cls.PREFIX}:{group}'
@@ -0,0 +1,231 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class SweepResult:
+    """Outcome of a single host check within a fleet sweep"""
+    server_id: str
+    server_name: str
+    status: str  # 'ok', 'error', 'timeout' or 'skipped'
+    result: Any = None
+    error: Optional[str] = None
+    duration: float = 0.0
+    
+    @property
+    def ok(self) -> bool:
+        return self.status == 'ok'
+
+
+@dataclass
+class _HostJob:
+    server: Any
+    started_at: Optional[float] = None
+
+
+class FleetSweepService:
+    """Runs per-server checks concurrently with per-host and global time limits.
+    
+    Slow hosts are reported as 'timeout' once they exceed ``host_timeout`` and
+    hosts that never got a slot before the global ``deadline`` are reported as
+    'skipped', so a sweep always returns within the deadline with partial
+    results instead of waiting on the slowest box.
+    """
+    
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        host_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.max_workers = max_workers or getattr(settings, 'WORKER_SWEEP_CONCURRENCY', 16)
+        self.host_timeout = host_timeout or getattr(settings, 'WORKER_SWEEP_HOST_TIMEOUT', 45.0)
+        self.deadline = deadline or getattr(settings, 'WORKER_SWEEP_DEADLINE', 55.0)
+    
+    def run(self, servers: Iterable, check: Callable[[Any], Any]) -> List[SweepResult]:
+        """Run ``check(server)`` for every server and collect all results"""
+        return list(self.iter_sweep(servers, check))
+    
+    def iter_sweep(self, servers: Iterable, check: Callable[[Any], Any]) -> Iterator[SweepResult]:
+        """Run ``check(server)`` for every server, yielding results as hosts finish"""
+        servers = list(servers)
+        if not servers:
+            return
+        
+        sweep_deadline = time.monotonic() + self.deadline
+        executor = ThreadPoolExecutor(
+            max_workers=min(self.max_workers, len(servers)),
+            thread_name_prefix='fleet-sweep',
+        )
+        jobs: Dict = {}
+        
+        try:
+            for server in servers:
+                job = _HostJob(server=server)
+                future = executor.submit(self._run_check, job, check)
+                jobs[future] = job
+            
+            pending = set(jobs)
+            while pending:
+                now = time.monotonic()
+                remaining = sweep_deadline - now
+                if remaining <= 0:
+                    break
+                
+                done, pending = wait(
+                    pending,
+                    timeout=min(remaining, self._next_host_expiry(pending, jobs, now)),
+                    return_when=FIRST_COMPLETED,
+                )
+                
+                for future in done:
+                    yield self._collect(future, jobs[future])
+                
+                # Abandon hosts that have been running for longer than allowed
+                now = time.monotonic()
+                for future in list(pending):
+                    job = jobs[future]
+                    if job.started_at is not None and now - job.started_at >= self.host_timeout:
+                        pending.discard(future)
+                        logger.warning(f"Host check timed out for {job.server.name}")
+                        yield self._result(job, 'timeout', error='Host check timed out', now=now)
+            
+            # Global deadline reached: report whatever is still outstanding
+            now = time.monotonic()
+            for future in pending:
+                job = jobs[future]
+                if future.cancel() or job.started_at is None:
+                    yield self._result(job, 'skipped', error='Sweep deadline reached', now=now)
+                else:
+                    yield self._result(job, 'timeout', error='Sweep deadline reached', now=now)
+            
+            if pending:
+                logger.warning(f"Fleet sweep deadline reached with {len(pending)} hosts outstanding")
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    def _run_check(self, job: _HostJob, check: Callable[[Any], Any]) -> Any:
+        job.started_at = time.monotonic()
+        try:
+            return check(job.server)
+        finally:
+            # Each pool thread holds its own DB connection; don't leak it
+            connection.close()
+    
+    def _next_host_expiry(self, pending, jobs: Dict, now: float) -> float:
+        """Seconds until the earliest running host exceeds its timeout"""
+        expiries = [
+            jobs[f].started_at + self.host_timeout - now
+            for f in pending
+            if jobs[f].started_at is not None
+        ]
+        # Queued hosts have no start time yet; re-check periodically
+        return max(min(expiries, default=1.0), 0.05)
+    
+    def _collect(self, future, job: _HostJob) -> SweepResult:
+        try:
+            result = future.result()
+        except Exception as e:
+            logger.error(f"Error checking {job.server.name}: {e}")
+            return self._result(job, 'error', error=str(e))
+        return self._result(job, 'ok', result=result)
+    
+    def _result(
+        self,
+        job: _HostJob,
+        status: str,
+        result: Any = None,
+        error: Optional[str] = None,
+        now: Optional[float] = None,
+    ) -> SweepResult:
+        now = now or time.monotonic()
+        return SweepResult(
+            server_id=str(job.server.id),
+            server_name=job.server.name,
+            status=status,
+            result=result,
+            error=error,
+            duration=now - job.started_at if job.started_at else 0.0,
+        )
+
+
+class AsyncFleetSweepService:
+    """Drives per-server coroutine checks for the whole fleet from one event loop.
+    
+    Same contract as FleetSweepService, but hosts that exceed their timeout
+    or the sweep deadline are actually cancelled rather than abandoned.
+    """
+    
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        host_timeout: Optional[float] = None,
+        deadline: Optional[float] = None,
+    ):
+        self.max_concurrency = max_concurrency or getattr(settings, 'WORKER_SWEEP_ASYNC_CONCURRENCY', 256)
+        self.host_timeout = host_timeout or getattr(settings, 'WORKER_SWEEP_HOST_TIMEOUT', 45.0)
+        self.deadline = deadline or getattr(settings, 'WORKER_SWEEP_DEADLINE', 55.0)
+    
+    def run(self, servers: Iterable, check: Callable[[Any], Awaitable[Any]]) -> List[SweepResult]:
+        """Run ``await check(server)`` for every server on a fresh event loop"""
+        return asyncio.run(self.sweep(list(servers), check))
+    
+    async def sweep(self, servers: Iterable, check: Callable[[Any], Awaitable[Any]]) -> List[SweepResult]:
+        """Run ``await check(server)`` for every server on the running loop"""
+        servers = list(servers)
+        if not servers:
+            return []
+        
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        jobs: Dict = {}
+        
+        async def run_one(job: _HostJob) -> SweepResult:
+            async with semaphore:
+                job.started_at = time.monotonic()
+                try:
+                    result = await asyncio.wait_for(check(job.server), self.host_timeout)
+                except asyncio.TimeoutError:
+                    logger.warning(f"Host check timed out for {job.server.name}")
+                    return self._result(job, 'timeout', error='Host check timed out')
+                except Exception as e:
+                    logger.error(f"Error checking {job.server.name}: {e}")
+                    return self._result(job, 'error', error=str(e))
+                return self._result(job, 'ok', result=result)
+        
+        for server in servers:
+            job = _HostJob(server=server)
+            jobs[asyncio.ensure_future(run_one(job))] = job
+        
+        done, pending = await asyncio.wait(jobs, timeout=self.deadline)
+        results = [task.result() for task in done]
+        
+        for task in pending:
+            task.cancel()
+            job = jobs[task]
+            status = 'timeout' if job.started_at is not None else 'skipped'
+            results.append(self._result(job, status, error='Sweep deadline reached'))
+        
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+            logger.warning(f"Fleet sweep deadline reached with {len(pending)} hosts outstanding")
+        
+        return results
+    
+    def _result(self, job: _HostJob, status: str, result: Any = None, error: Optional[str] = None) -> SweepResult:
+        now = time.monotonic()
+        return SweepResult(
+            server_id=str(job.server.id),
+            server_name=job.server.name,
+            status=status,
+            result=result,
+            error=error,
+            duration=now - job.started_at if job.started_at else 0.0,
+        )
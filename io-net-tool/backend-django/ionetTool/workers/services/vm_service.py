@@ -1,6 +1,8 @@
 import logging
 import random
-from typing import Dict, Optional
+import re
+from typing import Callable, Dict, List, Optional
+from django.conf import settings
 from django.utils import timezone
 from ..models import Server, VirtualMachine
 from .ssh_service import SSHService
@@ -11,12 +13,33 @@ logger = logging.getLogger(__name__)
 class VMService:
     """Service for managing KVM/QEMU Virtual Machines"""
     
+    BASE_IMAGE = 'kvm/base/focal-server-cloudimg-amd64.img'
+    # Seconds package installs and downloads may run; they are never killed on timeout
+    INSTALL_TIMEOUT = 1800
+    # Names end up in paths and shell commands unquoted
+    NAME_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9._-]{0,63}$')
+    
+    # Builds one VM's disk and cloud-init seed in its directory, reporting a __vm__ line
+    BUILD_DISK_FUNCTION = (
+        'build() { cd "$HOME/kvm/$1" || { echo "__vm__ $1 failed cannot enter VM directory"; return; }; '
+        'if ! qemu-img create -F qcow2 -b "$HOME/' + BASE_IMAGE + '" -f qcow2 "$1.qcow2" "$2G" '
+        '> provision.log 2>&1; then '
+        'echo "__vm__ $1 failed $(tail -n 3 provision.log | tr \'\\n\' \' \')"; return; fi; '
+        'if ! cloud-localds -v --network-config=network-config "$1-seed.qcow2" user-data meta-data '
+        '>> provision.log 2>&1; then '
+        'echo "__vm__ $1 failed $(tail -n 3 provision.log | tr \'\\n\' \' \')"; return; fi; '
+        'echo "__vm__ $1 ok"; }'
+    )
+    
     def __init__(self, server: Server):
         self.server = server
         self.ssh: Optional[SSHService] = None
     
     def connect(self) -> bool:
-        """Connect to the server via SSH"""
+        """Connect to the server via SSH, borrowing from the connection pool"""
+        # Hand back any previous lease before borrowing again
+        self.disconnect()
+        
         try:
             decrypted_password = self.server.get_ssh_password()
         except Exception as e:
@@ -36,8 +59,9 @@ class VMService:
         if self.ssh:
             self.ssh.disconnect()
     
-    def setup_virtualization(self) -> Dict:
+    def setup_virtualization(self, progress: Optional[Callable[[int, str], None]] = None) -> Dict:
         """Install KVM/QEMU virtualization packages"""
+        progress = progress or (lambda percent, message: None)
         try:
             if not self.connect():
                 return {'success': False, 'error': 'Connection failed'}
@@ -51,20 +75,22 @@ class VMService:
                 f"usermod -aG libvirt {self.server.ssh_username}",
             ]
             
-            for cmd in commands:
-                result = self.ssh.execute_sudo(cmd, timeout=300)
+            for i, cmd in enumerate(commands):
+                progress(i * 100 // len(commands), cmd)
+                result = self.ssh.execute_sudo(cmd, timeout=self.INSTALL_TIMEOUT)
                 logger.info(f"Executed: {cmd} - Exit: {result.exit_code}")
             
             return {'success': True, 'message': 'Virtualization setup complete'}
-            
+        
         except Exception as e:
             logger.error(f"Setup failed: {e}")
             return {'success': False, 'error': str(e)}
         finally:
             self.disconnect()
     
-    def download_base_image(self) -> Dict:
+    def download_base_image(self, progress: Optional[Callable[[int, str], None]] = None) -> Dict:
         """Download Ubuntu cloud image for VMs"""
+        progress = progress or (lambda percent, message: None)
         try:
             if not self.connect():
                 return {'success': False, 'error': 'Connection failed'}
@@ -74,12 +100,13 @@ class VMService:
                 "wget -P $HOME/kvm/base https://cloud-images.ubuntu.com/focal/current/focal-server-cloudimg-amd64.img || true",
             ]
             
-            for cmd in commands:
-                result = self.ssh.execute(cmd, timeout=600)
+            for i, cmd in enumerate(commands):
+                progress(i * 100 // len(commands), cmd)
+                result = self.ssh.execute(cmd, timeout=self.INSTALL_TIMEOUT)
                 logger.info(f"Executed: {cmd}")
             
             return {'success': True, 'message': 'Base image downloaded'}
-            
+        
         except Exception as e:
             return {'success': False, 'error': str(e)}
         finally:
@@ -94,8 +121,13 @@ class VMService:
         vm_username: str = "vmadm",
         vm_password: str = "vmadm",
         ip_address: str = None,
+        progress: Optional[Callable[[int, str], None]] = None,
     ) -> Dict:
         """Create a new virtual machine"""
+        progress = progress or (lambda percent, message: None)
+        if not self.NAME_PATTERN.match(name):
+            return {'success': False, 'error': f"Invalid VM name: {name}"}
+        
         try:
             if not self.connect():
                 return {'success': False, 'error': 'Connection failed'}
@@ -109,27 +141,20 @@ class VMService:
                 last_octet = random.randint(100, 250)
                 ip_address = f"192.168.122.{last_octet}"
             
-            # Create VM directory
+            # Create VM directory and disk from base image
+            progress(10, 'Creating disk')
             vm_dir = f"$HOME/kvm/{name}"
-            self.ssh.execute(f"mkdir -p {vm_dir}")
-            
-            # Create disk from base image
             result = self.ssh.execute(
-                f"qemu-img create -F qcow2 -b ~/kvm/base/focal-server-cloudimg-amd64.img "
+                f"mkdir -p {vm_dir} && qemu-img create -F qcow2 -b ~/kvm/base/focal-server-cloudimg-amd64.img "
                 f"-f qcow2 {vm_dir}/{name}.qcow2 {disk_gb}G"
             )
             
             if not result.success:
                 return {'success': False, 'error': f"Failed to create disk: {result.stderr}"}
             
-            # Create cloud-init configs
-            network_config = self._generate_network_config(mac, ip_address)
-            user_data = self._generate_user_data(name, vm_username, vm_password)
-            
-            # Write configs
-            self.ssh.execute(f"cat > {vm_dir}/network-config << 'EOF'\n{network_config}\nEOF")
-            self.ssh.execute(f"cat > {vm_dir}/user-data << 'EOF'\n{user_data}\nEOF")
-            self.ssh.execute(f"touch {vm_dir}/meta-data")
+            # Write cloud-init configs over SFTP, keeping the password off the command line
+            progress(30, 'Writing cloud-init config')
+            self.ssh.put_files(self._cloud_init_files(name, mac, ip_address, vm_username, vm_password))
             
             # Create cloud-init seed
             result = self.ssh.execute(
@@ -141,13 +166,8 @@ class VMService:
                 logger.warning(f"cloud-localds warning: {result.stderr}")
             
             # Create VM with virt-install
-            virt_install_cmd = (
-                f"virt-install --connect qemu:///system --virt-type kvm --name {name} "
-                f"--ram {ram_mb} --vcpus={vcpus} --os-type linux --os-variant ubuntu20.04 "
-                f"--disk path={vm_dir}/{name}.qcow2,device=disk "
-                f"--disk path={vm_dir}/{name}-seed.qcow2,device=disk "
-                f"--import --network network=default,model=virtio,mac={mac} --noautoconsole"
-            )
+            progress(60, 'Running virt-install')
+            virt_install_cmd = self._virt_install_command(name, vm_dir, ram_mb, vcpus, mac)
             
             result = self.ssh.execute_sudo(virt_install_cmd, timeout=120)
             
@@ -178,13 +198,219 @@ class VMService:
                 'ip_address': ip_address,
                 'mac_address': mac,
             }
-            
+        
         except Exception as e:
             logger.error(f"VM creation failed: {e}")
             return {'success': False, 'error': str(e)}
         finally:
             self.disconnect()
     
+    def create_vms(
+        self,
+        specs: List[Dict],
+        progress: Optional[Callable[[int, str], None]] = None,
+    ) -> Dict:
+        """Create many virtual machines on the server in one pass.
+        
+        Every spec takes the keyword arguments of create_vm. The cloud-init
+        files of all VMs go up over one SFTP session, their disks and seeds
+        are built concurrently on the host (disks are copy-on-write overlays
+        of the shared base image), and the virt-install launches are
+        staggered by VM_INSTALL_STAGGER seconds.
+        """
+        progress = progress or (lambda percent, message: None)
+        
+        names = [spec['name'] for spec in specs]
+        invalid = [name for name in names if not self.NAME_PATTERN.match(name)]
+        if invalid:
+            return {'success': False, 'error': f"Invalid VM names: {', '.join(invalid)}"}
+        duplicates = sorted({name for name in names if names.count(name) > 1})
+        if duplicates:
+            return {'success': False, 'error': f"Duplicate VM names: {', '.join(duplicates)}"}
+        existing = sorted(
+            VirtualMachine.objects.filter(server=self.server, name__in=names).values_list('name', flat=True)
+        )
+        if existing:
+            return {'success': False, 'error': f"VMs already exist on this server: {', '.join(existing)}"}
+        
+        try:
+            if not self.connect():
+                return {'success': False, 'error': 'Connection failed'}
+            
+            plans = self._plan_vms(specs)
+            errors: Dict[str, str] = {}
+            
+            progress(5, f'Creating directories for {len(plans)} VMs')
+            dirs = ' '.join(f"$HOME/kvm/{plan['name']}" for plan in plans)
+            result = self.ssh.execute(
+                f"mkdir -p {dirs} && {{ test -f $HOME/{self.BASE_IMAGE} || "
+                f"{{ echo 'Base image not found, download it first' >&2; exit 1; }}; }}"
+            )
+            if not result.success:
+                return {'success': False, 'error': result.stderr.strip() or 'Failed to create VM directories'}
+            
+            progress(10, 'Uploading cloud-init configs')
+            files = {}
+            for plan in plans:
+                files.update(self._cloud_init_files(
+                    plan['name'], plan['mac'], plan['ip_address'], plan['vm_username'], plan['vm_password'],
+                ))
+            self.ssh.put_files(files)
+            
+            progress(20, 'Building disks and cloud-init seeds')
+            errors.update(self._run_provision_script(
+                self._build_disks_script(plans),
+                [plan['name'] for plan in plans],
+                timeout=300,
+                progress=lambda done: progress(20 + done * 30 // len(plans), f'{done}/{len(plans)} disks built'),
+            ))
+            
+            to_install = [plan for plan in plans if plan['name'] not in errors]
+            if to_install:
+                stagger = getattr(settings, 'VM_INSTALL_STAGGER', 2)
+                progress(50, f'Running virt-install for {len(to_install)} VMs')
+                errors.update(self._run_provision_script(
+                    self._install_script(to_install, stagger),
+                    [plan['name'] for plan in to_install],
+                    timeout=stagger * len(to_install) + 180,
+                    progress=lambda done: progress(
+                        50 + done * 45 // len(to_install), f'{done}/{len(to_install)} VMs installed'
+                    ),
+                ))
+            
+            now = timezone.now()
+            created = []
+            for plan in plans:
+                if plan['name'] in errors:
+                    continue
+                vm = VirtualMachine(
+                    server=self.server,
+                    name=plan['name'],
+                    vm_username=plan['vm_username'],
+                    vcpus=plan['vcpus'],
+                    ram_mb=plan['ram_mb'],
+                    disk_gb=plan['disk_gb'],
+                    ip_address=plan['ip_address'],
+                    mac_address=plan['mac'],
+                    status='running',
+                    last_seen=now,
+                )
+                vm.set_vm_password(plan['vm_password'])
+                created.append(vm)
+            VirtualMachine.objects.bulk_create(created)
+            
+            vm_ids = {vm.name: str(vm.id) for vm in created}
+            results = [
+                {
+                    'name': plan['name'],
+                    'success': plan['name'] not in errors,
+                    'error': errors.get(plan['name']),
+                    'vm_id': vm_ids.get(plan['name']),
+                    'ip_address': plan['ip_address'],
+                    'mac_address': plan['mac'],
+                }
+                for plan in plans
+            ]
+            return {
+                'success': not errors,
+                'message': f'{len(created)}/{len(plans)} VMs created',
+                'created': len(created),
+                'failed': len(errors),
+                'results': results,
+            }
+        
+        except Exception as e:
+            logger.error(f"Batch VM creation failed: {e}")
+            return {'success': False, 'error': str(e)}
+        finally:
+            self.disconnect()
+    
+    def _plan_vms(self, specs: List[Dict]) -> List[Dict]:
+        """Fill in defaults, MAC and IP addresses, keeping them unique on the server"""
+        used_ips = set(
+            VirtualMachine.objects.filter(server=self.server, ip_address__isnull=False)
+            .values_list('ip_address', flat=True)
+        )
+        used_ips.update(spec['ip_address'] for spec in specs if spec.get('ip_address'))
+        free_ips = [f"192.168.122.{octet}" for octet in range(100, 251) if f"192.168.122.{octet}" not in used_ips]
+        random.shuffle(free_ips)
+        
+        plans, macs = [], set()
+        for spec in specs:
+            mac = self._generate_mac()
+            while mac in macs:
+                mac = self._generate_mac()
+            macs.add(mac)
+            
+            ip_address = spec.get('ip_address')
+            if not ip_address:
+                if not free_ips:
+                    raise ValueError('No free IP addresses left in 192.168.122.100-250')
+                ip_address = free_ips.pop()
+            
+            plans.append({
+                'name': spec['name'],
+                'vcpus': spec.get('vcpus', 2),
+                'ram_mb': spec.get('ram_mb', 2048),
+                'disk_gb': spec.get('disk_gb', 10),
+                'vm_username': spec.get('vm_username', 'vmadm'),
+                'vm_password': spec.get('vm_password', 'vmadm'),
+                'ip_address': ip_address,
+                'mac': mac,
+            })
+        return plans
+    
+    def _build_disks_script(self, plans: List[Dict]) -> str:
+        """Shell script building every VM's disk and seed, VM_PROVISION_CONCURRENCY at a time"""
+        concurrency = max(1, getattr(settings, 'VM_PROVISION_CONCURRENCY', 8))
+        lines = [self.BUILD_DISK_FUNCTION]
+        for index, plan in enumerate(plans):
+            if index and index % concurrency == 0:
+                lines.append('wait')
+            lines.append(f"build {plan['name']} {int(plan['disk_gb'])} &")
+        lines.append('wait')
+        return '\n'.join(lines)
+    
+    def _install_script(self, plans: List[Dict], stagger: float) -> str:
+        """Shell script launching virt-install for every VM, ``stagger`` seconds apart"""
+        lines = []
+        for index, plan in enumerate(plans):
+            name = plan['name']
+            command = self.ssh.sudo_command(
+                self._virt_install_command(name, f"$HOME/kvm/{name}", plan['ram_mb'], plan['vcpus'], plan['mac'])
+            )
+            # An existing domain counts as installed, as in create_vm
+            lines.append(
+                f"( sleep {index * stagger:g}; out=$({command} 2>&1) || case \"$out\" in "
+                f"*'already exists'*) ;; "
+                f"*) echo \"__vm__ {name} failed $(echo \"$out\" | tail -n 3 | tr '\\n' ' ')\"; exit ;; "
+                f"esac; echo \"__vm__ {name} ok\" ) &"
+            )
+        lines.append('wait')
+        return '\n'.join(lines)
+    
+    def _run_provision_script(
+        self, script: str, names: List[str], timeout: float, progress: Callable[[int], None]
+    ) -> Dict[str, str]:
+        """Run a provisioning script and return the error of every VM it did not report done"""
+        errors: Dict[str, str] = {}
+        reported = set()
+        lines = self.ssh.iter_lines(script, timeout=timeout)
+        for line in lines:
+            parts = line.split(' ', 3)
+            if len(parts) < 3 or parts[0] != '__vm__' or parts[1] not in names:
+                continue
+            name, outcome = parts[1], parts[2]
+            reported.add(name)
+            if outcome != 'ok':
+                errors[name] = (parts[3] if len(parts) > 3 else '').strip() or 'Failed'
+            progress(len(reported))
+        
+        for name in names:
+            if name not in reported:
+                errors[name] = lines.stderr.strip() or 'No result reported'
+        return errors
+    
     def start_vm(self, vm: VirtualMachine) -> Dict:
         """Start a stopped VM"""
         try:
@@ -200,7 +426,7 @@ class VMService:
                 return {'success': True, 'message': f'VM {vm.name} started'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -218,7 +444,7 @@ class VMService:
                 return {'success': True, 'message': f'VM {vm.name} stopped'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -236,7 +462,7 @@ class VMService:
                 return {'success': True, 'message': f'VM {vm.name} destroyed'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -259,7 +485,7 @@ class VMService:
             vm.delete()
             
             return {'success': True, 'message': f'VM {vm.name} deleted'}
-            
+        
         except Exception as e:
             return {'success': False, 'error': str(e)}
         finally:
@@ -283,12 +509,13 @@ class VMService:
                 }
             else:
                 return {'success': False, 'error': 'VM not found'}
-                
+        
         finally:
             self.disconnect()
     
     def install_worker_on_vm(self, vm: VirtualMachine, device_id: str, user_id: str) -> Dict:
         """Install io.net worker on a VM"""
+        vm_ssh = None
         try:
             if not vm.ip_address:
                 return {'success': False, 'error': 'VM has no IP address'}
@@ -305,7 +532,7 @@ class VMService:
                 return {'success': False, 'error': 'Failed to connect to VM'}
             
             # Install Docker if not present
-            vm_ssh.execute_sudo("apt update && apt install -y docker.io", timeout=300)
+            vm_ssh.execute_sudo("apt update && apt install -y docker.io", timeout=self.INSTALL_TIMEOUT)
             vm_ssh.execute_sudo(f"usermod -aG docker {vm.vm_username}")
             
             # Download and run io.net setup
@@ -321,20 +548,40 @@ class VMService:
             # Run setup with device/user IDs
             result = vm_ssh.execute_sudo(
                 f"/tmp/ionet-setup.sh --device-id {device_id} --user-id {user_id}",
-                timeout=600
+                timeout=self.INSTALL_TIMEOUT
             )
             
-            vm_ssh.disconnect()
-            
             return {
                 'success': True,
                 'message': 'Worker installation started on VM',
                 'output': result.stdout[:1000],  # First 1000 chars
             }
-            
+        
         except Exception as e:
             logger.error(f"Worker installation on VM failed: {e}")
             return {'success': False, 'error': str(e)}
+        finally:
+            if vm_ssh:
+                vm_ssh.disconnect()
+    
+    def _cloud_init_files(self, name: str, mac: str, ip: str, username: str, password: str) -> Dict[str, str]:
+        """cloud-init files of a VM, keyed by their path relative to the login directory"""
+        # Relative SFTP paths land in $HOME, where the shell commands put the VM directory
+        vm_dir = f"kvm/{name}"
+        return {
+            f"{vm_dir}/network-config": self._generate_network_config(mac, ip) + '\n',
+            f"{vm_dir}/user-data": self._generate_user_data(name, username, password) + '\n',
+            f"{vm_dir}/meta-data": '',
+        }
+    
+    def _virt_install_command(self, name: str, vm_dir: str, ram_mb: int, vcpus: int, mac: str) -> str:
+        return (
+            f"virt-install --connect qemu:///system --virt-type kvm --name {name} "
+            f"--ram {ram_mb} --vcpus={vcpus} --os-type linux --os-variant ubuntu20.04 "
+            f"--disk path={vm_dir}/{name}.qcow2,device=disk "
+            f"--disk path={vm_dir}/{name}-seed.qcow2,device=disk "
+            f"--import --network network=default,model=virtio,mac={mac} --noautoconsole"
+        )
     
     def _generate_mac(self) -> str:
         """Generate a random MAC address"""
@@ -1,43 +1,62 @@
+import asyncio
 import logging
-from typing import Dict, List, Optional
+import shlex
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Dict, Iterator, List, Mapping, Optional, Tuple
+from asgiref.sync import sync_to_async
+from django.conf import settings
 from django.utils import timezone
 from ..models import Server, VirtualMachine, Worker, StatusLog
-from .ssh_service import SSHService
+from .ssh_service import SSHOutputParser, SSHService, VirshSnapshot
+from .async_ssh_service import AsyncSSHService
+from .reconcile_service import WorkerReconciler
 
 logger = logging.getLogger(__name__)
 
 
+@dataclass
+class ContainerScan:
+    """Containers and their stats scraped from one host"""
+    containers: List[Dict] = field(default_factory=list)
+    stats: Dict[str, Dict] = field(default_factory=dict)
+    error: Optional[str] = None
+
+
+@dataclass
+class WorkerScan:
+    """Everything scraped from a server during a worker check, before any DB writes"""
+    host: ContainerScan
+    error: Optional[str] = None                    # set when the server itself was unreachable
+    vm_domains: Dict = field(default_factory=dict)  # VM id -> virsh domain info
+    vms: Dict = field(default_factory=dict)        # VM id -> ContainerScan
+
+
 class WorkerStatusService:
     """Service for tracking and managing io.net worker status"""
     
-    STATUS_MAP = {
-        'running': 'running',
-        'up': 'running',
-        'exited': 'inactive',
-        'paused': 'paused',
-        'dead': 'failed',
-        'created': 'inactive',
-        'restarting': 'restart_required',
-    }
+    STATUS_MAP = WorkerReconciler.STATUS_MAP
+    # Seconds an install step may run; installs are never killed on timeout
+    INSTALL_TIMEOUT = 1800
     
     def __init__(self, server: Server):
         self.server = server
         self.ssh: Optional[SSHService] = None
     
     def connect(self) -> bool:
-        """Connect to the server via SSH"""
+        """Connect to the server via SSH, borrowing from the connection pool"""
+        # Hand back any previous lease before borrowing again
+        self.disconnect()
+        
         try:
-            decrypted_password = self.server.get_ssh_password()
+            credentials = self._ssh_credentials()
         except Exception as e:
             logger.error(f"Failed to decrypt password for server {self.server.id}: {e}")
             return False
         
-        self.ssh = SSHService(
-            host=self.server.ip_address,
-            username=self.server.ssh_username,
-            password=decrypted_password,
-            port=self.server.ssh_port
-        )
+        self.ssh = SSHService(**credentials)
         return self.ssh.connect()
     
     def disconnect(self):
@@ -45,38 +64,24 @@ class WorkerStatusService:
         if self.ssh:
             self.ssh.disconnect()
     
+    def _ssh_credentials(self) -> Dict:
+        return {
+            'host': self.server.ip_address,
+            'username': self.server.ssh_username,
+            'password': self.server.get_ssh_password(),
+            'port': self.server.ssh_port,
+        }
+    
     def check_server_status(self) -> Dict:
         """Check and update server status"""
         try:
             if self.connect():
                 # Get system info
                 sys_info = self.ssh.get_system_info()
-                
-                old_status = self.server.status
-                self.server.status = 'online'
-                self.server.last_seen = timezone.now()
-                self.server.last_error = None
-                
-                if sys_info.get('cpu'):
-                    self.server.cpu_info = sys_info['cpu']
-                if sys_info.get('memory'):
-                    self.server.memory_total = sys_info['memory'].get('total')
-                if sys_info.get('disk'):
-                    self.server.disk_total = sys_info['disk'].get('total')
-                
-                self.server.save()
-                
-                if old_status != 'online':
-                    self._log_status_change('server', self.server.id, old_status, 'online')
-                
-                return {
-                    'status': 'online',
-                    'system_info': sys_info,
-                }
+                return self.record_server_status(sys_info)
             else:
-                self._update_server_offline("Connection failed")
-                return {'status': 'offline', 'error': 'Connection failed'}
-                
+                return self.record_server_status(error="Connection failed")
+        
         except Exception as e:
             logger.error(f"Error checking server {self.server.name}: {e}")
             self._update_server_offline(str(e))
@@ -84,145 +89,340 @@ class WorkerStatusService:
         finally:
             self.disconnect()
     
-    def check_all_workers(self) -> List[Dict]:
-        """Check status of all workers on this server"""
-        results = []
+    async def check_server_status_async(self) -> Dict:
+        """Check and update server status without blocking the event loop"""
+        try:
+            ssh = AsyncSSHService(**self._ssh_credentials())
+            if not await ssh.connect():
+                return await sync_to_async(self.record_server_status)(error="Connection failed")
+            
+            try:
+                sys_info = await ssh.get_system_info()
+            finally:
+                await ssh.disconnect()
+            
+            return await sync_to_async(self.record_server_status)(sys_info)
+        
+        except Exception as e:
+            logger.error(f"Error checking server {self.server.name}: {e}")
+            await sync_to_async(self._update_server_offline)(str(e))
+            return {'status': 'error', 'error': str(e)}
+    
+    def record_server_status(self, sys_info: Optional[Dict] = None, error: Optional[str] = None) -> Dict:
+        """Store the outcome of a server probe"""
+        if error is not None:
+            self._update_server_offline(error)
+            return {'status': 'offline', 'error': error}
+        
+        sys_info = sys_info or {}
+        old_status = self.server.status
+        self.server.status = 'online'
+        self.server.last_seen = timezone.now()
+        self.server.last_error = None
+        
+        if sys_info.get('cpu'):
+            self.server.cpu_info = sys_info['cpu']
+        if sys_info.get('memory'):
+            self.server.memory_total = sys_info['memory'].get('total')
+        if sys_info.get('disk'):
+            self.server.disk_total = sys_info['disk'].get('total')
+        
+        self.server.save()
+        
+        if old_status != 'online':
+            self._log_status_change('server', self.server.id, old_status, 'online')
         
+        return {
+            'status': 'online',
+            'system_info': sys_info,
+        }
+    
+    def check_host(self, timeout: Optional[float] = None) -> Tuple[Dict, List[Dict]]:
+        """Check the server and then its workers over a single SSH session.
+        
+        With ``timeout`` the session is cut once that many seconds have passed,
+        so a hung host fails the check instead of outliving the caller.
+        """
+        started = time.monotonic()
+        server_result = None
+        watchdog = None
         try:
             if not self.connect():
-                return [{'error': 'Connection failed'}]
+                return self.record_server_status(error="Connection failed"), [{'error': 'Connection failed'}]
             
-            # Check direct workers on server
-            containers = self.ssh.get_ionet_workers()
-            results.extend(self._process_containers(containers, server=self.server))
+            if timeout:
+                remaining = max(started + timeout - time.monotonic(), 0)
+                watchdog = threading.Timer(remaining, self.ssh.abort)
+                watchdog.daemon = True
+                watchdog.start()
             
-            # Check workers on VMs
-            for vm in self.server.virtual_machines.all():
-                vm_results = self._check_vm_workers(vm)
-                results.extend(vm_results)
+            server_result = self.record_server_status(self.ssh.get_system_info())
+            vms = list(self.server.virtual_machines.all())
+            scan = self.scan_workers(vms)
+            return server_result, self.apply_worker_scan(scan, vms)
+        
+        except Exception as e:
+            logger.error(f"Error checking host {self.server.name}: {e}")
+            if server_result is None:
+                self._update_server_offline(str(e))
+                server_result = {'status': 'error', 'error': str(e)}
+            return server_result, [{'error': str(e)}]
+        finally:
+            if watchdog:
+                watchdog.cancel()
+            self.disconnect()
+    
+    async def check_host_async(self) -> Tuple[Dict, List[Dict]]:
+        """Check the server and then its workers over a single asyncio SSH session"""
+        server_result = None
+        try:
+            ssh = AsyncSSHService(**self._ssh_credentials())
+            if not await ssh.connect():
+                server_result = await sync_to_async(self.record_server_status)(error="Connection failed")
+                return server_result, [{'error': 'Connection failed'}]
             
-            return results
+            try:
+                sys_info = await ssh.get_system_info()
+                server_result = await sync_to_async(self.record_server_status)(sys_info)
+                vms = await sync_to_async(list)(self.server.virtual_machines.all())
+                scan = await self.scan_workers_async(vms, ssh=ssh)
+            finally:
+                await ssh.disconnect()
+            
+            return server_result, await sync_to_async(self.apply_worker_scan)(scan, vms)
+        
+        except Exception as e:
+            logger.error(f"Error checking host {self.server.name}: {e}")
+            if server_result is None:
+                await sync_to_async(self._update_server_offline)(str(e))
+                server_result = {'status': 'error', 'error': str(e)}
+            return server_result, [{'error': str(e)}]
+    
+    def check_all_workers(self) -> List[Dict]:
+        """Check status of all workers on this server"""
+        try:
+            if not self.connect():
+                return [{'error': 'Connection failed'}]
             
+            vms = list(self.server.virtual_machines.all())
+            scan = self.scan_workers(vms)
+            return self.apply_worker_scan(scan, vms)
+        
         except Exception as e:
             logger.error(f"Error checking workers on {self.server.name}: {e}")
             return [{'error': str(e)}]
         finally:
             self.disconnect()
     
-    def _check_vm_workers(self, vm: VirtualMachine) -> List[Dict]:
-        """Check workers running on a specific VM"""
-        results = []
+    async def check_all_workers_async(self) -> List[Dict]:
+        """Check status of all workers on this server without blocking the event loop"""
+        try:
+            vms = await sync_to_async(list)(self.server.virtual_machines.all())
+            scan = await self.scan_workers_async(vms)
+            return await sync_to_async(self.apply_worker_scan)(scan, vms)
         
-        # First check VM status via virsh
-        vms = self.ssh.check_virsh_vms()
-        vm_info = next((v for v in vms if v['name'] == vm.name), None)
+        except Exception as e:
+            logger.error(f"Error checking workers on {self.server.name}: {e}")
+            return [{'error': str(e)}]
+    
+    def scan_workers(self, vms: List[VirtualMachine]) -> WorkerScan:
+        """Collect containers on the server and its running VMs (no DB writes)"""
+        scan = WorkerScan(host=self._scan_containers(self.ssh))
+        # One virsh snapshot per sweep; every VM check is a lookup against it
+        snapshot = self.ssh.get_virsh_snapshot() if vms else None
+        
+        for vm in vms:
+            self._attach_domain(vm, snapshot, scan)
+        
+        # Probe every running VM at once, each over its own channel on the
+        # hypervisor transport, so the host costs as much as its slowest VM
+        targets = self._running_vms(vms, scan)
+        if targets:
+            workers = min(len(targets), self._vm_probe_concurrency())
+            with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='vm-probe') as executor:
+                futures = {
+                    vm.id: executor.submit(self._scan_vm, vm, ip_address)
+                    for vm, ip_address in targets
+                }
+                for vm_id, future in futures.items():
+                    vm_scan = future.result()
+                    if vm_scan:
+                        scan.vms[vm_id] = vm_scan
+        
+        return scan
+    
+    async def scan_workers_async(
+        self, vms: List[VirtualMachine], ssh: Optional[AsyncSSHService] = None
+    ) -> WorkerScan:
+        """Collect containers on the server and its running VMs over asyncio SSH.
+        
+        Opens its own connection unless an already connected `ssh` is passed.
+        """
+        owns_connection = ssh is None
+        if owns_connection:
+            ssh = AsyncSSHService(**self._ssh_credentials())
+            if not await ssh.connect():
+                return WorkerScan(host=ContainerScan(), error='Connection failed')
         
-        if vm_info:
-            old_status = vm.status
-            new_status = self._map_vm_status(vm_info['state'])
+        try:
+            scan = WorkerScan(host=await self._scan_containers_async(ssh))
+            snapshot = await ssh.get_virsh_snapshot() if vms else None
             
-            if old_status != new_status:
-                vm.status = new_status
-                vm.last_seen = timezone.now()
-                vm.save()
-                self._log_status_change('vm', vm.id, old_status, new_status)
-        
-        # If VM is running, connect to it to check workers
-        if vm.status == 'running' and vm.ip_address:
-            try:
-                vm_password = vm.get_vm_password()
-                vm_ssh = SSHService(
-                    host=vm.ip_address,
-                    username=vm.vm_username,
-                    password=vm_password,
-                    port=22
-                )
+            for vm in vms:
+                self._attach_domain(vm, snapshot, scan)
+            
+            targets = self._running_vms(vms, scan)
+            limit = asyncio.Semaphore(self._vm_probe_concurrency())
+            
+            async def probe(vm: VirtualMachine, ip_address: str):
+                async with limit:
+                    return vm.id, await self._scan_vm_async(vm, ip_address, via=ssh)
+            
+            for vm_id, vm_scan in await asyncio.gather(*(probe(vm, ip) for vm, ip in targets)):
+                if vm_scan:
+                    scan.vms[vm_id] = vm_scan
+            
+            return scan
+        finally:
+            if owns_connection:
+                await ssh.disconnect()
+    
+    def apply_worker_scan(self, scan: WorkerScan, vms: List[VirtualMachine]) -> List[Dict]:
+        """Write a worker scan to the database and return per-worker results"""
+        if scan.error:
+            return [{'error': scan.error}]
+        
+        # A failed container listing says nothing about which workers are
+        # gone, so the host's workers are left as they are
+        if scan.host.error:
+            results = [{'error': scan.host.error}]
+        else:
+            results = WorkerReconciler(server=self.server).reconcile(scan.host.containers, scan.host.stats)
+        
+        for vm in vms:
+            domain = scan.vm_domains.get(vm.id)
+            if domain:
+                old_status = vm.status
+                new_status = self._map_vm_status(domain['state'])
                 
-                if vm_ssh.connect():
-                    containers = vm_ssh.get_ionet_workers()
-                    results.extend(self._process_containers(containers, vm=vm))
-                    vm_ssh.disconnect()
-                    
-            except Exception as e:
-                logger.error(f"Error connecting to VM {vm.name}: {e}")
+                if old_status != new_status or (domain['ip_address'] and not vm.ip_address):
+                    vm.status = new_status
+                    vm.last_seen = timezone.now()
+                    vm.ip_address = vm.ip_address or domain['ip_address']
+                    vm.save()
+                if old_status != new_status:
+                    self._log_status_change('vm', vm.id, old_status, new_status)
+            
+            vm_scan = scan.vms.get(vm.id)
+            if vm_scan is None:
+                continue
+            if vm_scan.error:
                 results.append({
                     'vm': vm.name,
-                    'error': str(e)
+                    'error': vm_scan.error
                 })
+            else:
+                results.extend(WorkerReconciler(vm=vm).reconcile(vm_scan.containers, vm_scan.stats))
         
         return results
     
-    def _process_containers(
-        self, 
-        containers: List[Dict], 
-        server: Optional[Server] = None,
-        vm: Optional[VirtualMachine] = None
-    ) -> List[Dict]:
-        """Process container list and update worker statuses"""
-        results = []
-        
-        for container in containers:
-            # Find or create worker
-            worker = self._get_or_create_worker(container, server, vm)
-            
-            old_status = worker.status
-            new_status = self.STATUS_MAP.get(container['state'], 'unknown')
-            
-            worker.status = new_status
-            worker.container_id = container['id']
-            worker.container_name = container['name']
-            worker.image_name = container['image']
-            worker.last_seen = timezone.now()
-            worker.save()
-            
-            if old_status != new_status:
-                self._log_status_change('worker', worker.id, old_status, new_status)
-            
-            # Get container stats if running
-            stats = {}
-            if new_status == 'running' and self.ssh:
-                stats = self.ssh.get_container_stats(container['id'])
-                if stats.get('cpu_percent'):
-                    worker.cpu_usage = stats['cpu_percent']
-                    worker.save()
+    def _attach_domain(self, vm: VirtualMachine, snapshot: Optional[VirshSnapshot], scan: WorkerScan):
+        domain = snapshot.get(vm.name) if snapshot else None
+        if domain:
+            scan.vm_domains[vm.id] = domain
+    
+    def _scanned_vm_status(self, vm: VirtualMachine, scan: WorkerScan) -> str:
+        domain = scan.vm_domains.get(vm.id)
+        return self._map_vm_status(domain['state']) if domain else vm.status
+    
+    def _scanned_vm_ip(self, vm: VirtualMachine, scan: WorkerScan) -> Optional[str]:
+        """Stored VM address, falling back to the one libvirt reports"""
+        domain = scan.vm_domains.get(vm.id)
+        return vm.ip_address or (domain['ip_address'] if domain else None)
+    
+    def _running_vms(self, vms: List[VirtualMachine], scan: WorkerScan) -> List:
+        """(vm, ip) pairs for the VMs that are running and reachable"""
+        targets = []
+        for vm in vms:
+            ip_address = self._scanned_vm_ip(vm, scan)
+            if self._scanned_vm_status(vm, scan) == 'running' and ip_address:
+                targets.append((vm, ip_address))
+        return targets
+    
+    def _vm_probe_concurrency(self) -> int:
+        return max(1, getattr(settings, 'VM_PROBE_CONCURRENCY', 16))
+    
+    def _scan_vm(self, vm: VirtualMachine, ip_address: str) -> Optional[ContainerScan]:
+        """Collect containers running on a specific VM, tunneled through the hypervisor"""
+        try:
+            vm_ssh = SSHService(
+                host=ip_address,
+                username=vm.vm_username,
+                password=vm.get_vm_password(),
+                port=22,
+                via=self.ssh,
+            )
             
-            results.append({
-                'worker_id': str(worker.id),
-                'name': worker.name,
-                'status': new_status,
-                'container_id': container['id'],
-                'stats': stats,
-            })
+            if not vm_ssh.connect():
+                return None
+            try:
+                return self._scan_containers(vm_ssh)
+            finally:
+                vm_ssh.disconnect()
         
-        return results
+        except Exception as e:
+            logger.error(f"Error connecting to VM {vm.name}: {e}")
+            return ContainerScan(error=str(e))
     
-    def _get_or_create_worker(
-        self, 
-        container: Dict,
-        server: Optional[Server] = None,
-        vm: Optional[VirtualMachine] = None
-    ) -> Worker:
-        """Get existing worker or create new one"""
-        # Try to find by container ID first
-        worker = Worker.objects.filter(container_id=container['id']).first()
-        
-        if not worker:
-            # Try by container name
-            worker = Worker.objects.filter(container_name=container['name']).first()
-        
-        if not worker:
-            # Create new worker
-            worker = Worker.objects.create(
-                name=container['name'],
-                container_id=container['id'],
-                container_name=container['name'],
-                image_name=container['image'],
-                server=server if not vm else None,
-                virtual_machine=vm,
+    async def _scan_vm_async(
+        self, vm: VirtualMachine, ip_address: str, via: Optional[AsyncSSHService] = None
+    ) -> Optional[ContainerScan]:
+        try:
+            vm_ssh = AsyncSSHService(
+                host=ip_address,
+                username=vm.vm_username,
+                password=vm.get_vm_password(),
+                port=22,
+                via=via,
             )
-            logger.info(f"Created new worker: {worker.name}")
+            
+            if not await vm_ssh.connect():
+                return None
+            try:
+                return await self._scan_containers_async(vm_ssh)
+            finally:
+                await vm_ssh.disconnect()
+        
+        except Exception as e:
+            logger.error(f"Error connecting to VM {vm.name}: {e}")
+            return ContainerScan(error=str(e))
+    
+    def _scan_containers(self, ssh: SSHService) -> ContainerScan:
+        try:
+            containers = ssh.get_ionet_workers(strict=True)
+        except RuntimeError as e:
+            # An empty list here would read as every container being gone
+            return ContainerScan(error=str(e))
         
-        return worker
+        # One bulk `docker stats` call for every running container on the host
+        running_ids = self._running_ids(containers)
+        stats = ssh.get_containers_stats(running_ids) if running_ids else {}
+        return ContainerScan(containers=containers, stats=stats)
+    
+    async def _scan_containers_async(self, ssh: AsyncSSHService) -> ContainerScan:
+        try:
+            containers = await ssh.get_ionet_workers(strict=True)
+        except RuntimeError as e:
+            return ContainerScan(error=str(e))
+        running_ids = self._running_ids(containers)
+        stats = await ssh.get_containers_stats(running_ids) if running_ids else {}
+        return ContainerScan(containers=containers, stats=stats)
+    
+    def _running_ids(self, containers: List[Dict]) -> List[str]:
+        return [
+            c['id'] for c in containers
+            if self.STATUS_MAP.get(c['state'], 'unknown') == 'running'
+        ]
     
     def _map_vm_status(self, virsh_state: str) -> str:
         """Map virsh state to our VM status"""
@@ -283,7 +483,7 @@ class WorkerStatusService:
                 return {'success': True, 'message': 'Worker started'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -304,7 +504,7 @@ class WorkerStatusService:
                 return {'success': True, 'message': 'Worker stopped'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -326,7 +526,7 @@ class WorkerStatusService:
                 return {'success': True, 'message': 'Worker restarted'}
             else:
                 return {'success': False, 'error': result.stderr}
-                
+        
         finally:
             self.disconnect()
     
@@ -339,17 +539,115 @@ class WorkerStatusService:
             if not self.connect():
                 return {'success': False, 'error': 'Connection failed'}
             
-            result = self.ssh.execute(f"docker logs --tail {lines} {worker.container_id}")
+            result = self.ssh.execute(
+                f"docker logs --tail {int(lines)} {shlex.quote(worker.container_id)}", kill_on_timeout=True
+            )
             
             return {
                 'success': True,
                 'logs': result.stdout,
                 'errors': result.stderr,
             }
-                
+        
         finally:
             self.disconnect()
     
+    @staticmethod
+    def parse_log_options(params: Mapping[str, str]) -> Dict:
+        """Read tail/follow/since/grep from query parameters, raising ValueError on bad input"""
+        try:
+            tail = int(params.get('tail', params.get('lines', 100)))
+        except (TypeError, ValueError):
+            raise ValueError("tail must be an integer")
+        if tail < 0:
+            raise ValueError("tail must not be negative")
+        return {
+            'tail': tail,
+            'follow': str(params.get('follow', '')).lower() in ('1', 'true', 'yes'),
+            'since': params.get('since') or None,
+            'grep': params.get('grep') or None,
+        }
+    
+    def stream_worker_logs(
+        self, worker: Worker, timeout: Optional[float] = None, **options
+    ) -> Iterator[List[str]]:
+        """Yield a container's log lines as they are read from the host it runs on.
+        
+        The first item is an empty list, sent once the connection is up, so
+        callers can report connection errors before starting a response.
+        """
+        if not worker.container_id:
+            raise ValueError("No container ID")
+        command = SSHOutputParser.docker_logs_command(worker.container_id, **options)
+        return self._iter_logs(worker, command, timeout)
+    
+    def stream_worker_logs_async(self, worker: Worker, **options) -> AsyncIterator[List[str]]:
+        """Async counterpart of stream_worker_logs, for WebSocket consumers"""
+        if not worker.container_id:
+            raise ValueError("No container ID")
+        command = SSHOutputParser.docker_logs_command(worker.container_id, **options)
+        return self._iter_logs_async(worker, command)
+    
+    def _iter_logs(self, worker: Worker, command: str, timeout: Optional[float]) -> Iterator[List[str]]:
+        if not self.connect():
+            raise ConnectionError("Connection failed")
+        
+        vm_ssh = None
+        try:
+            ssh = self.ssh
+            vm = worker.virtual_machine
+            if vm:
+                if not vm.ip_address:
+                    raise ConnectionError(f"VM {vm.name} has no IP address")
+                vm_ssh = SSHService(
+                    host=vm.ip_address,
+                    username=vm.vm_username,
+                    password=vm.get_vm_password(),
+                    port=22,
+                    via=self.ssh,
+                )
+                if not vm_ssh.connect():
+                    raise ConnectionError(f"Connection to VM {vm.name} failed")
+                ssh = vm_ssh
+            
+            yield []
+            yield from ssh.stream_lines(command, timeout=timeout)
+        finally:
+            if vm_ssh:
+                vm_ssh.disconnect()
+            self.disconnect()
+    
+    async def _iter_logs_async(self, worker: Worker, command: str) -> AsyncIterator[List[str]]:
+        host_ssh = AsyncSSHService(**self._ssh_credentials())
+        vm_ssh = None
+        try:
+            if not await host_ssh.connect():
+                raise ConnectionError("Connection failed")
+            
+            ssh = host_ssh
+            vm = worker.virtual_machine
+            if vm:
+                if not vm.ip_address:
+                    raise ConnectionError(f"VM {vm.name} has no IP address")
+                vm_ssh = AsyncSSHService(
+                    host=vm.ip_address,
+                    username=vm.vm_username,
+                    password=vm.get_vm_password(),
+                    port=22,
+                    via=host_ssh,
+                )
+                if not await vm_ssh.connect():
+                    raise ConnectionError(f"Connection to VM {vm.name} failed")
+                ssh = vm_ssh
+            
+            yield []
+            async for lines in ssh.stream_lines(command):
+                yield lines
+        finally:
+            if vm_ssh:
+                await vm_ssh.disconnect()
+            await host_ssh.disconnect()
+    
     def install_new_worker(self, device_id: str, user_id: str) -> Dict:
         """Install a new io.net worker"""
         try:
@@ -364,12 +662,12 @@ class WorkerStatusService:
             ]
             
             for cmd in commands:
-                result = self.ssh.execute_sudo(cmd, timeout=300)
+                result = self.ssh.execute_sudo(cmd, timeout=self.INSTALL_TIMEOUT)
                 if not result.success:
                     return {'success': False, 'error': f"Failed: {cmd}\n{result.stderr}"}
             
             return {'success': True, 'message': 'Worker installation started'}
-            
+        
         finally:
             self.disconnect()
 
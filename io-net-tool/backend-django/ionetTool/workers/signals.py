@@ -0,0 +1,96 @@
+import logging
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from .models import Server, VirtualMachine, Worker
+from .services.dashboard_service import DashboardStatsService
+from .services.state_store import StatusStateStore
+from .services.subscriptions import StatusSubscriptions
+
+logger = logging.getLogger(__name__)
+
+ENTITY_TYPES = {Server: 'server', VirtualMachine: 'vm', Worker: 'worker'}
+
+
+@receiver(post_init, sender=Server)
+@receiver(post_init, sender=VirtualMachine)
+@receiver(post_init, sender=Worker)
+def remember_status(sender, instance, **kwargs):
+    """Note the status an instance was loaded with, so saves can tell if it changed"""
+    # Read from __dict__ so a deferred status is not fetched
+    instance._saved_status = instance.__dict__.get('status')
+
+
+@receiver(post_save, sender=Server)
+@receiver(post_save, sender=VirtualMachine)
+@receiver(post_save, sender=Worker)
+def invalidate_stats_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Drop cached dashboard stats when a counted status actually changed"""
+    if update_fields is not None and 'status' not in update_fields:
+        changed = created
+    else:
+        # Probes save servers and VMs on every sweep; only a new status moves the counters
+        status = instance.__dict__.get('status')
+        changed = created or status != instance._saved_status
+        instance._saved_status = status
+    
+    if changed:
+        DashboardStatsService.invalidate()
+
+
+@receiver(post_delete, sender=Server)
+@receiver(post_delete, sender=VirtualMachine)
+@receiver(post_delete, sender=Worker)
+def invalidate_stats_on_delete(sender, instance, **kwargs):
+    """Drop cached dashboard stats when something is removed"""
+    DashboardStatsService.invalidate()
+
+
+@receiver(post_delete, sender=Server)
+@receiver(post_delete, sender=VirtualMachine)
+@receiver(post_delete, sender=Worker)
+def publish_removal_on_delete(sender, instance, **kwargs):
+    """Record a remove delta once the delete commits, so resuming clients drop the entity"""
+    entity = ENTITY_TYPES[sender]
+    entity_id = str(instance.pk)
+    groups = removal_groups(entity, instance)
+    transaction.on_commit(lambda: publish_removal(entity, entity_id, groups))
+
+
+def removal_groups(entity, instance):
+    """Groups that were told about this entity while it existed"""
+    if entity == 'server':
+        return [StatusSubscriptions.FLEET_GROUP]
+    if entity == 'vm':
+        return [StatusSubscriptions.FLEET_GROUP, StatusSubscriptions.group_name('vm', instance.pk)]
+    
+    server_id = instance.server_id
+    if server_id is None and instance.virtual_machine_id:
+        # Cascades delete workers before their VM, so the VM row is still there
+        server_id = VirtualMachine.objects.filter(
+            id=instance.virtual_machine_id
+        ).values_list('server_id', flat=True).first()
+    groups = [
+        StatusSubscriptions.ALL_GROUP,
+        StatusSubscriptions.group_name('worker', instance.pk),
+        StatusSubscriptions.group_name('vm', instance.virtual_machine_id),
+        StatusSubscriptions.group_name('server', server_id),
+    ]
+    return [g for g in groups if g]
+
+
+def publish_removal(entity, entity_id, groups):
+    try:
+        delta = StatusStateStore.remove(entity, entity_id)
+        channel_layer = get_channel_layer()
+        if channel_layer is None:
+            return
+        for group in groups:
+            async_to_sync(channel_layer.group_send)(group, {
+                'type': 'status_delta',
+                'data': {'seq': delta['seq'], 'deltas': [delta]},
+            })
+    except Exception as e:
+        logger.error(f"Error publishing removal of {entity} {entity_id}: {e}")
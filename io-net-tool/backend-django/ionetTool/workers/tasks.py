@@ -1,94 +1,365 @@
-from celery import shared_task
+from celery import Task, shared_task
 from channels.layers import get_channel_layer
-from asgiref.sync import async_to_sync
+from asgiref.sync import sync_to_async
+from django.conf import settings
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-@shared_task
-def check_all_workers_status():
-    """Background task to check all workers status"""
-    from .models import Server
-    from .services import WorkerStatusService
+class JobTask(Task):
+    """Task that records its lifecycle on the Job sharing its task ID"""
+    
+    def before_start(self, task_id, args, kwargs):
+        from .services import JobService
+        JobService.start(task_id)
+    
+    def on_success(self, retval, task_id, args, kwargs):
+        from .services import JobService
+        JobService.finish(task_id, retval)
+    
+    def on_failure(self, exc, task_id, args, kwargs, einfo):
+        from .services import JobService
+        JobService.fail(task_id, str(exc))
+
+
+def broadcast_deltas(broadcaster, deltas, group=None):
+    """Queue published state deltas for one group (the fleet summary by default)"""
+    from .services import StatusSubscriptions
+    
+    broadcaster.add(group or StatusSubscriptions.FLEET_GROUP, deltas)
+
+
+def publish_dashboard_stats(broadcaster):
+    """Publish the dashboard counters as a delta if they moved"""
+    from .services import DashboardStatsService, StatusStateStore
+    
+    try:
+        delta = StatusStateStore.publish('stats', 'dashboard', DashboardStatsService.get_stats())
+        broadcast_deltas(broadcaster, [delta] if delta else [])
+    except Exception as e:
+        logger.error(f"Error broadcasting dashboard stats: {e}")
+
+
+def publish_server(broadcaster, server_id, server_data):
+    """Publish one server's state; returns its delta, or None if nothing changed"""
+    from .services import StatusStateStore
+    
+    delta = StatusStateStore.publish('server', server_id, server_data)
+    broadcast_deltas(broadcaster, [delta] if delta else [])
+    return delta
+
+
+def publish_host_workers(broadcaster, server_id):
+    """Publish the workers on one server and its VMs; returns the deltas"""
+    from django.db.models import Q
+    from .models import Worker
     from .serializers import WorkerSerializer
+    from .services import StatusStateStore, StatusSubscriptions
+    
+    workers = Worker.objects.with_hosts().filter(
+        Q(server_id=server_id) | Q(virtual_machine__server_id=server_id)
+    )
+    worker_data = WorkerSerializer(workers, many=True).data
+    deltas = {d['id']: d for d in StatusStateStore.publish_many('worker', worker_data)}
+    # Each group only hears about the workers it covers
+    routed = StatusSubscriptions.route_worker_deltas(server_id, worker_data, deltas)
+    for group, group_deltas in routed.items():
+        broadcast_deltas(broadcaster, group_deltas, group)
+    return list(deltas.values())
+
+
+def run_host_check(check_name, server_id, token, check):
+    """Run one host check under its lock unless a newer sweep superseded it"""
+    from celery.exceptions import SoftTimeLimitExceeded
+    from .models import Server
+    from .services import HostLock, HostCheckTokens
     
-    results = []
-    channel_layer = get_channel_layer()
+    result = {'server_id': server_id}
+    if token and not HostCheckTokens.is_current(check_name, server_id, token):
+        # A newer sweep queued this host again; let that one do the work
+        return {**result, 'status': 'superseded'}
     
-    for server in Server.objects.filter(status='online'):
+    lock = HostLock(server_id)
+    if not lock.acquire():
+        return {**result, 'status': 'locked'}
+    
+    try:
+        server = Server.objects.with_counts().get(id=server_id)
+        result['server_name'] = server.name
+        return {**result, 'status': 'ok', **check(server)}
+    except Server.DoesNotExist:
+        return {**result, 'status': 'error', 'error': 'Server not found'}
+    except SoftTimeLimitExceeded:
+        logger.error(f"Check of server {server_id} timed out")
+        return {**result, 'status': 'timeout'}
+    except Exception as e:
+        logger.error(f"Error checking server {server_id}: {e}")
+        return {**result, 'status': 'error', 'error': str(e)}
+    finally:
+        lock.release()
+
+
+@shared_task(soft_time_limit=settings.WORKER_SWEEP_HOST_TIMEOUT)
+def check_host_workers(server_id: str, token: str = None):
+    """Check the workers on one server (routed to the host check queue)"""
+    from .services import WorkerStatusService, DeltaBuffer
+    
+    def check(server):
+        worker_results = WorkerStatusService(server).check_all_workers()
+        # The sweep's chord callback sends every host's deltas in one batch
+        buffer = DeltaBuffer()
         try:
-            service = WorkerStatusService(server)
-            worker_results = service.check_all_workers()
-            results.extend(worker_results)
-            
-            # Send real-time update via WebSocket
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    'status_updates',
-                    {
-                        'type': 'status_update',
-                        'data': {
-                            'server_id': str(server.id),
-                            'workers': worker_results,
-                        }
-                    }
-                )
-                
+            # Send only the fields that changed for this host's workers
+            publish_host_workers(buffer, server_id)
+        except Exception as e:
+            logger.error(f"Error publishing workers for {server.name}: {e}")
+        return {'checked': len(worker_results), 'deltas': buffer.groups}
+    
+    return run_host_check('workers', server_id, token, check)
+
+
+@shared_task(soft_time_limit=settings.WORKER_SWEEP_HOST_TIMEOUT)
+def check_host_server(server_id: str, token: str = None):
+    """Check one server's reachability (routed to the host check queue)"""
+    from .services import WorkerStatusService, DeltaBuffer
+    from .serializers import ServerSerializer
+    
+    def check(server):
+        result = WorkerStatusService(server).check_server_status()
+        buffer = DeltaBuffer()
+        try:
+            # Unchanged servers publish nothing
+            publish_server(buffer, server_id, ServerSerializer(server).data)
         except Exception as e:
-            logger.error(f"Error checking workers on {server.name}: {e}")
+            logger.error(f"Error publishing server {server.name}: {e}")
+        return {'server_status': result.get('status'), 'deltas': buffer.groups}
+    
+    return run_host_check('servers', server_id, token, check)
+
+
+def broadcast_host_results(broadcaster, host_results):
+    """Queue the deltas the per-host subtasks of a sweep returned"""
+    for result in host_results:
+        for group, deltas in (result.get('deltas') or {}).items():
+            broadcaster.add(group, deltas)
+
+
+def dispatch_host_checks(check_name, task, server_ids, callback):
+    """Queue one subtask per server and collect their results with a chord"""
+    from celery import chord
+    from .services import HostCheckTokens
     
-    return {'checked': len(results)}
+    header = [
+        task.s(str(server_id), HostCheckTokens.issue(check_name, server_id))
+        for server_id in server_ids
+    ]
+    if not header:
+        return callback([])
+    result = chord(header)(callback.s())
+    return {'dispatched': len(header), 'sweep_id': result.id}
+
+
+@shared_task
+def check_all_workers_status():
+    """Background task to check all workers status, one subtask per server"""
+    from .models import Server
+    
+    server_ids = Server.objects.filter(status='online').values_list('id', flat=True)
+    return dispatch_host_checks('workers', check_host_workers, server_ids, collect_workers_sweep)
+
+
+@shared_task
+def collect_workers_sweep(host_results):
+    """Chord callback: fleet-wide result of a workers sweep"""
+    from .services import BroadcastAggregator
+    
+    with BroadcastAggregator(get_channel_layer()) as broadcaster:
+        broadcast_host_results(broadcaster, host_results)
+        publish_dashboard_stats(broadcaster)
+    
+    return {
+        'checked': sum(r.get('checked', 0) for r in host_results),
+        'incomplete_servers': [r['server_id'] for r in host_results if r['status'] != 'ok'],
+        'superseded': [r['server_id'] for r in host_results if r['status'] in ('superseded', 'locked')],
+    }
 
 
 @shared_task
 def check_all_servers_status():
-    """Background task to check all servers status"""
+    """Background task to check all servers status, one subtask per server"""
+    from .models import Server
+    
+    server_ids = Server.objects.values_list('id', flat=True)
+    return dispatch_host_checks('servers', check_host_server, server_ids, collect_servers_sweep)
+
+
+@shared_task
+def collect_servers_sweep(host_results):
+    """Chord callback: fleet-wide result of a servers sweep"""
+    from .services import BroadcastAggregator
+    
+    with BroadcastAggregator(get_channel_layer()) as broadcaster:
+        broadcast_host_results(broadcaster, host_results)
+        publish_dashboard_stats(broadcaster)
+    
+    return {
+        'checked': len(host_results),
+        'servers': [
+            {'server_id': r['server_id'], 'status': r.get('server_status', r['status'])}
+            for r in host_results
+        ],
+    }
+
+
+@shared_task
+def poll_due_hosts():
+    """Poll the hosts the adaptive scheduler says are due (runs every few seconds)"""
     from .models import Server
-    from .services import WorkerStatusService
     from .serializers import ServerSerializer
+    from .services import (
+        WorkerStatusService, FleetSweepService, AsyncFleetSweepService,
+        BroadcastAggregator, AdaptivePollScheduler, HostLock,
+    )
     
-    results = []
-    channel_layer = get_channel_layer()
+    scheduler = AdaptivePollScheduler()
+    locks = []
+    abandoned = set()
+    deadline = settings.WORKER_SWEEP_DEADLINE
+    if not scheduler.lock(deadline + 30):
+        # The previous tick is still polling
+        return {'polled': 0, 'skipped': 'busy'}
     
-    for server in Server.objects.all():
-        try:
-            service = WorkerStatusService(server)
-            result = service.check_server_status()
-            results.append({
-                'server_id': str(server.id),
-                'status': result.get('status'),
-            })
-            
-            # Send real-time update via WebSocket
-            if channel_layer:
-                async_to_sync(channel_layer.group_send)(
-                    'status_updates',
-                    {
-                        'type': 'status_update',
-                        'data': {
-                            'type': 'server',
-                            'server': ServerSerializer(server).data,
-                        }
-                    }
-                )
+    try:
+        scheduler.load()
+        servers = {str(s.id): s for s in Server.objects.with_counts()}
+        scheduler.sync(servers.values())
+        due = scheduler.due(limit=settings.POLL_MAX_HOSTS_PER_TICK)
+        if not due:
+            scheduler.save()
+            return {'polled': 0}
+        
+        # Server and worker checks share one SSH session per host
+        def check(server):
+            result, _ = WorkerStatusService(server).check_host(timeout=settings.WORKER_SWEEP_HOST_TIMEOUT)
+            return result, ServerSerializer(server).data
+        
+        async def check_async(server):
+            result, _ = await WorkerStatusService(server).check_host_async()
+            return result, await sync_to_async(lambda: ServerSerializer(server).data)()
+        
+        # Hosts another task is probing right now stay due for the next tick
+        for host in due:
+            lock = HostLock(host.server_id)
+            if lock.acquire():
+                locks.append(lock)
+        targets = [servers[lock.server_id] for lock in locks]
+        threaded = settings.WORKER_SWEEP_BACKEND != 'asyncio'
+        if not threaded:
+            hosts = AsyncFleetSweepService(deadline=deadline).run(targets, check_async)
+        else:
+            hosts = FleetSweepService(deadline=deadline).iter_sweep(targets, check)
+        
+        outcomes = {}
+        with BroadcastAggregator(get_channel_layer()) as broadcaster:
+            for host in hosts:
+                if host.status == 'skipped':
+                    # Never started before the deadline; stays due for the next tick
+                    continue
+                if host.status == 'timeout' and threaded:
+                    # The abandoned thread may still be on the host until its
+                    # probe times out; let the lock expire instead of freeing it
+                    abandoned.add(host.server_id)
+                if not host.ok:
+                    logger.error(f"Error polling {host.server_name}: {host.error}")
+                    scheduler.record(host.server_id, scheduler.FAILED)
+                    outcomes[host.server_id] = scheduler.FAILED
+                    continue
                 
-        except Exception as e:
-            logger.error(f"Error checking server {server.name}: {e}")
+                result, server_data = host.result
+                try:
+                    deltas = [publish_server(broadcaster, host.server_id, server_data)]
+                    deltas += publish_host_workers(broadcaster, host.server_id)
+                except Exception as e:
+                    logger.error(f"Error broadcasting {host.server_name}: {e}")
+                    deltas = []
+                
+                # Status changes keep a host on the short interval; quiet hosts back off
+                if result.get('status') != 'online':
+                    outcome = scheduler.FAILED
+                elif any(d and 'status' in d['changes'] for d in deltas):
+                    outcome = scheduler.CHANGED
+                else:
+                    outcome = scheduler.STABLE
+                scheduler.record(host.server_id, outcome)
+                outcomes[host.server_id] = outcome
+            
+            publish_dashboard_stats(broadcaster)
+        
+        scheduler.save()
+        return {'polled': len(outcomes), 'outcomes': outcomes}
+    finally:
+        for lock in locks:
+            if lock.server_id not in abandoned:
+                lock.release()
+        scheduler.unlock()
+
+
+@shared_task
+def compact_status_logs():
+    """Roll raw status logs past the retention window up into daily aggregates"""
+    from .services import StatusLogRetention
     
-    return {'checked': len(results)}
+    return StatusLogRetention().run()
 
 
 @shared_task
+def rollup_worker_metrics():
+    """Fold new raw worker metrics into the 1m/1h/1d series and prune expired rows"""
+    from .services import WorkerMetricsStore
+    
+    result = WorkerMetricsStore.rollup()
+    result['pruned'] = WorkerMetricsStore.prune()
+    return result
+
+
+@shared_task(base=JobTask)
 def check_single_server(server_id: str):
     """Check status of a single server"""
     from .models import Server
+    from .serializers import ServerSerializer
     from .services import WorkerStatusService
     
     try:
         server = Server.objects.get(id=server_id)
         service = WorkerStatusService(server)
-        return service.check_server_status()
+        result = service.check_server_status()
+        server = Server.objects.with_counts().get(pk=server.pk)
+        return {
+            'server': ServerSerializer(server).data,
+            'status_check': result,
+        }
+    except Server.DoesNotExist:
+        return {'error': 'Server not found'}
+
+
+@shared_task(base=JobTask)
+def check_server_workers(server_id: str):
+    """Check all workers on a single server"""
+    from .models import Server
+    from .serializers import ServerSerializer
+    from .services import WorkerStatusService
+    
+    try:
+        server = Server.objects.get(id=server_id)
+        service = WorkerStatusService(server)
+        results = service.check_all_workers()
+        # The check may have added workers; re-read the annotated counts
+        server = Server.objects.with_counts().get(pk=server.pk)
+        return {
+            'server': ServerSerializer(server).data,
+            'workers': results,
+        }
     except Server.DoesNotExist:
         return {'error': 'Server not found'}
 
@@ -115,12 +386,76 @@ def check_single_worker(worker_id: str):
                 return result
         
         return {'worker_id': worker_id, 'status': 'not_found'}
-        
+    
     except Worker.DoesNotExist:
         return {'error': 'Worker not found'}
 
 
-@shared_task
+@shared_task(base=JobTask)
+def worker_action_async(worker_id: str, action: str):
+    """Start, stop or restart a worker container"""
+    from .models import Worker
+    from .serializers import WorkerSerializer
+    from .services import WorkerStatusService
+    
+    try:
+        worker = Worker.objects.with_hosts().get(id=worker_id)
+    except Worker.DoesNotExist:
+        return {'error': 'Worker not found'}
+    
+    server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
+    if not server:
+        return {'error': 'No server found'}
+    
+    service = WorkerStatusService(server)
+    actions = {
+        'start': service.start_worker,
+        'stop': service.stop_worker,
+        'restart': service.restart_worker,
+    }
+    if action not in actions:
+        return {'error': f'Unknown action: {action}'}
+    
+    result = actions[action](worker)
+    return {
+        'worker': WorkerSerializer(worker).data,
+        'result': result,
+    }
+
+
+@shared_task(bind=True, base=JobTask)
+def bulk_worker_action_async(self, worker_ids: list, action: str, mode: str = 'batch', max_unavailable: int = 1):
+    """Start, stop or restart many worker containers, batched per host"""
+    from .services import BulkWorkerActionService, JobService
+    
+    service = BulkWorkerActionService(
+        action,
+        mode=mode,
+        max_unavailable=max_unavailable,
+        progress=JobService.progress_callback(self.request.id),
+    )
+    return service.run(worker_ids)
+
+
+@shared_task(base=JobTask)
+def get_worker_logs_async(worker_id: str, lines: int = 100):
+    """Fetch a worker container's logs"""
+    from .models import Worker
+    from .services import WorkerStatusService
+    
+    try:
+        worker = Worker.objects.with_hosts().get(id=worker_id)
+    except Worker.DoesNotExist:
+        return {'error': 'Worker not found'}
+    
+    server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
+    if not server:
+        return {'error': 'No server found'}
+    
+    return WorkerStatusService(server).get_worker_logs(worker, lines)
+
+
+@shared_task(base=JobTask)
 def install_worker_async(server_id: str = None, vm_id: str = None, device_id: str = '', user_id: str = ''):
     """Background task to install a worker"""
     from .models import Server, VirtualMachine
@@ -137,13 +472,42 @@ def install_worker_async(server_id: str = None, vm_id: str = None, device_id: st
             return service.install_new_worker(device_id, user_id)
         else:
             return {'error': 'No server or VM specified'}
-            
+    
     except (Server.DoesNotExist, VirtualMachine.DoesNotExist) as e:
         return {'error': str(e)}
 
 
-@shared_task
+@shared_task(bind=True, base=JobTask)
+def setup_virtualization_async(self, server_id: str):
+    """Install KVM/QEMU on a server"""
+    from .models import Server
+    from .services import VMService, JobService
+    
+    try:
+        server = Server.objects.get(id=server_id)
+    except Server.DoesNotExist:
+        return {'error': 'Server not found'}
+    
+    return VMService(server).setup_virtualization(progress=JobService.progress_callback(self.request.id))
+
+
+@shared_task(bind=True, base=JobTask)
+def download_base_image_async(self, server_id: str):
+    """Download the Ubuntu base image on a server"""
+    from .models import Server
+    from .services import VMService, JobService
+    
+    try:
+        server = Server.objects.get(id=server_id)
+    except Server.DoesNotExist:
+        return {'error': 'Server not found'}
+    
+    return VMService(server).download_base_image(progress=JobService.progress_callback(self.request.id))
+
+
+@shared_task(bind=True, base=JobTask)
 def create_vm_async(
+    self,
     server_id: str,
     name: str,
     vcpus: int = 2,
@@ -154,13 +518,14 @@ def create_vm_async(
     ip_address: str = None
 ):
     """Background task to create a VM"""
-    from .models import Server
-    from .services import VMService
+    from .models import Server, VirtualMachine
+    from .serializers import VirtualMachineSerializer
+    from .services import VMService, JobService
     
     try:
         server = Server.objects.get(id=server_id)
         service = VMService(server)
-        return service.create_vm(
+        result = service.create_vm(
             name=name,
             vcpus=vcpus,
             ram_mb=ram_mb,
@@ -168,7 +533,59 @@ def create_vm_async(
             vm_username=vm_username,
             vm_password=vm_password,
             ip_address=ip_address,
+            progress=JobService.progress_callback(self.request.id),
         )
+        if not result['success']:
+            return result
+        vm = VirtualMachine.objects.with_counts().get(id=result['vm_id'])
+        return {
+            'vm': VirtualMachineSerializer(vm).data,
+            'result': result,
+        }
+    except Server.DoesNotExist:
+        return {'error': 'Server not found'}
+
+
+@shared_task(bind=True, base=JobTask)
+def create_vms_async(self, server_id: str, vms: list):
+    """Background task to create many VMs on one server"""
+    from .models import Server
+    from .services import VMService, JobService
+    
+    try:
+        server = Server.objects.get(id=server_id)
     except Server.DoesNotExist:
         return {'error': 'Server not found'}
+    
+    return VMService(server).create_vms(vms, progress=JobService.progress_callback(self.request.id))
 
+
+@shared_task(base=JobTask)
+def vm_action_async(vm_id: str, action: str):
+    """Start, stop, force stop or delete a VM"""
+    from .models import VirtualMachine
+    from .serializers import VirtualMachineSerializer
+    from .services import VMService
+    
+    try:
+        vm = VirtualMachine.objects.select_related('server').get(id=vm_id)
+    except VirtualMachine.DoesNotExist:
+        return {'error': 'VM not found'}
+    
+    service = VMService(vm.server)
+    if action == 'remove':
+        return service.delete_vm(vm)
+    
+    actions = {
+        'start': service.start_vm,
+        'stop': service.stop_vm,
+        'destroy': service.destroy_vm,
+    }
+    if action not in actions:
+        return {'error': f'Unknown action: {action}'}
+    
+    result = actions[action](vm)
+    return {
+        'vm': VirtualMachineSerializer(vm).data,
+        'result': result,
+    }
@@ -0,0 +1,184 @@
+import uuid
+import paramiko
+from asgiref.sync import async_to_sync
+from channels.testing import WebsocketCommunicator
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from .models import Server, VirtualMachine, Worker
+from .services import AdaptivePollScheduler, HostLock, StatusStateStore
+from .consumers import StatusConsumer
+from .services.ssh_service import LineStream
+
+
+class WorkerMetricsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+    
+    def test_malformed_target_id_is_rejected(self):
+        for name in ('worker', 'vm', 'server'):
+            response = self.client.get('/api/metrics/', {name: 'abc'})
+            self.assertEqual(response.status_code, 400)
+            self.assertEqual(response.json(), {'error': f'Invalid {name} id'})
+    
+    def test_valid_target_id_is_accepted(self):
+        response = self.client.get('/api/metrics/', {'server': str(uuid.uuid4())})
+        self.assertEqual(response.status_code, 200)
+
+
+class StatusRemovalDeltaTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.server = Server.objects.create(
+            name='host', ip_address='10.0.0.1', ssh_username='root', ssh_password='x'
+        )
+        self.vm = VirtualMachine.objects.create(server=self.server, name='vm1')
+        self.worker = Worker.objects.create(name='w1', virtual_machine=self.vm)
+    
+    def test_delete_is_published_as_remove_delta(self):
+        seq = StatusStateStore.current_seq()
+        worker_id = str(self.worker.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.worker.delete()
+        
+        deltas = StatusStateStore.deltas_since(seq)
+        self.assertEqual([(d['entity'], d['id'], d['op']) for d in deltas], [('worker', worker_id, 'remove')])
+    
+    def test_cascade_removes_every_entity(self):
+        seq = StatusStateStore.current_seq()
+        server_id, vm_id, worker_id = str(self.server.pk), str(self.vm.pk), str(self.worker.pk)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.server.delete()
+        
+        removed = {(d['entity'], d['id']) for d in StatusStateStore.deltas_since(seq) if d['op'] == 'remove'}
+        self.assertEqual(removed, {('server', server_id), ('vm', vm_id), ('worker', worker_id)})
+
+
+class WorkerLogsViewTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        server = Server.objects.create(name='host', ip_address='10.0.0.1', ssh_username='root', ssh_password='x')
+        self.worker = Worker.objects.create(name='w1', server=server, container_id='abc123')
+    
+    def test_bad_lines_is_rejected(self):
+        for lines in ('abc', '-5'):
+            response = self.client.get(f'/api/workers/{self.worker.pk}/logs/', {'lines': lines})
+            self.assertEqual(response.status_code, 400)
+
+
+class LineStreamTests(SimpleTestCase):
+    def test_ssh_errors_end_the_stream_as_failed(self):
+        for error in (paramiko.SSHException('SSH session not active'), OSError('Socket is closed')):
+            def events():
+                yield 'stdout', b'first\n'
+                raise error
+            
+            stream = LineStream(events())
+            self.assertEqual(list(stream), ['first'])
+            self.assertFalse(stream.success)
+            self.assertEqual(stream.stderr, str(error))
+
+
+class QueryCountTests(TestCase):
+    """Endpoints run a fixed number of queries however big the fleet is"""
+    
+    # Lists are a count plus one page; details and dashboard counters are flat
+    LIST_QUERIES = 2
+    DETAIL_QUERIES = 1
+    DASHBOARD_QUERIES = 3
+    
+    def setUp(self):
+        self.client = APIClient()
+    
+    def create_fleet(self, size):
+        """Each server gets two VMs, a direct worker and a worker per VM"""
+        servers = Server.objects.bulk_create([
+            Server(name=f'bench-{i}', ip_address='10.0.0.1', ssh_username='bench', ssh_password='')
+            for i in range(size)
+        ])
+        vms = VirtualMachine.objects.bulk_create([
+            VirtualMachine(server=server, name=f'{server.name}-vm{j}')
+            for server in servers
+            for j in range(2)
+        ])
+        workers = Worker.objects.bulk_create(
+            [Worker(server=server, name=f'{server.name}-w') for server in servers]
+            + [Worker(server=vm.server, virtual_machine=vm, name=f'{vm.name}-w') for vm in vms]
+        )
+        return servers[0], vms[0], workers[-1]
+    
+    def assert_queries(self, url, expected):
+        cache.clear()
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+    
+    def test_query_counts_do_not_grow_with_fleet_size(self):
+        for size in (5, 50):
+            with self.subTest(servers=size):
+                Server.objects.all().delete()
+                server, vm, worker = self.create_fleet(size)
+                
+                for url in ('/api/servers/', '/api/vms/', '/api/workers/'):
+                    self.assert_queries(url, self.LIST_QUERIES)
+                self.assert_queries(f'/api/servers/{server.pk}/', self.DETAIL_QUERIES)
+                self.assert_queries(f'/api/vms/{vm.pk}/', self.DETAIL_QUERIES)
+                self.assert_queries(f'/api/workers/{worker.pk}/', self.DETAIL_QUERIES)
+                self.assert_queries('/api/dashboard/stats/', self.DASHBOARD_QUERIES)
+
+
+class StatusConsumerTests(TransactionTestCase):
+    def test_malformed_server_id_gets_an_error_frame(self):
+        async def check():
+            communicator = WebsocketCommunicator(StatusConsumer.as_asgi(), '/ws/status/')
+            connected, _ = await communicator.connect()
+            self.assertTrue(connected)
+            await communicator.receive_json_from()  # initial_data
+            
+            await communicator.send_json_to({'action': 'check_status', 'server_id': 'abc'})
+            message = await communicator.receive_json_from()
+            self.assertEqual(message['type'], 'error')
+            
+            # The socket stays open for further messages
+            await communicator.send_json_to({'action': 'refresh'})
+            self.assertEqual((await communicator.receive_json_from())['type'], 'initial_data')
+            await communicator.disconnect()
+        
+        async_to_sync(check)()
+
+
+class HostLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def test_release_keeps_a_lock_taken_over_by_another_holder(self):
+        lock = HostLock('server-1', timeout=60)
+        self.assertTrue(lock.acquire())
+        # Our lock expired and another worker took the host
+        cache.set(lock.key, 'other-token', 60)
+        lock.release()
+        self.assertEqual(cache.get(lock.key), 'other-token')
+    
+    def test_release_frees_own_lock(self):
+        lock = HostLock('server-1', timeout=60)
+        self.assertTrue(lock.acquire())
+        lock.release()
+        self.assertTrue(HostLock('server-1', timeout=60).acquire())
+
+
+class PollSchedulerLockTests(SimpleTestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def test_unlock_leaves_a_later_ticks_lock_alone(self):
+        slow = AdaptivePollScheduler()
+        self.assertTrue(slow.lock(60))
+        # The slow tick's claim expired and the next tick took the schedule
+        cache.delete(AdaptivePollScheduler.LOCK_KEY)
+        following = AdaptivePollScheduler()
+        self.assertTrue(following.lock(60))
+        
+        slow.unlock()
+        self.assertFalse(AdaptivePollScheduler().lock(60))
+        following.unlock()
+        self.assertTrue(AdaptivePollScheduler().lock(60))
@@ -6,11 +6,15 @@ router = DefaultRouter()
 router.register(r'servers', views.ServerViewSet)
 router.register(r'vms', views.VirtualMachineViewSet)
 router.register(r'workers', views.WorkerViewSet)
+router.register(r'jobs', views.JobViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
     path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
     path('status-logs/', views.status_logs, name='status-logs'),
+    path('status-logs/daily/', views.status_logs_daily, name='status-logs-daily'),
+    path('metrics/', views.worker_metrics, name='worker-metrics'),
+    path('schedule/', views.poll_schedule, name='poll-schedule'),
     path('check-all/', views.check_all_status, name='check-all-status'),
     path('install-worker/', views.install_worker, name='install-worker'),
 ]
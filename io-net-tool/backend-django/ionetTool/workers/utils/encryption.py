@@ -1,16 +1,42 @@
 """
 Encryption utilities for sensitive data like SSH passwords.
 Uses Django's cryptography.fernet for symmetric encryption.
+
+The cipher is built once per process. Keys listed in ENCRYPTION_KEY_FALLBACKS
+are still accepted for decryption, so ENCRYPTION_KEY can be rotated without
+breaking stored credentials. Decrypted values are kept in a small TTL cache
+keyed by ciphertext, since the same passwords are decrypted on every sweep.
 """
-from cryptography.fernet import Fernet
+from collections import OrderedDict
+from cryptography.fernet import Fernet, MultiFernet
 from django.conf import settings
+from typing import List, Optional
 import base64
 import os
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
 
+def _normalize_key(key) -> bytes:
+    """Validate a Fernet key and return it as bytes"""
+    # If key is a string, convert to bytes
+    if isinstance(key, str):
+        key = key.strip().encode()
+    
+    # Ensure key is 32 bytes (base64 encoded)
+    try:
+        valid = len(base64.urlsafe_b64decode(key)) == 32
+    except Exception:
+        valid = False
+    if not valid:
+        raise ValueError("ENCRYPTION_KEY must be a valid Fernet key (32 bytes base64 encoded)")
+    
+    return key
+
+
 def get_encryption_key():
     """Get or generate encryption key from settings or environment"""
     key = getattr(settings, 'ENCRYPTION_KEY', None)
@@ -25,21 +51,90 @@ def get_encryption_key():
         key = Fernet.generate_key().decode()
         logger.warning(f"Generated key (store in settings): {key}")
     
-    # If key is a string, convert to bytes
-    if isinstance(key, str):
-        # Check if it's base64 encoded
-        try:
-            base64.b64decode(key)
-            key = key.encode()
-        except Exception:
-            # Not base64, try direct encoding
-            key = key.encode()
+    return _normalize_key(key)
+
+
+def get_fallback_keys() -> List[bytes]:
+    """Previous keys that are still accepted for decryption"""
+    keys = getattr(settings, 'ENCRYPTION_KEY_FALLBACKS', None)
+    if keys is None:
+        keys = os.environ.get('ENCRYPTION_KEY_FALLBACKS', '')
+    if isinstance(keys, str):
+        keys = keys.split(',')
+    return [_normalize_key(k) for k in keys if k and str(k).strip()]
+
+
+class _DecryptedCache:
+    """Bounded LRU of plaintexts keyed by ciphertext, with per-entry expiry"""
     
-    # Ensure key is 32 bytes (base64 encoded)
-    if len(base64.urlsafe_b64decode(key)) != 32:
-        raise ValueError("ENCRYPTION_KEY must be a valid Fernet key (32 bytes base64 encoded)")
+    def __init__(self, max_size: int = 1024, ttl: float = 300.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
     
-    return key
+    def get(self, token: str) -> Optional[str]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at <= time.monotonic():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return value
+    
+    def set(self, token: str, value: str):
+        if self.max_size <= 0 or self.ttl <= 0:
+            return
+        with self._lock:
+            self._entries[token] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cipher: Optional[MultiFernet] = None
+_cache: Optional[_DecryptedCache] = None
+_lock = threading.Lock()
+
+
+def get_cipher() -> MultiFernet:
+    """Process-wide cipher: encrypts with the current key, decrypts with any configured key"""
+    global _cipher
+    if _cipher is None:
+        with _lock:
+            if _cipher is None:
+                keys = [get_encryption_key()] + get_fallback_keys()
+                _cipher = MultiFernet([Fernet(k) for k in keys])
+    return _cipher
+
+
+def _get_cache() -> _DecryptedCache:
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = _DecryptedCache(
+                    max_size=getattr(settings, 'ENCRYPTION_CACHE_SIZE', 1024),
+                    ttl=getattr(settings, 'ENCRYPTION_CACHE_TTL', 300.0),
+                )
+    return _cache
+
+
+def reset_cipher():
+    """Drop the cached cipher and decrypted values (e.g. after changing keys)"""
+    global _cipher, _cache
+    with _lock:
+        _cipher = None
+        if _cache is not None:
+            _cache.clear()
+        _cache = None
 
 
 def encrypt_password(password: str) -> str:
@@ -48,10 +143,9 @@ def encrypt_password(password: str) -> str:
         return ""
     
     try:
-        key = get_encryption_key()
-        f = Fernet(key)
-        encrypted = f.encrypt(password.encode())
-        return encrypted.decode()
+        encrypted = get_cipher().encrypt(password.encode()).decode()
+        _get_cache().set(encrypted, password)
+        return encrypted
     except Exception as e:
         logger.error(f"Failed to encrypt password: {e}")
         raise ValueError(f"Encryption failed: {e}")
@@ -62,11 +156,28 @@ def decrypt_password(encrypted_password: str) -> str:
     if not encrypted_password:
         return ""
     
+    cache = _get_cache()
+    cached = cache.get(encrypted_password)
+    if cached is not None:
+        return cached
+    
     try:
-        key = get_encryption_key()
-        f = Fernet(key)
-        decrypted = f.decrypt(encrypted_password.encode())
-        return decrypted.decode()
+        decrypted = get_cipher().decrypt(encrypted_password.encode()).decode()
     except Exception as e:
         logger.error(f"Failed to decrypt password: {e}")
         raise ValueError(f"Decryption failed: {e}")
+    
+    cache.set(encrypted_password, decrypted)
+    return decrypted
+
+
+def rotate_password(encrypted_password: str) -> str:
+    """Re-encrypt a stored password under the current ENCRYPTION_KEY"""
+    if not encrypted_password:
+        return ""
+    
+    try:
+        return get_cipher().rotate(encrypted_password.encode()).decode()
+    except Exception as e:
+        logger.error(f"Failed to rotate password: {e}")
+        raise ValueError(f"Rotation failed: {e}")
@@ -0,0 +1,9 @@
+import uuid
+
+
+def parse_uuid(value):
+    """The UUID in a client-supplied id, or None if it is not a valid one"""
+    try:
+        return uuid.UUID(str(value))
+    except (TypeError, ValueError):
+        return None
@@ -1,21 +1,44 @@
 from rest_framework import viewsets, status
-from rest_framework.decorators import action, api_view
+from rest_framework.decorators import action, api_view, renderer_classes
+from rest_framework.renderers import BrowsableAPIRenderer, JSONRenderer
 from rest_framework.response import Response
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from datetime import timedelta
 
-from .models import Server, VirtualMachine, Worker, StatusLog
+from . import tasks
+from .models import Server, VirtualMachine, Worker, StatusLog, StatusLogDaily, Job
+from .pagination import StatusLogCursorPagination, StatusLogDailyCursorPagination
+from .renderers import NDJSONRenderer, EventStreamRenderer
+from .utils.validation import parse_uuid
 from .serializers import (
     ServerSerializer, ServerCreateSerializer,
-    VirtualMachineSerializer, VMCreateSerializer,
-    WorkerSerializer, WorkerInstallSerializer,
-    StatusLogSerializer, DashboardStatsSerializer,
+    VirtualMachineSerializer, VMCreateSerializer, VMBatchCreateSerializer,
+    WorkerSerializer, WorkerInstallSerializer, WorkerBulkActionSerializer,
+    StatusLogSerializer, StatusLogDailySerializer, DashboardStatsSerializer, JobSerializer,
 )
-from .services import SSHService, WorkerStatusService, VMService
+from .services import (
+    SSHService, WorkerStatusService, DashboardStatsService, AdaptivePollScheduler,
+    JobService, FleetSweepService, HostLock, WorkerMetricsStore,
+)
+
+
+def job_accepted(job: Job, **extra) -> Response:
+    """202 response pointing the client at a queued job"""
+    return Response(
+        {'job': JobSerializer(job).data, **extra},
+        status=status.HTTP_202_ACCEPTED,
+        headers={'Location': f'/api/jobs/{job.id}/'},
+    )
 
 
 class ServerViewSet(viewsets.ModelViewSet):
     """API endpoints for server management"""
-    queryset = Server.objects.all()
+    queryset = Server.objects.with_counts()
     serializer_class = ServerSerializer
     
     def get_serializer_class(self):
@@ -28,75 +51,67 @@ class ServerViewSet(viewsets.ModelViewSet):
         serializer.is_valid(raise_exception=True)
         server = serializer.save()
         
-        # Test connection
-        service = WorkerStatusService(server)
-        result = service.check_server_status()
-        
-        return Response({
-            'server': ServerSerializer(server).data,
-            'connection': result,
-        }, status=status.HTTP_201_CREATED)
+        # Test the connection in the background
+        job = JobService.enqueue(
+            tasks.check_single_server, 'check_server', server, server_id=str(server.id),
+        )
+        server = Server.objects.with_counts().get(pk=server.pk)
+        return job_accepted(job, server=ServerSerializer(server).data)
     
     @action(detail=True, methods=['post'])
     def check_status(self, request, pk=None):
         """Check server status and update info"""
         server = self.get_object()
-        service = WorkerStatusService(server)
-        result = service.check_server_status()
-        
-        return Response({
-            'server': ServerSerializer(server).data,
-            'status_check': result,
-        })
+        job = JobService.enqueue(
+            tasks.check_single_server, 'check_server', server, server_id=str(server.id),
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def check_workers(self, request, pk=None):
         """Check all workers on this server"""
         server = self.get_object()
-        service = WorkerStatusService(server)
-        results = service.check_all_workers()
-        
-        return Response({
-            'server': ServerSerializer(server).data,
-            'workers': results,
-        })
+        job = JobService.enqueue(
+            tasks.check_server_workers, 'check_workers', server, server_id=str(server.id),
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def setup_virtualization(self, request, pk=None):
         """Install KVM/QEMU virtualization on server"""
         server = self.get_object()
-        service = VMService(server)
-        result = service.setup_virtualization()
-        
-        return Response(result)
+        job = JobService.enqueue(
+            tasks.setup_virtualization_async, 'setup_virtualization', server, server_id=str(server.id),
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def download_base_image(self, request, pk=None):
         """Download Ubuntu base image for VMs"""
         server = self.get_object()
-        service = VMService(server)
-        result = service.download_base_image()
-        
-        return Response(result)
+        job = JobService.enqueue(
+            tasks.download_base_image_async, 'download_base_image', server, server_id=str(server.id),
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['get'])
     def vms(self, request, pk=None):
         """Get all VMs on this server"""
         server = self.get_object()
-        vms = server.virtual_machines.all()
+        vms = server.virtual_machines.with_counts()
         return Response(VirtualMachineSerializer(vms, many=True).data)
     
     @action(detail=True, methods=['get'])
     def workers(self, request, pk=None):
         """Get all workers on this server (direct, not in VMs)"""
         server = self.get_object()
-        workers = server.workers.all()
+        workers = server.workers.with_hosts()
         return Response(WorkerSerializer(workers, many=True).data)
 
 
 class VirtualMachineViewSet(viewsets.ModelViewSet):
     """API endpoints for VM management"""
-    queryset = VirtualMachine.objects.all()
+    queryset = VirtualMachine.objects.with_counts()
     serializer_class = VirtualMachineSerializer
     
     def create(self, request):
@@ -105,13 +120,14 @@ class VirtualMachineViewSet(viewsets.ModelViewSet):
         data = serializer.validated_data
         
         server = get_object_or_404(Server, id=data['server_id'])
-        service = VMService(server)
         
         # Use a secure random password if not provided
         import secrets
         vm_password = data.get('vm_password', secrets.token_urlsafe(16))
         
-        result = service.create_vm(
+        job = JobService.enqueue(
+            tasks.create_vm_async, 'create_vm', server,
+            server_id=str(server.id),
             name=data['name'],
             vcpus=data.get('vcpus', 2),
             ram_mb=data.get('ram_mb', 2048),
@@ -120,60 +136,69 @@ class VirtualMachineViewSet(viewsets.ModelViewSet):
             vm_password=vm_password,
             ip_address=data.get('ip_address'),
         )
+        return job_accepted(job)
+    
+    @action(detail=False, methods=['post'])
+    def batch(self, request):
+        """Create many VMs on one server in a single job"""
+        serializer = VMBatchCreateSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         
-        if result['success']:
-            vm = VirtualMachine.objects.get(id=result['vm_id'])
-            return Response({
-                'vm': VirtualMachineSerializer(vm).data,
-                'result': result,
-            }, status=status.HTTP_201_CREATED)
-        else:
-            return Response(result, status=status.HTTP_400_BAD_REQUEST)
+        server = get_object_or_404(Server, id=data['server_id'])
+        
+        import secrets
+        vms = [
+            {
+                **spec,
+                'vm_password': spec.get('vm_password') or secrets.token_urlsafe(16),
+                'ip_address': spec.get('ip_address'),
+            }
+            for spec in data['vms']
+        ]
+        
+        job = JobService.enqueue(
+            tasks.create_vms_async, 'create_vms', server,
+            server_id=str(server.id),
+            vms=vms,
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def start(self, request, pk=None):
         """Start VM"""
         vm = self.get_object()
-        service = VMService(vm.server)
-        result = service.start_vm(vm)
-        
-        return Response({
-            'vm': VirtualMachineSerializer(vm).data,
-            'result': result,
-        })
+        job = JobService.enqueue(
+            tasks.vm_action_async, 'start_vm', vm, vm_id=str(vm.id), action='start',
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def stop(self, request, pk=None):
         """Stop VM"""
         vm = self.get_object()
-        service = VMService(vm.server)
-        result = service.stop_vm(vm)
-        
-        return Response({
-            'vm': VirtualMachineSerializer(vm).data,
-            'result': result,
-        })
+        job = JobService.enqueue(
+            tasks.vm_action_async, 'stop_vm', vm, vm_id=str(vm.id), action='stop',
+        )
+        return job_accepted(job)
     
-    @action(detail=True, methods=['post'])
-    def destroy(self, request, pk=None):
+    @action(detail=True, methods=['post'], url_path='destroy')
+    def destroy_vm(self, request, pk=None):
         """Force stop VM"""
         vm = self.get_object()
-        service = VMService(vm.server)
-        result = service.destroy_vm(vm)
-        
-        return Response({
-            'vm': VirtualMachineSerializer(vm).data,
-            'result': result,
-        })
+        job = JobService.enqueue(
+            tasks.vm_action_async, 'destroy_vm', vm, vm_id=str(vm.id), action='destroy',
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['delete'])
     def remove(self, request, pk=None):
         """Delete VM completely"""
         vm = self.get_object()
-        service = VMService(vm.server)
-        result = service.delete_vm(vm)
-        
-        return Response(result)
+        job = JobService.enqueue(
+            tasks.vm_action_async, 'remove_vm', vm, vm_id=str(vm.id), action='remove',
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def install_worker(self, request, pk=None):
@@ -188,26 +213,66 @@ class VirtualMachineViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        service = VMService(vm.server)
-        result = service.install_worker_on_vm(vm, device_id, user_id)
-        
-        return Response(result)
+        job = JobService.enqueue(
+            tasks.install_worker_async, 'install_worker', vm,
+            vm_id=str(vm.id), device_id=device_id, user_id=user_id,
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['get'])
     def workers(self, request, pk=None):
         """Get all workers on this VM"""
         vm = self.get_object()
-        workers = vm.workers.all()
+        workers = vm.workers.with_hosts()
         return Response(WorkerSerializer(workers, many=True).data)
 
 
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    """Status and results of background jobs"""
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    MAX_LIMIT = 500
+    
+    def get_queryset(self):
+        queryset = Job.objects.all()
+        
+        status_filter = self.request.query_params.get('status')
+        if status_filter:
+            queryset = queryset.filter(status=status_filter)
+        
+        target_id = self.request.query_params.get('target')
+        if target_id:
+            target_uuid = parse_uuid(target_id)
+            if target_uuid is None:
+                return queryset.none()
+            queryset = queryset.filter(target_id=target_uuid)
+        
+        return queryset
+    
+    def list(self, request):
+        try:
+            limit = int(request.query_params.get('limit', 50))
+        except ValueError:
+            limit = 0
+        if limit < 1:
+            return Response({'error': 'limit must be a positive integer'}, status=status.HTTP_400_BAD_REQUEST)
+        limit = min(limit, self.MAX_LIMIT)
+        
+        target_id = request.query_params.get('target')
+        if target_id and parse_uuid(target_id) is None:
+            return Response({'error': 'target must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        jobs = self.get_queryset()[:limit]
+        return Response(JobSerializer(jobs, many=True).data)
+
+
 class WorkerViewSet(viewsets.ModelViewSet):
     """API endpoints for worker management"""
-    queryset = Worker.objects.all()
+    queryset = Worker.objects.with_hosts()
     serializer_class = WorkerSerializer
     
     def get_queryset(self):
-        queryset = Worker.objects.all()
+        queryset = Worker.objects.with_hosts()
         
         # Filter by status
         status_filter = self.request.query_params.get('status')
@@ -230,118 +295,273 @@ class WorkerViewSet(viewsets.ModelViewSet):
     def start(self, request, pk=None):
         """Start worker container"""
         worker = self.get_object()
-        server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
-        
-        if not server:
+        if not (worker.server or worker.virtual_machine):
             return Response({'error': 'No server found'}, status=status.HTTP_400_BAD_REQUEST)
         
-        service = WorkerStatusService(server)
-        result = service.start_worker(worker)
-        
-        return Response({
-            'worker': WorkerSerializer(worker).data,
-            'result': result,
-        })
+        job = JobService.enqueue(
+            tasks.worker_action_async, 'start_worker', worker, worker_id=str(worker.id), action='start',
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def stop(self, request, pk=None):
         """Stop worker container"""
         worker = self.get_object()
-        server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
-        
-        if not server:
+        if not (worker.server or worker.virtual_machine):
             return Response({'error': 'No server found'}, status=status.HTTP_400_BAD_REQUEST)
         
-        service = WorkerStatusService(server)
-        result = service.stop_worker(worker)
-        
-        return Response({
-            'worker': WorkerSerializer(worker).data,
-            'result': result,
-        })
+        job = JobService.enqueue(
+            tasks.worker_action_async, 'stop_worker', worker, worker_id=str(worker.id), action='stop',
+        )
+        return job_accepted(job)
     
     @action(detail=True, methods=['post'])
     def restart(self, request, pk=None):
         """Restart worker container"""
         worker = self.get_object()
-        server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
-        
-        if not server:
+        if not (worker.server or worker.virtual_machine):
             return Response({'error': 'No server found'}, status=status.HTTP_400_BAD_REQUEST)
         
-        service = WorkerStatusService(server)
-        result = service.restart_worker(worker)
+        job = JobService.enqueue(
+            tasks.worker_action_async, 'restart_worker', worker, worker_id=str(worker.id), action='restart',
+        )
+        return job_accepted(job)
+    
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Start, stop or restart every worker matching the IDs or filters, batched per host"""
+        serializer = WorkerBulkActionSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
         
-        return Response({
-            'worker': WorkerSerializer(worker).data,
-            'result': result,
-        })
+        queryset = Worker.objects.all()
+        if data.get('ids'):
+            queryset = queryset.filter(id__in=data['ids'])
+        if data.get('status'):
+            queryset = queryset.filter(status=data['status'])
+        if data.get('server_id'):
+            queryset = queryset.filter(
+                Q(server_id=data['server_id']) | Q(virtual_machine__server_id=data['server_id'])
+            )
+        if data.get('vm_id'):
+            queryset = queryset.filter(virtual_machine_id=data['vm_id'])
+        if data.get('image'):
+            queryset = queryset.filter(image_name=data['image'])
+        
+        # Resolve the targets now so the job acts on what the caller saw
+        worker_ids = [str(pk) for pk in queryset.values_list('id', flat=True)]
+        if not worker_ids:
+            return Response({'error': 'No matching workers'}, status=status.HTTP_400_BAD_REQUEST)
+        
+        job = JobService.enqueue(
+            tasks.bulk_worker_action_async, f"bulk_{data['action']}_workers",
+            worker_ids=worker_ids,
+            action=data['action'],
+            mode=data['mode'],
+            max_unavailable=data['max_unavailable'],
+        )
+        return job_accepted(job, workers=len(worker_ids))
     
     @action(detail=True, methods=['get'])
     def logs(self, request, pk=None):
-        """Get worker container logs"""
+        """Get worker container logs, or stream them with `?stream=1`"""
         worker = self.get_object()
-        server = worker.server or (worker.virtual_machine.server if worker.virtual_machine else None)
-        
-        if not server:
+        if not (worker.server or worker.virtual_machine):
             return Response({'error': 'No server found'}, status=status.HTTP_400_BAD_REQUEST)
         
-        lines = int(request.query_params.get('lines', 100))
-        service = WorkerStatusService(server)
-        result = service.get_worker_logs(worker, lines)
+        if request.query_params.get('stream', '').lower() in ('1', 'true', 'yes'):
+            return stream_worker_logs(worker, request.query_params)
         
-        return Response(result)
+        try:
+            lines = WorkerStatusService.parse_log_options(request.query_params)['tail']
+        except ValueError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        job = JobService.enqueue(
+            tasks.get_worker_logs_async, 'worker_logs', worker, worker_id=str(worker.id), lines=lines,
+        )
+        return job_accepted(job)
+
+
+def stream_worker_logs(worker: Worker, params) -> StreamingHttpResponse:
+    """Stream a container's logs as plain text, chunk by chunk as they are read"""
+    server = worker.server or worker.virtual_machine.server
+    try:
+        options = WorkerStatusService.parse_log_options(params)
+        # A followed stream holds a worker thread, so it is cut off eventually
+        timeout = settings.LOG_STREAM_HTTP_TIMEOUT if options['follow'] else None
+        stream = WorkerStatusService(server).stream_worker_logs(worker, timeout=timeout, **options)
+        next(stream)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except ConnectionError as e:
+        return Response({'error': str(e)}, status=status.HTTP_502_BAD_GATEWAY)
+    
+    response = StreamingHttpResponse(
+        ('\n'.join(lines) + '\n' for lines in stream if lines),
+        content_type='text/plain; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['GET'])
 def dashboard_stats(request):
     """Get dashboard statistics"""
-    stats = {
-        'total_servers': Server.objects.count(),
-        'online_servers': Server.objects.filter(status='online').count(),
-        'total_vms': VirtualMachine.objects.count(),
-        'running_vms': VirtualMachine.objects.filter(status='running').count(),
-        'total_workers': Worker.objects.count(),
-        'running_workers': Worker.objects.filter(status='running').count(),
-        'failed_workers': Worker.objects.filter(status='failed').count(),
-    }
-    
+    stats = DashboardStatsService.get_stats()
     serializer = DashboardStatsSerializer(stats)
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+def poll_schedule(request):
+    """Get the adaptive polling schedule, soonest due first"""
+    entries = AdaptivePollScheduler().load().entries()
+    return Response({
+        'mode': settings.WORKER_POLL_MODE,
+        'hosts': entries,
+    })
+
+
 @api_view(['GET'])
 def status_logs(request):
-    """Get recent status logs"""
-    limit = int(request.query_params.get('limit', 50))
+    """Get status logs, newest first, a page at a time (follow `next` for older ones)"""
     entity_type = request.query_params.get('type')
+    entity_id = request.query_params.get('entity')
     
     queryset = StatusLog.objects.all()
     if entity_type:
         queryset = queryset.filter(entity_type=entity_type)
+    if entity_id:
+        entity_uuid = parse_uuid(entity_id)
+        if entity_uuid is None:
+            return Response({'error': 'entity must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = queryset.filter(entity_id=entity_uuid)
     
-    logs = queryset[:limit]
+    paginator = StatusLogCursorPagination()
+    logs = paginator.paginate_queryset(queryset, request)
     serializer = StatusLogSerializer(logs, many=True)
-    return Response(serializer.data)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+def status_logs_daily(request):
+    """Get one entity's daily status rollups for days past the raw log retention"""
+    entity_id = request.query_params.get('entity')
+    if not entity_id:
+        return Response({'error': 'entity is required'}, status=status.HTTP_400_BAD_REQUEST)
+    entity_uuid = parse_uuid(entity_id)
+    if entity_uuid is None:
+        return Response({'error': 'entity must be a UUID'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    queryset = StatusLogDaily.objects.filter(entity_id=entity_uuid)
+    
+    paginator = StatusLogDailyCursorPagination()
+    rollups = paginator.paginate_queryset(queryset, request)
+    serializer = StatusLogDailySerializer(rollups, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+@api_view(['GET'])
+def worker_metrics(request):
+    """Get CPU/memory series for a worker, or summed over a VM's or server's workers"""
+    params = request.query_params
+    targets = {}
+    for name in ('worker', 'vm', 'server'):
+        value = params.get(name)
+        if not value:
+            continue
+        target_uuid = parse_uuid(value)
+        if target_uuid is None:
+            return Response({'error': f'Invalid {name} id'}, status=status.HTTP_400_BAD_REQUEST)
+        targets[f'{name}_id'] = target_uuid
+    if not targets:
+        return Response({'error': 'worker, vm or server is required'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    try:
+        end = parse_datetime(params['end']) if params.get('end') else timezone.now()
+        start = parse_datetime(params['start']) if params.get('start') else end and end - timedelta(hours=1)
+    except ValueError:
+        start = end = None
+    if start is None or end is None:
+        return Response({'error': 'start and end must be ISO 8601 datetimes'}, status=status.HTTP_400_BAD_REQUEST)
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    if start >= end:
+        return Response({'error': 'start must be before end'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    resolution = params.get('resolution', 'auto')
+    if resolution != 'auto' and resolution not in WorkerMetricsStore.SPANS:
+        return Response({'error': f'Unknown resolution: {resolution}'}, status=status.HTTP_400_BAD_REQUEST)
+    
+    return Response(WorkerMetricsStore.series(start, end, resolution, **targets))
+
+
+def check_host(server) -> dict:
+    """Check one server and its workers over a single SSH session"""
+    lock = HostLock(server.id)
+    if not lock.acquire():
+        # A sweep is probing this host right now
+        return {'server_id': str(server.id), 'status': 'busy'}
+    try:
+        # The sweep stops waiting after its host timeout; end the probe then too
+        # so the lock is never released while this thread is still on the host
+        server_result, worker_results = WorkerStatusService(server).check_host(
+            timeout=settings.WORKER_SWEEP_HOST_TIMEOUT
+        )
+    finally:
+        lock.release()
+    
+    server = Server.objects.with_counts().get(pk=server.pk)
+    return {
+        'server': ServerSerializer(server).data,
+        'status_check': server_result,
+        'workers': worker_results,
+    }
+
+
+def iter_check_all():
+    """Check every server concurrently, yielding each host as it finishes"""
+    hosts = FleetSweepService().iter_sweep(Server.objects.all(), check_host)
+    for host in hosts:
+        if host.ok:
+            yield host.result
+        else:
+            yield {'server_id': host.server_id, 'status': host.status, 'error': host.error}
 
 
 @api_view(['POST'])
+@renderer_classes([JSONRenderer, BrowsableAPIRenderer, NDJSONRenderer, EventStreamRenderer])
 def check_all_status(request):
-    """Check status of all servers and their workers"""
-    results = []
+    """Check status of all servers and their workers.
     
-    for server in Server.objects.all():
-        service = WorkerStatusService(server)
-        server_result = service.check_server_status()
-        worker_results = service.check_all_workers()
-        
-        results.append({
-            'server': ServerSerializer(server).data,
-            'status_check': server_result,
-            'workers': worker_results,
-        })
+    Hosts are probed concurrently. With `Accept: application/x-ndjson` (or
+    `?format=ndjson`) each host is streamed as one JSON line as soon as it is
+    done; `text/event-stream` (`?format=sse`) streams server-sent events and
+    ends with a `done` event. Otherwise the full list is returned at the end.
+    """
+    renderer = request.accepted_renderer
     
-    return Response(results)
+    if isinstance(renderer, NDJSONRenderer):
+        stream = (NDJSONRenderer.encode(result) for result in iter_check_all())
+    elif isinstance(renderer, EventStreamRenderer):
+        def events():
+            checked = 0
+            for result in iter_check_all():
+                checked += 1
+                yield EventStreamRenderer.encode(result, 'host')
+            yield EventStreamRenderer.encode({'checked': checked}, 'done')
+        stream = events()
+    else:
+        return Response(list(iter_check_all()))
+    
+    response = StreamingHttpResponse(stream, content_type=renderer.media_type)
+    # Keep proxies from buffering the stream
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @api_view(['POST'])
@@ -352,13 +572,15 @@ def install_worker(request):
     data = serializer.validated_data
     
     if data.get('vm_id'):
-        vm = get_object_or_404(VirtualMachine, id=data['vm_id'])
-        service = VMService(vm.server)
-        result = service.install_worker_on_vm(vm, data['device_id'], data['user_id'])
+        target = get_object_or_404(VirtualMachine, id=data['vm_id'])
+        host = {'vm_id': str(target.id)}
     else:
-        server = get_object_or_404(Server, id=data['server_id'])
-        service = WorkerStatusService(server)
-        result = service.install_new_worker(data['device_id'], data['user_id'])
+        target = get_object_or_404(Server, id=data['server_id'])
+        host = {'server_id': str(target.id)}
     
-    return Response(result)
+    job = JobService.enqueue(
+        tasks.install_worker_async, 'install_worker', target,
+        device_id=data['device_id'], user_id=data['user_id'], **host,
+    )
+    return job_accepted(job)
 
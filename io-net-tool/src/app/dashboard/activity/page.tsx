@@ -4,6 +4,7 @@ import { useState, useEffect } from "react";
 import { Header } from "@/components/Header";
 import { StatusBadge } from "@/components/StatusBadge";
 import { Card, CardContent } from "@/components/ui/card";
+import { Button } from "@/components/ui/button";
 import { Activity, Server, Monitor, Box, ArrowRight } from "lucide-react";
 
 interface StatusLog {
@@ -16,18 +17,28 @@ interface StatusLog {
   created_at: string;
 }
 
+interface StatusLogPage {
+  next: string | null;
+  previous: string | null;
+  results: StatusLog[];
+}
+
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000/api";
 
 export default function ActivityPage() {
   const [logs, setLogs] = useState<StatusLog[]>([]);
   const [isLoading, setIsLoading] = useState(true);
   const [isRefreshing, setIsRefreshing] = useState(false);
+  // Cursor URL of the next (older) page, if any
+  const [nextPage, setNextPage] = useState<string | null>(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
 
   const fetchLogs = async () => {
     try {
       const response = await fetch(`${API_BASE}/status-logs/?limit=100`);
-      const data = await response.json();
-      setLogs(data);
+      const data: StatusLogPage = await response.json();
+      setLogs(data.results);
+      setNextPage(data.next);
     } catch (error) {
       console.error("Failed to fetch logs:", error);
     } finally {
@@ -35,6 +46,21 @@ export default function ActivityPage() {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextPage) return;
+    setIsLoadingMore(true);
+    try {
+      const response = await fetch(nextPage);
+      const data: StatusLogPage = await response.json();
+      setLogs((prev) => [...prev, ...data.results]);
+      setNextPage(data.next);
+    } catch (error) {
+      console.error("Failed to fetch logs:", error);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchLogs();
   }, []);
@@ -110,7 +136,7 @@ export default function ActivityPage() {
               <Card
                 key={log.id}
                 className="glass animate-fade-in"
-                style={{ animationDelay: `${i * 30}ms` }}
+                style={{ animationDelay: `${Math.min(i, 20) * 30}ms` }}
               >
                 <CardContent className="p-4">
                   <div className="flex items-center justify-between">
@@ -148,6 +174,13 @@ export default function ActivityPage() {
                 </CardContent>
               </Card>
             ))}
+            {nextPage && (
+              <div className="flex justify-center pt-2">
+                <Button variant="outline" onClick={loadMore} disabled={isLoadingMore}>
+                  {isLoadingMore ? "Loading..." : "Load older activity"}
+                </Button>
+              </div>
+            )}
           </div>
         )}
       </div>
@@ -1,7 +1,7 @@
 "use client";
 
-import { useState, useEffect, useCallback } from 'react';
-import { api, Server, VirtualMachine, Worker, DashboardStats } from '@/lib/api';
+import { useState, useEffect, useCallback, useRef } from 'react';
+import { api, Server, VirtualMachine, Worker, Job, DashboardStats } from '@/lib/api';
 import { useWebSocket } from './useWebSocket';
 
 interface DashboardData {
@@ -9,25 +9,82 @@ interface DashboardData {
   servers: Server[];
   vms: VirtualMachine[];
   workers: Worker[];
+  // Jobs started while this client is connected, newest first
+  jobs: Job[];
   isLoading: boolean;
   error: string | null;
 }
 
+interface StateDelta {
+  seq: number;
+  entity: 'server' | 'worker' | 'job' | 'stats';
+  id: string;
+  op: 'upsert' | 'remove';
+  changes: Record<string, any>;
+}
+
+function applyToList<T extends { id: string }>(items: T[], delta: StateDelta): T[] {
+  if (delta.op === 'remove') {
+    return items.filter((item) => item.id !== delta.id);
+  }
+  const index = items.findIndex((item) => item.id === delta.id);
+  if (index === -1) {
+    // Only full records (which carry their id) can be added; partial changes
+    // to an entity outside this client's view are ignored
+    return delta.changes.id ? [delta.changes as T, ...items] : items;
+  }
+  const next = items.slice();
+  next[index] = { ...items[index], ...delta.changes };
+  return next;
+}
+
+function applyDeltas(data: DashboardData, deltas: StateDelta[]): DashboardData {
+  let { stats, servers, workers, jobs } = data;
+  for (const delta of deltas) {
+    if (delta.entity === 'server') {
+      servers = applyToList(servers, delta);
+    } else if (delta.entity === 'worker') {
+      workers = applyToList(workers, delta);
+    } else if (delta.entity === 'job') {
+      jobs = applyToList(jobs, delta);
+    } else if (delta.entity === 'stats' && delta.op === 'upsert') {
+      stats = { ...(stats as DashboardStats), ...delta.changes };
+    }
+  }
+  return { ...data, stats, servers, workers, jobs };
+}
+
 export function useDashboard() {
   const [data, setData] = useState<DashboardData>({
     stats: null,
     servers: [],
     vms: [],
     workers: [],
+    jobs: [],
     isLoading: true,
     error: null,
   });
 
   const wsUrl = process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws/status/';
+  // Last applied sequence, so reconnects only fetch what was missed
+  const seqRef = useRef<{ seq: number; epoch: string } | null>(null);
+  // Sequence the last snapshot already reflects; older deltas are skipped.
+  // Live deltas from different publishers can arrive slightly out of order,
+  // so anything newer than the snapshot is applied.
+  const snapshotSeqRef = useRef(0);
 
-  const { isConnected, sendMessage } = useWebSocket(wsUrl, {
+  const buildWsUrl = useCallback(() => {
+    if (!seqRef.current) return wsUrl;
+    const separator = wsUrl.includes('?') ? '&' : '?';
+    const { seq, epoch } = seqRef.current;
+    return `${wsUrl}${separator}since=${seq}&epoch=${encodeURIComponent(epoch)}`;
+  }, [wsUrl]);
+
+  const { isConnected, sendMessage } = useWebSocket(buildWsUrl, {
     onMessage: (message) => {
       if (message.type === 'initial_data') {
+        seqRef.current = { seq: message.data.seq ?? 0, epoch: message.data.epoch ?? '' };
+        snapshotSeqRef.current = message.data.seq ?? 0;
         setData((prev) => ({
           ...prev,
           stats: message.data.stats,
@@ -35,6 +92,20 @@ export function useDashboard() {
           workers: message.data.workers,
           isLoading: false,
         }));
+      } else if (message.type === 'delta') {
+        const current = seqRef.current;
+        const fresh = (message.data.deltas as StateDelta[]).filter(
+          (delta) => delta.seq > snapshotSeqRef.current
+        );
+        if (current) {
+          seqRef.current = {
+            seq: Math.max(current.seq, message.data.seq),
+            epoch: message.data.epoch ?? current.epoch,
+          };
+        }
+        if (fresh.length) {
+          setData((prev) => applyDeltas(prev, fresh));
+        }
       } else if (message.type === 'status_update') {
         // Handle real-time updates
         if (message.data.type === 'server') {
@@ -62,14 +133,15 @@ export function useDashboard() {
         api.getWorkers(),
       ]);
 
-      setData({
+      setData((prev) => ({
+        ...prev,
         stats,
         servers,
         vms,
         workers,
         isLoading: false,
         error: null,
-      });
+      }));
     } catch (error) {
       setData((prev) => ({
         ...prev,
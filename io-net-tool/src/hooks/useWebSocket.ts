@@ -14,34 +14,41 @@ interface UseWebSocketOptions {
   reconnectInterval?: number;
 }
 
-export function useWebSocket(url: string, options: UseWebSocketOptions = {}) {
+// `url` may be a function so each (re)connect can carry fresh query params
+export function useWebSocket(url: string | (() => string), options: UseWebSocketOptions = {}) {
   const [isConnected, setIsConnected] = useState(false);
   const [lastMessage, setLastMessage] = useState<WebSocketMessage | null>(null);
   const wsRef = useRef<WebSocket | null>(null);
   const reconnectTimeoutRef = useRef<NodeJS.Timeout | null>(null);
+  // Callers pass a new options object every render; keep the socket stable
+  const optionsRef = useRef(options);
+  optionsRef.current = options;
+  const urlRef = useRef(url);
+  urlRef.current = url;
 
   const connect = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.OPEN) return;
 
     try {
-      wsRef.current = new WebSocket(url);
+      const target = typeof urlRef.current === 'function' ? urlRef.current() : urlRef.current;
+      wsRef.current = new WebSocket(target);
 
       wsRef.current.onopen = () => {
         setIsConnected(true);
-        options.onConnect?.();
+        optionsRef.current.onConnect?.();
         console.log('WebSocket connected');
       };
 
       wsRef.current.onclose = () => {
         setIsConnected(false);
-        options.onDisconnect?.();
+        optionsRef.current.onDisconnect?.();
         console.log('WebSocket disconnected');
 
         // Attempt to reconnect
-        if (options.reconnectInterval) {
+        if (optionsRef.current.reconnectInterval) {
           reconnectTimeoutRef.current = setTimeout(() => {
             connect();
-          }, options.reconnectInterval);
+          }, optionsRef.current.reconnectInterval);
         }
       };
 
@@ -53,7 +60,7 @@ export function useWebSocket(url: string, options: UseWebSocketOptions = {}) {
         try {
           const data = JSON.parse(event.data);
           setLastMessage(data);
-          options.onMessage?.(data);
+          optionsRef.current.onMessage?.(data);
         } catch (e) {
           console.error('Failed to parse WebSocket message:', e);
         }
@@ -61,7 +68,7 @@ export function useWebSocket(url: string, options: UseWebSocketOptions = {}) {
     } catch (error) {
       console.error('Failed to connect WebSocket:', error);
     }
-  }, [url, options]);
+  }, []);
 
   const disconnect = useCallback(() => {
     if (reconnectTimeoutRef.current) {
@@ -1,4 +1,17 @@
 const API_BASE = process.env.NEXT_PUBLIC_API_URL || 'http://localhost:8000/api';
+const WS_BASE = (process.env.NEXT_PUBLIC_WS_URL || 'ws://localhost:8000/ws/status/').replace(/status\/?$/, '');
+
+export interface LogStreamOptions {
+  tail?: number;
+  follow?: boolean;
+  since?: string;
+  grep?: string;
+}
+
+export type LogStreamMessage =
+  | { type: 'logs'; lines: string[] }
+  | { type: 'end' }
+  | { type: 'error'; error: string };
 
 export interface Server {
   id: string;
@@ -59,6 +72,36 @@ export interface Worker {
   updated_at: string;
 }
 
+export interface Job {
+  id: string;
+  kind: string;
+  target_type: '' | 'server' | 'vm' | 'worker';
+  target_id: string | null;
+  status: 'pending' | 'running' | 'succeeded' | 'failed';
+  progress: number;
+  message: string;
+  result: any;
+  error: string | null;
+  created_at: string;
+  started_at: string | null;
+  finished_at: string | null;
+}
+
+export interface MetricsSeries {
+  resolution: 'raw' | '1m' | '1h' | '1d';
+  step: number | null;
+  start: string;
+  end: string;
+  t: number[];
+  samples: number[];
+  cpu_min: number[];
+  cpu_max: number[];
+  cpu_avg: number[];
+  memory_min: number[];
+  memory_max: number[];
+  memory_avg: number[];
+}
+
 export interface DashboardStats {
   total_servers: number;
   online_servers: number;
@@ -85,6 +128,43 @@ async function fetchApi<T>(endpoint: string, options?: RequestInit): Promise<T>
   return response.json();
 }
 
+const JOB_POLL_INTERVAL = 1000;
+
+function logStreamQuery(options: LogStreamOptions): string {
+  const searchParams = new URLSearchParams();
+  if (options.tail !== undefined) searchParams.set('tail', String(options.tail));
+  if (options.follow) searchParams.set('follow', '1');
+  if (options.since) searchParams.set('since', options.since);
+  if (options.grep) searchParams.set('grep', options.grep);
+  return searchParams.toString();
+}
+
+// Live worker logs over a WebSocket; send {action: 'pause'|'resume'} on the returned socket for flow control
+export function openWorkerLogs(id: string, options: LogStreamOptions, onMessage: (message: LogStreamMessage) => void): WebSocket {
+  const query = logStreamQuery(options);
+  const socket = new WebSocket(`${WS_BASE}workers/${id}/logs/${query ? `?${query}` : ''}`);
+  socket.onmessage = (event) => onMessage(JSON.parse(event.data));
+  return socket;
+}
+
+async function waitForJob(job: Job, onProgress?: (job: Job) => void): Promise<Job> {
+  while (job.status === 'pending' || job.status === 'running') {
+    await new Promise((resolve) => setTimeout(resolve, JOB_POLL_INTERVAL));
+    job = await fetchApi<Job>(`/jobs/${job.id}/`);
+    onProgress?.(job);
+  }
+  return job;
+}
+
+// SSH actions answer 202 with a job; resolve with its result once it finishes
+async function runJob<T>(accepted: Promise<{ job: Job }>): Promise<T> {
+  const job = await waitForJob((await accepted).job);
+  if (job.status === 'failed' && job.result == null) {
+    throw new Error(job.error || `Job ${job.kind} failed`);
+  }
+  return job.result as T;
+}
+
 export const api = {
   // Dashboard
   getStats: () => fetchApi<DashboardStats>('/dashboard/stats/'),
@@ -93,24 +173,28 @@ export const api = {
   getServers: () => fetchApi<Server[]>('/servers/'),
   getServer: (id: string) => fetchApi<Server>(`/servers/${id}/`),
   createServer: (data: { name: string; ip_address: string; ssh_username: string; ssh_password: string; ssh_port?: number }) =>
-    fetchApi<{ server: Server; connection: any }>('/servers/', { method: 'POST', body: JSON.stringify(data) }),
+    fetchApi<{ server: Server; job: Job }>('/servers/', { method: 'POST', body: JSON.stringify(data) }),
   deleteServer: (id: string) => fetchApi<void>(`/servers/${id}/`, { method: 'DELETE' }),
-  checkServerStatus: (id: string) => fetchApi<{ server: Server; status_check: any }>(`/servers/${id}/check_status/`, { method: 'POST' }),
-  checkServerWorkers: (id: string) => fetchApi<{ server: Server; workers: any[] }>(`/servers/${id}/check_workers/`, { method: 'POST' }),
-  setupVirtualization: (id: string) => fetchApi<any>(`/servers/${id}/setup_virtualization/`, { method: 'POST' }),
-  downloadBaseImage: (id: string) => fetchApi<any>(`/servers/${id}/download_base_image/`, { method: 'POST' }),
+  checkServerStatus: (id: string) => runJob<{ server: Server; status_check: any }>(fetchApi<{ job: Job }>(`/servers/${id}/check_status/`, { method: 'POST' })),
+  checkServerWorkers: (id: string) => runJob<{ server: Server; workers: any[] }>(fetchApi<{ job: Job }>(`/servers/${id}/check_workers/`, { method: 'POST' })),
+  setupVirtualization: (id: string) => runJob<any>(fetchApi<{ job: Job }>(`/servers/${id}/setup_virtualization/`, { method: 'POST' })),
+  downloadBaseImage: (id: string) => runJob<any>(fetchApi<{ job: Job }>(`/servers/${id}/download_base_image/`, { method: 'POST' })),
 
   // Virtual Machines
   getVMs: () => fetchApi<VirtualMachine[]>('/vms/'),
   getVM: (id: string) => fetchApi<VirtualMachine>(`/vms/${id}/`),
   createVM: (data: { server_id: string; name: string; vcpus?: number; ram_mb?: number; disk_gb?: number; vm_username?: string; vm_password?: string; ip_address?: string }) =>
-    fetchApi<{ vm: VirtualMachine; result: any }>('/vms/', { method: 'POST', body: JSON.stringify(data) }),
-  deleteVM: (id: string) => fetchApi<any>(`/vms/${id}/remove/`, { method: 'DELETE' }),
-  startVM: (id: string) => fetchApi<{ vm: VirtualMachine; result: any }>(`/vms/${id}/start/`, { method: 'POST' }),
-  stopVM: (id: string) => fetchApi<{ vm: VirtualMachine; result: any }>(`/vms/${id}/stop/`, { method: 'POST' }),
-  destroyVM: (id: string) => fetchApi<{ vm: VirtualMachine; result: any }>(`/vms/${id}/destroy/`, { method: 'POST' }),
+    runJob<{ vm: VirtualMachine; result: any }>(fetchApi<{ job: Job }>('/vms/', { method: 'POST', body: JSON.stringify(data) })),
+  createVMs: (data: {
+    server_id: string;
+    vms: { name: string; vcpus?: number; ram_mb?: number; disk_gb?: number; vm_username?: string; vm_password?: string; ip_address?: string }[];
+  }) => fetchApi<{ job: Job }>('/vms/batch/', { method: 'POST', body: JSON.stringify(data) }),
+  deleteVM: (id: string) => runJob<any>(fetchApi<{ job: Job }>(`/vms/${id}/remove/`, { method: 'DELETE' })),
+  startVM: (id: string) => runJob<{ vm: VirtualMachine; result: any }>(fetchApi<{ job: Job }>(`/vms/${id}/start/`, { method: 'POST' })),
+  stopVM: (id: string) => runJob<{ vm: VirtualMachine; result: any }>(fetchApi<{ job: Job }>(`/vms/${id}/stop/`, { method: 'POST' })),
+  destroyVM: (id: string) => runJob<{ vm: VirtualMachine; result: any }>(fetchApi<{ job: Job }>(`/vms/${id}/destroy/`, { method: 'POST' })),
   installWorkerOnVM: (id: string, device_id: string, user_id: string) =>
-    fetchApi<any>(`/vms/${id}/install_worker/`, { method: 'POST', body: JSON.stringify({ device_id, user_id }) }),
+    runJob<any>(fetchApi<{ job: Job }>(`/vms/${id}/install_worker/`, { method: 'POST', body: JSON.stringify({ device_id, user_id }) })),
 
   // Workers
   getWorkers: (params?: { status?: string; server?: string; vm?: string }) => {
@@ -122,14 +206,46 @@ export const api = {
     return fetchApi<Worker[]>(`/workers/${query ? `?${query}` : ''}`);
   },
   getWorker: (id: string) => fetchApi<Worker>(`/workers/${id}/`),
-  startWorker: (id: string) => fetchApi<{ worker: Worker; result: any }>(`/workers/${id}/start/`, { method: 'POST' }),
-  stopWorker: (id: string) => fetchApi<{ worker: Worker; result: any }>(`/workers/${id}/stop/`, { method: 'POST' }),
-  restartWorker: (id: string) => fetchApi<{ worker: Worker; result: any }>(`/workers/${id}/restart/`, { method: 'POST' }),
-  getWorkerLogs: (id: string, lines?: number) => fetchApi<{ success: boolean; logs: string; errors: string }>(`/workers/${id}/logs/?lines=${lines || 100}`),
+  startWorker: (id: string) => runJob<{ worker: Worker; result: any }>(fetchApi<{ job: Job }>(`/workers/${id}/start/`, { method: 'POST' })),
+  stopWorker: (id: string) => runJob<{ worker: Worker; result: any }>(fetchApi<{ job: Job }>(`/workers/${id}/stop/`, { method: 'POST' })),
+  restartWorker: (id: string) => runJob<{ worker: Worker; result: any }>(fetchApi<{ job: Job }>(`/workers/${id}/restart/`, { method: 'POST' })),
+  bulkWorkerAction: (data: {
+    action: 'start' | 'stop' | 'restart';
+    ids?: string[];
+    status?: string;
+    server_id?: string;
+    vm_id?: string;
+    image?: string;
+    mode?: 'batch' | 'rolling';
+    max_unavailable?: number;
+  }) => fetchApi<{ job: Job; workers: number }>('/workers/bulk/', { method: 'POST', body: JSON.stringify(data) }),
+  streamWorkerLogs: (id: string, options: LogStreamOptions = {}) =>
+    fetch(`${API_BASE}/workers/${id}/logs/?stream=1&${logStreamQuery(options)}`),
+  getWorkerLogs: (id: string, lines?: number) => runJob<{ success: boolean; logs: string; errors: string }>(fetchApi<{ job: Job }>(`/workers/${id}/logs/?lines=${lines || 100}`)),
+
+  // Jobs
+  getJobs: (params?: { status?: string; target?: string }) => {
+    const searchParams = new URLSearchParams();
+    if (params?.status) searchParams.set('status', params.status);
+    if (params?.target) searchParams.set('target', params.target);
+    const query = searchParams.toString();
+    return fetchApi<Job[]>(`/jobs/${query ? `?${query}` : ''}`);
+  },
+  getJob: (id: string) => fetchApi<Job>(`/jobs/${id}/`),
+  waitForJob,
+
+  // Metrics
+  getMetrics: (params: { worker?: string; vm?: string; server?: string; start?: string; end?: string; resolution?: string }) => {
+    const searchParams = new URLSearchParams();
+    Object.entries(params).forEach(([key, value]) => {
+      if (value) searchParams.set(key, value);
+    });
+    return fetchApi<MetricsSeries>(`/metrics/?${searchParams.toString()}`);
+  },
 
   // Bulk actions
   checkAllStatus: () => fetchApi<any[]>('/check-all/', { method: 'POST' }),
   installWorker: (data: { device_id: string; user_id: string; vm_id?: string; server_id?: string }) =>
-    fetchApi<any>('/install-worker/', { method: 'POST', body: JSON.stringify(data) }),
+    runJob<any>(fetchApi<{ job: Job }>('/install-worker/', { method: 'POST', body: JSON.stringify(data) })),
 };
 